@@ -0,0 +1,92 @@
+import argparse
+import random
+import re
+import time
+from typing import Callable, List
+
+from bs4 import BeautifulSoup
+
+from wiki_parser import extract_text, lxml
+
+WORDS = ['озеро', 'байкал', 'берег', 'глубина', 'вода', 'остров', 'река', 'исток', 'бассейн', 'площадь',
+         'республика', 'бурятия', 'иркутская', 'область', 'рыба', 'омуль', 'нерпа', 'лёд', 'зима', 'тайга']
+
+
+def legacy_parse_content(content: str) -> str:
+    soup = BeautifulSoup(content, 'html.parser')
+    body_content = soup.find(id='bodyContent')
+    text = body_content.get_text()
+    text = re.sub(r'\n\s*\n', '\n', text)
+    return text.strip()
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def synthetic_page(sections: int = 40, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    head = ''.join(f'<link rel="stylesheet" href="/style{i}.css"/><script>var x{i} = {i};</script>'
+                   for i in range(50))
+    navigation = '<div id="mw-navigation">' + ''.join(f'<a href="/wiki/{i}">{rng.choice(WORDS)}</a>'
+                                                      for i in range(500)) + '</div>'
+    body = ['<div class="mw-parser-output"><table class="infobox">' +
+            ''.join(f'<tr><th>{rng.choice(WORDS)}</th><td>{rng.randint(1, 1000)}</td></tr>' for _ in range(30)) +
+            '</table>']
+    body.extend(f'<p><b>{rng.choice(WORDS)}</b> {sentence(rng)} {sentence(rng)}</p>' for _ in range(3))
+    for number in range(sections):
+        body.append(f'<div class="mw-heading mw-heading2"><h2 id="s{number}">{rng.choice(WORDS)}</h2>'
+                    f'<span class="mw-editsection">[править]</span></div>')
+        for _ in range(rng.randint(3, 8)):
+            body.append('<p>' + ' '.join(f'<a href="/wiki/x">{sentence(rng)}</a>'
+                                         f'<sup class="reference"><a href="#n">[{rng.randint(1, 99)}]</a></sup>'
+                                         for _ in range(rng.randint(2, 6))) + '</p>')
+        body.append('<ul>' + ''.join(f'<li>{sentence(rng)}</li>' for _ in range(rng.randint(0, 5))) + '</ul>')
+    body.append('<div class="reflist"><ol class="references">' +
+                ''.join(f'<li id="n{i}">{sentence(rng)}</li>' for i in range(300)) + '</ol></div>')
+    body.append('<div class="navbox"><table>' +
+                ''.join(f'<tr><td>{sentence(rng)}</td></tr>' for _ in range(200)) + '</table></div></div>')
+    return (f'<!DOCTYPE html><html><head>{head}</head><body>{navigation}'
+            f'<div id="content"><h1>Озеро</h1><div id="bodyContent" class="vector-body">{"".join(body)}</div></div>'
+            f'<div id="footer">{navigation}</div></body></html>')
+
+
+def measure(function: Callable[[str], str], pages: List[str], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            function(page)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(pages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Сравнение скорости разбора страниц википедии')
+    parser.add_argument('pages', nargs='*', help='сохраненные html-страницы; без них используется синтетическая')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding='utf-8') as page:
+            pages.append(page.read())
+    if not pages:
+        pages = [synthetic_page(seed=seed) for seed in range(3)]
+    print(f'Страниц: {len(pages)}, средний размер {sum(map(len, pages)) // len(pages) // 1024} КБ')
+
+    baseline = measure(legacy_parse_content, pages, args.repeat)
+    candidates = [('html.parser, только bodyContent', lambda page: extract_text(page, use_lxml=False)),
+                  ('html.parser, вводный раздел', lambda page: extract_text(page, lead_only=True, use_lxml=False))]
+    if lxml is not None:
+        candidates.append(('lxml', extract_text))
+    print(f'{"BeautifulSoup (прежний parse_content)":40} {baseline * 1000:8.2f} мс')
+    for name, function in candidates:
+        elapsed = measure(function, pages, args.repeat)
+        print(f'{name:40} {elapsed * 1000:8.2f} мс  x{baseline / elapsed:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3 as sq
+import statistics
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+from image_pipeline import decode_image
+from lake_catalog import LakeCatalog
+
+SIZES = [(320 + step * 40, 240 + step * 24) for step in range(12)]
+BENCH_PREFIX = '~замер '
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    quantiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {'n': len(samples),
+            'median_ms': statistics.median(samples) * 1000,
+            'p90_ms': quantiles[89] * 1000,
+            'p99_ms': quantiles[98] * 1000,
+            'max_ms': samples[-1] * 1000}
+
+
+def timed(function: Callable, *args) -> float:
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Benchmark:
+
+    def __init__(self, path: str, samples: int = 200, seed: int = 1):
+        self.path = path
+        self.samples = samples
+        self.rng = random.Random(seed)
+        self.results: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, samples: List[float]) -> None:
+        self.results[name] = summarize(samples)
+        summary = self.results[name]
+        print(f"  {name:28} n={summary['n']:<6} медиана {summary['median_ms']:9.3f}  "
+              f"p99 {summary['p99_ms']:9.3f}  макс {summary['max_ms']:9.3f} мс", flush=True)
+
+    def startup(self, repeat: int = 3) -> LakeCatalog:
+        opened, loaded = [], []
+        catalog = None
+        for _ in range(repeat):
+            if catalog is not None:
+                catalog.close()
+            started = time.perf_counter()
+            catalog = LakeCatalog.open(self.path)
+            opened.append(time.perf_counter() - started)
+            loaded.append(timed(catalog.load))
+        self.record('startup.open', opened)
+        self.record('startup.list_load', loaded)
+        return catalog
+
+    def selection(self, catalog: LakeCatalog) -> None:
+        names = self.rng.sample(catalog.lakes.names, min(self.samples, len(catalog.lakes)))
+        queries, renders = [], []
+        for name in names:
+            catalog.details_cache.clear()
+            started = time.perf_counter()
+            details = catalog.details(name)
+            queried = time.perf_counter()
+            key, source = catalog.image(details)
+            decode_image(source, SIZES[5])
+            queries.append(queried - started)
+            renders.append(time.perf_counter() - started)
+        self.record('select.query', queries)
+        self.record('select.query_and_image', renders)
+
+    def search(self, catalog: LakeCatalog) -> None:
+        self.record('search.scan', [timed(catalog.search, 'озеро')])
+        self.record('search.index_build', [timed(catalog.build_search_index)])
+        keystrokes = []
+        for name in self.rng.sample(catalog.lakes.names, min(self.samples // 4 or 1, len(catalog.lakes))):
+            start = self.rng.randrange(max(len(name) - 3, 1))
+            typed = name[start:start + self.rng.randint(3, 10)]
+            for length in range(1, len(typed) + 1):
+                keystrokes.append(timed(catalog.search, typed[:length]))
+            catalog.search('')
+        self.record('search.keystroke', keystrokes)
+        full_text = [timed(catalog.full_text, word) for word in ('озеро', 'глубина', 'омул', 'берег залив')]
+        self.record('search.full_text', full_text)
+
+    def images(self, catalog: LakeCatalog) -> None:
+        image_ids = [row[0] for row in catalog.database.execute("SELECT id FROM images ORDER BY random() LIMIT ?",
+                                                                (max(self.samples // 20, 1),))]
+        if not image_ids:
+            print('  изображений нет, замер пропущен')
+            return
+        resizes = []
+        for image_id in image_ids:
+            source = catalog.images.opener(image_id)
+            for size in SIZES:
+                resizes.append(timed(decode_image, source, size))
+        self.record('image.resize', resizes)
+
+    def edits(self, catalog: LakeCatalog, count: int = 200) -> None:
+        names = [f'{BENCH_PREFIX}{number:06d}' for number in range(count)]
+        added = [timed(catalog.add, name, 'Описание для замера') for name in names]
+        updated = [timed(catalog.update, name, name + ' изм.', 'Новое описание') for name in names]
+        deleted = [timed(catalog.delete, name + ' изм.') for name in names]
+        self.record('edit.add', added)
+        self.record('edit.update', updated)
+        self.record('edit.delete', deleted)
+
+    def run(self) -> Dict:
+        print(f'{self.path}:')
+        catalog = self.startup()
+        try:
+            self.selection(catalog)
+            self.search(catalog)
+            self.images(catalog)
+            self.edits(catalog)
+            rows = len(catalog.lakes)
+        finally:
+            catalog.close()
+        return {'database': os.path.basename(self.path), 'rows': rows, 'results': self.results}
+
+
+def compare(record: Dict, previous: Dict) -> None:
+    print(f"Сравнение с {previous.get('label') or previous.get('revision')} ({previous['time']}):")
+    for name, summary in record['results'].items():
+        before = previous['results'].get(name)
+        if before is None or not before['median_ms']:
+            continue
+        ratio = summary['median_ms'] / before['median_ms']
+        print(f"  {name:28} {before['median_ms']:9.3f} -> {summary['median_ms']:9.3f} мс  x{ratio:.2f}")
+
+
+def load_results(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as results:
+        return [json.loads(line) for line in results if line.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Замеры производительности каталога озер')
+    parser.add_argument('databases', nargs='+', help='базы, созданные synthetic.py')
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--label', help='метка версии в файле результатов')
+    parser.add_argument('--results', default='benchmarks.jsonl')
+    args = parser.parse_args()
+
+    history = load_results(args.results)
+    revision = git_revision()
+    for path in args.databases:
+        record = Benchmark(path, args.samples, args.seed).run()
+        record.update({'label': args.label, 'revision': revision, 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'python': platform.python_version(), 'sqlite': sq.sqlite_version})
+        previous = [old for old in history if old['database'] == record['database']]
+        if previous:
+            compare(record, previous[-1])
+        with open(args.results, 'a', encoding='utf-8') as results:
+            results.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
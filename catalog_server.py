@@ -0,0 +1,319 @@
+import argparse
+import asyncio
+import configparser
+import gzip
+import hashlib
+import io
+import json
+import os
+import sqlite3 as sq
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional
+
+from aiohttp import web
+
+import full_text
+from database import Database
+from image_store import image_extension
+import maintenance
+from profiling import metrics
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SEARCH_LIMIT = 50
+FTS_MIN_CHARS = 3
+WIDTH_STEP = 64
+GZIP_MIN_BYTES = 1024
+CONTENT_TYPES = {'webp': 'image/webp', 'png': 'image/png', 'jpg': 'image/jpeg', 'gif': 'image/gif',
+                 'bin': 'application/octet-stream'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class Payload(NamedTuple):
+    body: bytes
+    content_type: str
+    etag: str
+    cache_control: str
+    encoding: Optional[str] = None
+
+
+def strong_etag(*parts: Any) -> str:
+    return '"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def body_etag(body: bytes) -> str:
+    return strong_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+def matches(request: web.Request, etag: str) -> bool:
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so a W/ prefix added by a proxy still matches
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def accepts_gzip(request: web.Request) -> bool:
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def width_bucket(width: int, max_width: int) -> int:
+    # widths are rounded up so arbitrary query strings cannot fill the cache with near-identical copies
+    return min(max(-(-width // WIDTH_STEP) * WIDTH_STEP, WIDTH_STEP), max_width)
+
+
+class ResponseCache:
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries: OrderedDict[Hashable, Payload] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Payload]:
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+            return payload
+
+    def put(self, key: Hashable, payload: Payload) -> None:
+        if len(payload.body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.used_bytes -= len(old.body)
+            self.entries[key] = payload
+            self.used_bytes += len(payload.body)
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.used_bytes -= len(evicted.body)
+
+
+class CatalogServer:
+
+    def __init__(self, database: Database, workers: int = 8, cache_bytes: int = 64 * 1024 * 1024,
+                 config: Optional[configparser.ConfigParser] = None):
+        self.database = database
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='catalog')
+        self.cache = ResponseCache(cache_bytes)
+        self.config = config or configparser.ConfigParser()
+        self.max_width = int(self.config.get('images', 'max_side', fallback='1600'))
+        self.ingest = None
+
+    def application(self) -> web.Application:
+        application = web.Application()
+        application.add_routes([web.get('/lakes', self.list_lakes),
+                                web.get('/lakes/{name:.+}', self.lake),
+                                web.get('/search', self.search),
+                                web.get('/images/{image_id:\\d+}', self.image),
+                                web.get('/thumbnails/{image_id:\\d+}', self.thumbnail)])
+        application.on_cleanup.append(self.close)
+        return application
+
+    async def close(self, application: web.Application) -> None:
+        self.executor.shutdown(wait=True)
+        self.database.close()
+
+    async def run(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    @staticmethod
+    def respond(request: web.Request, payload: Optional[Payload]) -> web.Response:
+        if payload is None:
+            raise web.HTTPNotFound()
+        headers = {'ETag': payload.etag, 'Cache-Control': payload.cache_control, 'Content-Type': payload.content_type}
+        if payload.content_type.startswith('application/json'):
+            headers['Vary'] = 'Accept-Encoding'
+        if matches(request, payload.etag):
+            metrics.count('server.not_modified')
+            return web.Response(status=304, headers=headers)
+        if payload.encoding is not None:
+            headers['Content-Encoding'] = payload.encoding
+        return web.Response(body=payload.body, headers=headers)
+
+    # JSON handlers: the query, serialization and compression all run on the worker thread
+
+    async def list_lakes(self, request: web.Request) -> web.Response:
+        after = request.query.get('after', '')
+        limit = self.limit(request, PAGE_SIZE, MAX_PAGE_SIZE)
+        return self.respond(request, await self.run(self.read_page, after, limit, accepts_gzip(request)))
+
+    async def search(self, request: web.Request) -> web.Response:
+        query = request.query.get('q', '').strip()
+        if not query:
+            raise web.HTTPBadRequest(text='q is required')
+        limit = self.limit(request, SEARCH_LIMIT, MAX_PAGE_SIZE)
+        return self.respond(request, await self.run(self.read_search, query, limit, accepts_gzip(request)))
+
+    async def lake(self, request: web.Request) -> web.Response:
+        return self.respond(request, await self.run(self.read_lake, request.match_info['name'],
+                                                    accepts_gzip(request)))
+
+    @staticmethod
+    def limit(request: web.Request, default: int, maximum: int) -> int:
+        try:
+            return min(max(int(request.query.get('limit', default)), 1), maximum)
+        except ValueError:
+            raise web.HTTPBadRequest(text='limit must be an integer')
+
+    def json_payload(self, data: Dict, compress: bool) -> Payload:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        etag = body_etag(body)
+        if not compress or len(body) < GZIP_MIN_BYTES:
+            return Payload(body, 'application/json; charset=utf-8', etag, REVALIDATE)
+        # gzip output is a different representation, so it gets its own strong ETag
+        gzip_etag = etag[:-1] + '-gzip"'
+        cached = self.cache.get(('gzip', gzip_etag))
+        if cached is not None:
+            return cached
+        with metrics.timer('server.gzip'):
+            payload = Payload(gzip.compress(body, 6), 'application/json; charset=utf-8', gzip_etag, REVALIDATE, 'gzip')
+        self.cache.put(('gzip', gzip_etag), payload)
+        return payload
+
+    def read_page(self, after: str, limit: int, compress: bool) -> Payload:
+        with metrics.timer('server.list'), self.database.pooled() as connection:
+            names = [row[0] for row in connection.execute("SELECT name FROM lakes WHERE name > ? ORDER BY name LIMIT ?",
+                                                          (after, limit))]
+        return self.json_payload({'lakes': names, 'next': names[-1] if len(names) == limit else None}, compress)
+
+    def read_search(self, query: str, limit: int, compress: bool) -> Payload:
+        prefix = full_text.fold_name(query)
+        # one- and two-letter prefixes match most of the catalog in FTS and only cost a bm25 sort over all of it
+        fts = max(map(len, query.split())) >= FTS_MIN_CHARS
+        with metrics.timer('server.search'), self.database.pooled() as connection:
+            names = [row[0] for row in connection.execute(
+                "SELECT name FROM lakes WHERE name_folded >= ? AND name_folded < ? ORDER BY name_folded LIMIT ?",
+                (prefix, prefix + '\U0010ffff', limit))]
+            text = full_text.search(connection, query, limit) if fts else []
+        return self.json_payload({'names': names, 'text': [{'name': name, 'snippet': snippet}
+                                                           for name, snippet in text]}, compress)
+
+    def read_lake(self, name: str, compress: bool) -> Optional[Payload]:
+        with metrics.timer('server.lake'), self.database.pooled() as connection:
+            row = connection.execute("SELECT image_id, description FROM lakes WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        image_id, description = row
+        return self.json_payload({'name': name, 'description': description,
+                                  'image': f'/images/{image_id}' if image_id is not None else None,
+                                  'thumbnail': f'/thumbnails/{image_id}' if image_id is not None else None}, compress)
+
+    # images are content-addressed and ids are never reused, so the hash alone is a strong validator
+
+    async def image(self, request: web.Request) -> web.Response:
+        width = request.query.get('width')
+        if width is not None:
+            try:
+                width = width_bucket(int(width), self.max_width)
+            except ValueError:
+                raise web.HTTPBadRequest(text='width must be an integer')
+        return await self.image_response(request, int(request.match_info['image_id']), 'picture', width)
+
+    async def thumbnail(self, request: web.Request) -> web.Response:
+        return await self.image_response(request, int(request.match_info['image_id']), 'thumbnail', None)
+
+    async def image_response(self, request: web.Request, image_id: int, column: str,
+                             width: Optional[int]) -> web.Response:
+        key = (image_id, column, width)
+        payload = self.cache.get(key)
+        if payload is None:
+            digest = await self.run(self.read_hash, image_id)
+            if digest is None:
+                raise web.HTTPNotFound()
+            etag = strong_etag(digest, column, width) if width else strong_etag(digest, column)
+            if matches(request, etag):
+                metrics.count('server.not_modified')
+                return web.Response(status=304, headers={'ETag': etag, 'Cache-Control': IMMUTABLE})
+            payload = await self.run(self.read_image, image_id, column, width, etag)
+            if payload is None:
+                raise web.HTTPNotFound()
+            self.cache.put(key, payload)
+        else:
+            metrics.count('server.image_cache_hits')
+        return self.respond(request, payload)
+
+    def read_hash(self, image_id: int) -> Optional[str]:
+        with self.database.pooled() as connection:
+            row = connection.execute("SELECT hash FROM images WHERE id = ?", (image_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def read_image(self, image_id: int, column: str, width: Optional[int], etag: str) -> Optional[Payload]:
+        # a stored thumbnail is served without touching the picture blob, which is many times larger
+        with metrics.timer('server.image'), self.database.pooled() as connection:
+            data = None
+            if column == 'thumbnail':
+                row = connection.execute("SELECT thumbnail FROM images WHERE id = ?", (image_id,)).fetchone()
+                if row is None:
+                    return None
+                data = row[0]
+            if data is None:
+                row = connection.execute("SELECT picture FROM images WHERE id = ?", (image_id,)).fetchone()
+                if row is None:
+                    return None
+                data = row[0]
+                if column == 'thumbnail':
+                    data = self.resize(data, self.get_ingest().thumbnail_side)
+                elif width is not None:
+                    data = self.resize(data, width)
+        return Payload(data, CONTENT_TYPES[image_extension(data[:12])], etag, IMMUTABLE)
+
+    def get_ingest(self):
+        if self.ingest is None:
+            from image_ingest import ImageIngest
+            self.ingest = ImageIngest.from_config(self.config)
+        return self.ingest
+
+    def resize(self, data: bytes, width: int) -> bytes:
+        from PIL import Image
+        with metrics.timer('server.resize'):
+            image = Image.open(io.BytesIO(data))
+            if image.width <= width:
+                return data
+            height = max(round(image.height * width / image.width), 1)
+            image.draft('RGB', (width, height))
+            return self.get_ingest().encode(image.resize((width, height), Image.LANCZOS, reducing_gap=2.0))
+
+
+# the server only reads; the indexes it relies on are created by maintenance.py name-search
+def missing_schema(connection: sq.Connection) -> List[str]:
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    return [name for name in ('lakes', 'images', 'lakes_fts', *maintenance.INDEXES, maintenance.NAME_SEARCH_INDEX)
+            if name not in existing]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='HTTP-сервер каталога озер (только чтение)')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--database', help='по умолчанию database_file из конфигурации')
+    parser.add_argument('--host')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+
+    workers = args.workers or int(config.get('server', 'workers', fallback='8'))
+    path = args.database or config.get('database', 'database_file')
+    if not os.path.exists(path):
+        sys.exit(f'Нет базы {path}')
+    database = Database(path, pool_size=workers, read_only=True)
+    missing = missing_schema(database.connection)
+    if missing:
+        database.close()
+        sys.exit(f"В базе нет {', '.join(missing)}: выполните python maintenance.py name-search")
+    server = CatalogServer(database, workers, int(config.get('server', 'cache_mb', fallback='64')) * 1024 * 1024,
+                           config)
+    web.run_app(server.application(), host=args.host or config.get('server', 'host', fallback='127.0.0.1'),
+                port=args.port or int(config.get('server', 'port', fallback='8080')))
+
+
+if __name__ == '__main__':
+    main()
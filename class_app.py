@@ -1,74 +1,61 @@
+from __future__ import annotations
+
+from profiling import StartupProfile, instrument_tk, metrics
+import argparse
 import logging
+import threading
 import tkinter as tk
 import sqlite3 as sq
 import configparser
-import asyncio
-import aiohttp
-import re
-import io
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Callable, Dict, List, TypeVar
+from concurrent.futures import Future, CancelledError, as_completed
 from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
-
-
-def parse_content(content: str) -> str:
-    soup = BeautifulSoup(content, 'html.parser')
-    body_content = soup.find(id='bodyContent')
-    text = body_content.get_text()
-    text = re.sub(r'\n\s*\n', '\n', text)
-    return text.strip()
-
-
-async def get_info_lake(session: aiohttp.ClientSession, url: str, pack_text_field: tk.Text) -> None:
-    try:
-        async with session.get(url) as connection:
-            if connection.status == 200:
-                content = await connection.text()
-                loop = asyncio.get_running_loop()
-                with ThreadPoolExecutor() as pool:
-                    task = loop.run_in_executor(
-                        pool, parse_content, content
-                    )
-                    result = await task
-                    if pack_text_field.get(0.1, tk.END).strip() == "Введите информацию об озере...":
-                        pack_text_field.delete(1.0, tk.END)
-                    pack_text_field.configure(foreground='black')
-                    pack_text_field.insert(tk.END, result)
-            else:
-                tk.messagebox.showinfo("Ошибка", "Информации о данном озере нет в википедии")
-                pack_text_field.focus_set()
-    except aiohttp.ClientConnectionError:
-        tk.messagebox.showerror("Ошибка", "Нет сетевого подключения!")
-
-
-async def get_wikipedia(topic: str, pack_text: tk.Text) -> None:
-    url = f'https://ru.wikipedia.org/wiki/{topic}'
-    async with aiohttp.ClientSession() as session:
-        await get_info_lake(session, url, pack_text)
-
-
-def connect_to_wikipedia(field: tk.Entry, pack_text: tk.Text) -> None:
-    if field.get() != '' and field.get() != "Введите название озера...":
-        asyncio.run(get_wikipedia(field.get(), pack_text))
-    else:
-        tk.messagebox.showerror("Ошибка", "Поле с названием озера не должно быть пустым!")
+from lake_catalog import BatchCancelled, LakeCatalog, Progress
+from lake_changes import ChangeTracker
+import maintenance
+from lake_list import ComboboxValues, VirtualList
+from lake_model import FilteredLakes, LakeModel, Snapshot
+from database import Database
+from image_cache import ImageCache
+from image_pipeline import ImageRenderer
+from prefetch import Prefetcher
+from search_index import SearchIndex
+from text_stream import TextStreamer
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+    from image_ingest import ImageIngest
+    from wiki_client import WikiClient
+
+T = TypeVar('T')
 
 
 class App:
 
-    def __init__(self, config_file: str):
+    def __init__(self, config_file: str, startup_profile: bool = False, collect_metrics: bool = False):
+        self.profile = StartupProfile(startup_profile)
+        self.profile.expect('окно показано', 'список озер загружен')
+        self.profile.mark('импорт модулей')
 
         config = configparser.ConfigParser()
         config.read(config_file)
+        self.config = config
+        metrics.configure(collect_metrics or config.getboolean('metrics', 'enabled', fallback=False),
+                          config.get('metrics', 'report_file', fallback=None),
+                          float(config.get('metrics', 'slow_ms', fallback='50')))
+        if metrics.enabled:
+            instrument_tk(metrics)
 
         self.root = tk.Tk()
         self.style = ttk.Style()
 
         self.DB_NAME = config.get('database', 'database_file')
+        self.db = None
+        self.catalog = None
 
         self.task = None
+        self.search_delay = int(config.get('app', 'search_delay', fallback='150'))
+        self.last_query = ''
         self.image_lake = None
         self.image_lake_refactor = None
 
@@ -86,25 +73,41 @@ class App:
         self.style.configure("Close.TButton")
 
         # LIST_BOX
-        self.list_box = tk.Listbox(self.root, selectmode=tk.SINGLE, font=('Arial', 12))
+        self.list_box = tk.Listbox(self.root, selectmode=tk.EXTENDED, font=('Arial', 12))
         self.list_box.insert(tk.END, '')
-        self.list_of_lakes = self.get_list_of_lakes()
-        for option in self.list_of_lakes:
-            self.list_box.insert(tk.END, option)
+        self.profile.mark('окно Tk')
+        self.lakes = self.open_lakes()
+        self.profile.mark('база данных')
         self.style.configure('Search.TEntry', foreground='grey')
-        self.search_entry = ttk.Entry(self.root, style='Search.TEntry', width=100)
+        self.search_text = tk.StringVar(self.root)
+        self.search_entry = ttk.Entry(self.root, style='Search.TEntry', width=100, textvariable=self.search_text)
         self.search_entry.insert(tk.END, "Поиск...")
-        self.search_entry.bind("<FocusIn>", lambda event: (self.hide_text_info(event.widget, "Поиск..."),
-                                                           self.root.after(10, self.check_value)))
-        self.search_entry.bind('<FocusOut>', lambda event: (self.set_text_info(event.widget, "Поиск..."),
-                                                            self.root.after_cancel(self.task)))
+        self.search_text.trace_add('write', lambda *args: self.schedule_search())
+        self.search_entry.bind("<FocusIn>", lambda event: self.hide_text_info(event.widget, "Поиск..."))
+        self.search_entry.bind('<FocusOut>', lambda event: self.set_text_info(event.widget, "Поиск..."))
         self.search_entry.grid(row=0, column=0, sticky=tk.N)
         self.list_box.grid(row=0, column=0, sticky=tk.NS + tk.EW)
         self.list_box.configure(selectbackground=self.list_box.cget('background'), selectforeground='gray')
-        self.list_box.bind("<<ListboxSelect>>", self.on_select)
+        self.lake_list = VirtualList(self.list_box, self.lakes)
+        self.list_box.bind("<<ListboxSelect>>", self.on_select, add='+')
+        self.list_box.bind("<Delete>", lambda event: self.delete_selected())
+        self.batch_progress_min = int(config.get('app', 'batch_progress_min', fallback='50'))
 
         # IMAGE
         self.image = None
+        self.image_name = None
+        self.image_size = None
+        self.resize_task = None
+        self.resize_delay = int(config.get('app', 'resize_delay', fallback='100'))
+        self.image_cache = ImageCache(int(config.get('app', 'image_cache_mb', fallback='64')) * 1024 * 1024)
+        self.renderer = ImageRenderer(self.root, self.image_cache)
+        self.prefetcher = Prefetcher(self.catalog, self.image_cache, int(config.get('app', 'prefetch', fallback='3')))
+        self.ingest: ImageIngest | None = None
+        self.wiki: WikiClient | None = None
+        self.wiki_requests: Dict[str, Future] = {}
+        self.wiki_streamed: Dict[str, List[str]] = {}
+        self.text_streamer = TextStreamer(self.root)
+        self.preview_chars = int(config.get('app', 'preview_chars', fallback='20000'))
         self.image_field = tk.Label(self.root)
         self.image_field.grid(row=0, column=1, sticky="nsew")
 
@@ -129,6 +132,11 @@ class App:
         self.root.bind("<F2>", lambda event: self.add_lake())
         file_menu.add_command(label="Удалить F3", command=self.delete_lake_window)
         self.root.bind("<F3>", lambda event: self.delete_lake_window())
+        file_menu.add_separator()
+        file_menu.add_command(label="Удалить выбранные Del", command=self.delete_selected)
+        file_menu.add_command(label="Обновить описания выбранных из википедии", command=self.refetch_selected)
+        file_menu.add_command(label="Заменить изображение выбранных...", command=self.replace_selected_images)
+        file_menu.add_separator()
         file_menu.add_command(label="Выйти F4", command=self.root.quit)
         self.root.bind("<F4>", lambda event: self.refactor_lake())
         self.root.bind("<F10>", lambda event: file_menu.post(event.x_root, event.y_root))
@@ -142,7 +150,26 @@ class App:
         file_menu2.add_command(label="О программе", command=self.show_modal_window)
 
         self.root.config(menu=menu_bar)
+        self.profile.mark('виджеты')
+        self.changes: ChangeTracker | None = None
+        self.sync_interval = int(config.get('app', 'sync_interval', fallback='1000'))
+        self.root.after(self.sync_interval, self.schedule_sync)
+        self.maintenance_task: str | None = None
+        self.maintenance_idle = int(config.get('maintenance', 'idle_seconds', fallback='60')) * 1000
+        self.maintenance_due = config.getboolean('maintenance', 'auto', fallback=True)
+        if self.maintenance_due:
+            self.root.bind_all('<Any-KeyPress>', self.postpone_maintenance, add='+')
+            self.root.bind_all('<Any-ButtonPress>', self.postpone_maintenance, add='+')
+            self.postpone_maintenance()
+        self.load_lakes()
+        self.root.after_idle(self.profile.mark, 'окно показано')
         self.root.mainloop()
+        self.prefetcher.shutdown()
+        self.renderer.shutdown()
+        if self.wiki is not None:
+            self.wiki.close()
+        if self.db is not None:
+            self.db.close()
 
     @staticmethod
     def set_text_info(field: ttk.Entry | tk.Entry, text_info: str):
@@ -156,34 +183,111 @@ class App:
             field.delete(0, 'end')
             field.configure(foreground='black')
 
-    def get_list_of_lakes(self) -> List[str]:
+    def open_lakes(self) -> LakeModel:
         try:
-            with sq.connect(self.DB_NAME) as connection:
-                cur = connection.cursor()
-                list_of_lakes = cur.execute("SELECT name FROM lakes ORDER BY name").fetchall()
-                list_of_lakes = [lake[0] for lake in list_of_lakes]
-                return list_of_lakes
+            self.db = Database(self.DB_NAME)
+            details_cache_mb = int(self.config.get('app', 'details_cache_mb', fallback='16'))
+            max_names = int(self.config.get('app', 'max_loaded_names', fallback='500000'))
+            self.catalog = LakeCatalog(self.db, details_cache_mb * 1024 * 1024, max_names)
+            return self.catalog.lakes
         except sq.OperationalError as e:
             logging.warning(e)
             tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
             self.root.destroy()
 
-    def update_list_box(self):
-        self.list_box.delete(1, tk.END)
-        self.list_of_lakes = self.get_list_of_lakes()
-        for option in self.list_of_lakes:
-            self.list_box.insert(tk.END, option)
+    def load_lakes(self) -> None:
+        def load():
+            try:
+                if self.changes is None:
+                    # schema upgrades can rebuild indexes for a long time, so they run here on a connection
+                    # of their own instead of on the Tk thread
+                    database = Database(self.DB_NAME)
+                    try:
+                        maintenance.ensure_schema(database)
+                    finally:
+                        database.close()
+                snapshot = self.lakes.fetch()
+            except sq.OperationalError as e:
+                logging.warning(e)
+                self.root.after(0, tk.messagebox.showerror, 'Ошибка', 'Нет подключения к базе данных')
+            else:
+                self.root.after(0, self.show_lakes, snapshot)
+
+        threading.Thread(target=load, name='load_lakes', daemon=True).start()
+
+    def show_lakes(self, snapshot: Snapshot) -> None:
+        self.catalog.reset(snapshot)
+        if self.changes is None:
+            self.changes = ChangeTracker(self.catalog, seq=snapshot.seq)
+        else:
+            self.changes.start_from(snapshot.seq)
+        query, self.last_query = self.last_query, None
+        self.change_listbox(self.list_box, query)
+        self.profile.mark('список озер загружен')
+        self.build_search_index()
+
+    def build_search_index(self) -> None:
+        if self.lakes.paged:
+            return
+        pending = self.catalog.start_search_index()
+
+        def build():
+            with metrics.timer('search.index_build'):
+                index = SearchIndex(pending.names)
+            self.root.after(0, self.catalog.install_search_index, pending, index)
+
+        threading.Thread(target=build, name='search_index', daemon=True).start()
+
+    def schedule_sync(self) -> None:
+        self.root.after_idle(self.sync_changes)
+
+    def sync_changes(self) -> None:
+        if self.changes is None:
+            self.root.after(self.sync_interval, self.schedule_sync)
+            return
+        try:
+            changes = self.changes.poll()
+        except sq.OperationalError as e:
+            logging.warning(e)
+            changes = None
+        if changes is not None:
+            if changes.reload:
+                self.load_lakes()
+            elif self.lake_list.selected in changes.names:
+                self.show_lake(self.lake_list.selected)
+        self.root.after(self.sync_interval, self.schedule_sync)
+
+    def postpone_maintenance(self, event=None) -> None:
+        if not self.maintenance_due:
+            return
+        if self.maintenance_task is not None:
+            self.root.after_cancel(self.maintenance_task)
+        self.maintenance_task = self.root.after(self.maintenance_idle, self.run_maintenance)
+
+    def run_maintenance(self) -> None:
+        self.maintenance_task = None
+        self.maintenance_due = False
+        interval = float(self.config.get('maintenance', 'interval_hours', fallback='24')) * 3600
+        threading.Thread(target=maintenance.run_idle, args=(self.db, interval), name='maintenance',
+                         daemon=True).start()
+
+    def get_wiki(self) -> WikiClient:
+        if self.wiki is None:
+            from wiki_cache import open_cache
+            from wiki_client import WikiClient, BASE_URL
+            self.wiki = WikiClient(self.config.get('wikipedia', 'base_url', fallback=BASE_URL),
+                                   float(self.config.get('wikipedia', 'timeout', fallback='15')),
+                                   cache=open_cache(self.config))
+        return self.wiki
 
     def show_modal_window(self):
         modal_window = tk.Toplevel(name='modal_window')
         self.pack_window(modal_window)
         modal_window.resizable(False, False)
         modal_window.title("О программе")
-        image = Image.open('!.jpeg')
-        image = image.resize((40, 40))
-        picture = ImageTk.PhotoImage(image)
-        image_label = tk.Label(modal_window, font=("Arial", 40), padx=10, pady=10, image=picture)
+        image_label = tk.Label(modal_window, font=("Arial", 40), padx=10, pady=10)
         image_label.grid(row=0, column=0, padx=5, pady=5)
+        self.renderer.render('modal_window', '!.jpeg', '!.jpeg', (40, 40), self.set_widget_image(image_label))
         label_text = tk.Label(modal_window, text="База данных 'Известные озера России'\n"
                                                  "(c) Khalyavka A.D., Russia, 2023\n", padx=10, pady=10)
         label_text.grid(row=0, column=1, padx=5, pady=5)
@@ -229,15 +333,15 @@ class App:
         window.focus_set()
 
     def change_listbox(self, field: tk.Listbox, text: str) -> None:
-        if text != 'Поиск...' and text != '':
-            field.delete(1, tk.END)
-            for el in self.list_of_lakes:
-                if text.lower() in el.lower():
-                    field.insert(tk.END, el)
-        elif not text:
-            field.delete(1, tk.END)
-            for el in self.list_of_lakes:
-                field.insert(tk.END, el)
+        if text == 'Поиск...':
+            return
+        self.last_query = text
+        if isinstance(self.lake_list.source, FilteredLakes):
+            self.lake_list.source.close()
+        if not text:
+            self.lake_list.set_source(self.lakes)
+            return
+        self.lake_list.set_source(FilteredLakes(self.lakes, self.catalog.search(text), text))
 
     def search_lake(self):
         def search():
@@ -251,57 +355,125 @@ class App:
                 self.search_entry.insert(tk.END, '')
             search_window.destroy()
 
+        def schedule_full_text():
+            nonlocal full_text_task
+            if full_text_task is not None:
+                search_window.after_cancel(full_text_task)
+            full_text_task = search_window.after(self.search_delay, show_full_text)
+
+        def show_full_text():
+            nonlocal full_text_task
+            full_text_task = None
+            text = search_text.get()
+            results.delete(*results.get_children())
+            if text == 'Введите название озера...':
+                return
+            try:
+                found = self.catalog.full_text(text)
+            except sq.OperationalError as e:
+                logging.warning(e)
+                return
+            for name, snippet in found:
+                results.insert('', tk.END, text=name, values=(' '.join(snippet.split()),))
+
+        def open_result(event):
+            selection = results.selection()
+            if selection:
+                self.show_lake(results.item(selection[0], 'text'))
+
+        full_text_task = None
         search_window = tk.Toplevel(name='search_window')
         search_window.title("Поиск")
         self.pack_window(search_window)
-        entry_search = ttk.Entry(search_window, width=50)
+        search_text = tk.StringVar(search_window)
+        entry_search = ttk.Entry(search_window, width=50, textvariable=search_text)
         entry_search.configure(foreground='#999')
         entry_search.bind("<FocusIn>", lambda event: self.hide_text_info(event.widget, 'Введите название озера...'))
         entry_search.bind('<FocusOut>', lambda event: self.set_text_info(event.widget, 'Введите название озера...'))
         entry_search.insert(0, 'Введите название озера...')
         entry_search.grid(row=0, column=0, columnspan=2)
+        search_text.trace_add('write', lambda *args: schedule_full_text())
 
         search_button = ttk.Button(search_window, text="Найти", command=search, width=25)
         search_button.grid(row=1, column=0, pady=10)
         cancel_button = ttk.Button(search_window, text="Отмена", command=search_window.destroy, width=25)
         cancel_button.grid(row=1, column=1, pady=10)
 
+        results = ttk.Treeview(search_window, columns=('snippet',), height=10)
+        results.heading('#0', text='Озеро')
+        results.heading('snippet', text='Найдено в описании')
+        results.column('#0', width=150, stretch=False)
+        results.column('snippet', width=450)
+        results.bind('<<TreeviewSelect>>', open_result)
+        results.grid(row=2, column=0, columnspan=2, sticky=tk.NSEW, padx=5, pady=5)
+        search_window.rowconfigure(2, weight=1)
+        search_window.columnconfigure(0, weight=1)
+        search_window.columnconfigure(1, weight=1)
+
     def on_resize(self, event: tk.Event) -> None:
         if self.image is None:
             return
-        label_width = self.image_field.winfo_width()
-        label_height = self.image_field.winfo_height()
+        size = (self.image_field.winfo_width(), self.image_field.winfo_height())
+        if size == self.image_size:
+            return
+        if self.resize_task is not None:
+            self.root.after_cancel(self.resize_task)
+        self.resize_task = self.root.after(self.resize_delay, self.render_image)
+        frame = self.image_cache.get(self.image_name, size)
+        if frame is None:
+            frame = self.image_cache.nearest(self.image_name, size)
+            if frame is None:
+                return
+            from PIL import Image
+            with metrics.timer('image.resize_preview'):
+                frame = frame.resize(size, Image.NEAREST)
+        self.show_image(frame)
+
+    def render_image(self) -> None:
+        self.resize_task = None
+        if self.image is None:
+            return
+        size = (self.image_field.winfo_width(), self.image_field.winfo_height())
+        self.image_size = size
+        self.renderer.render('image_field', self.image_name, self.image, size, self.set_widget_image(self.image_field))
 
-        photo = Image.open(io.BytesIO(self.image)).resize((label_width, label_height), Image.BICUBIC)
-        picture = ImageTk.PhotoImage(photo)
-        self.image_field.configure(image=picture)
-        self.image_field.image = picture
+    def show_image(self, frame: Image.Image) -> None:
+        from PIL import ImageTk
+        self.set_widget_image(self.image_field)(ImageTk.PhotoImage(frame))
+
+    @staticmethod
+    def set_widget_image(widget: tk.Label | ttk.Button):
+        def callback(picture: ImageTk.PhotoImage) -> None:
+            if widget.winfo_exists():
+                widget.configure(image=picture)
+                widget.image = picture
+        return callback
+
+    def schedule_search(self) -> None:
+        if self.task is not None:
+            self.root.after_cancel(self.task)
+        self.task = self.root.after(self.search_delay, self.check_value)
 
     def check_value(self) -> None:
+        self.task = None
         text = self.search_entry.get()
-        self.change_listbox(self.list_box, text)
-        self.task = self.root.after(10, self.check_value)
+        if text != self.last_query:
+            self.change_listbox(self.list_box, text)
 
     def on_select(self, event: tk.Event) -> None:
-        try:
-            widget: tk.Listbox = event.widget
-            selection = widget.curselection()
-            name = widget.get(selection)
-            with sq.connect(self.DB_NAME) as connection:
-                cur = connection.cursor()
-                image_url, description = cur.execute("SELECT picture, description FROM lakes WHERE name = ?",
-                                                     (name,)).fetchone()
-
-        except tk.TclError as e:
-            logging.warning(e)
-        else:
-            self.image = image_url
-            self.on_resize(tk.Event())
+        if self.lake_list.selected is not None:
+            self.show_lake(self.lake_list.selected)
 
-            self.text_field.configure(state="normal")
-            self.text_field.delete(1.0, tk.END)
-            self.text_field.insert(tk.END, description)
-            self.text_field.configure(state="disabled")
+    def show_lake(self, name: str) -> None:
+        details = self.catalog.details(name)
+        if details is None:
+            return
+        self.image_name, self.image = self.catalog.image(details)
+        self.image_size = None
+        self.render_image()
+        self.prefetcher.schedule(self.lake_list.source, name, self.image_size)
+
+        self.text_streamer.show(self.text_field, details.description or '', self.preview_chars)
 
     def delete_lake_window(self):
         del_window = tk.Toplevel(name="delete_window")
@@ -324,19 +496,207 @@ class App:
         if name == "Введите название озера..." or name == '':
             messagebox.showerror('Ошибка', 'Поле названия озера не должно быть пустым!')
             return
-        if name not in self.list_of_lakes:
+        if name not in self.lakes:
             messagebox.showerror('Ошибка', f'Озера с названием {name} не существует в базе')
             return
-        with sq.connect(self.DB_NAME) as connection:
-            cur = connection.cursor()
-            cur.execute("DELETE FROM lakes WHERE name = ?", (name,))
-        self.list_of_lakes.remove(name)
-        list_box_values = self.list_box.get(0, tk.END)
-        for i, value in enumerate(list_box_values):
-            if value == name:
-                self.list_box.delete(i)
+        self.catalog.delete(name)
         messagebox.showinfo('Удаление озера', f'"{name}" успешно удалено!')
 
+    # failed, if given, runs on the Tk thread after a cancelled or failed batch has been reported
+    def run_batch(self, title: str, total: int, work: Callable[[Progress], T], finish: Callable[[T], None],
+                  failed: Callable[[], None] | None = None) -> None:
+        cancelled = threading.Event()
+        window = None
+        if total >= self.batch_progress_min:
+            window = tk.Toplevel(name='batch_window')
+            window.title(title)
+            self.pack_window(window)
+            window.resizable(False, False)
+            label = ttk.Label(window, text=f'{title}: 0 из {total}')
+            label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
+            bar = ttk.Progressbar(window, maximum=total, length=300)
+            bar.grid(row=1, column=0, padx=10, pady=5)
+            cancel_button = ttk.Button(window, text="Отмена", command=cancelled.set, width=25)
+            cancel_button.grid(row=2, column=0, pady=10)
+            window.protocol('WM_DELETE_WINDOW', cancelled.set)
+            window.transient(master=self.root)
+            window.grab_set()
+
+        def show_progress(done: int, stage_total: int) -> None:
+            if window.winfo_exists():
+                bar.configure(maximum=stage_total, value=done)
+                label.configure(text=f'{title}: {done} из {stage_total}')
+
+        def progress(done: int, stage_total: int) -> None:
+            if cancelled.is_set():
+                raise BatchCancelled
+            if window is not None:
+                self.root.after(0, show_progress, done, stage_total)
+
+        def finished(result, error: Exception | None) -> None:
+            if window is not None:
+                window.destroy()
+            if isinstance(error, BatchCancelled):
+                messagebox.showinfo(title, 'Операция отменена, изменения не внесены')
+            elif error is not None:
+                logging.warning(error)
+                messagebox.showerror('Ошибка', f'{title}: {error}. Изменения не внесены')
+            else:
+                finish(result)
+                return
+            if failed is not None:
+                failed()
+
+        def run() -> None:
+            try:
+                result = work(progress)
+            except Exception as e:
+                self.root.after(0, finished, None, e)
+            else:
+                self.root.after(0, finished, result, None)
+
+        threading.Thread(target=run, name='batch', daemon=True).start()
+
+    def selected_lakes(self) -> List[str]:
+        names = self.lake_list.selection()
+        if not names:
+            messagebox.showerror('Ошибка', 'Не выбрано ни одного озера')
+        return names
+
+    def refresh_shown_lake(self, names: List[str]) -> None:
+        if self.lake_list.selected in names:
+            self.show_lake(self.lake_list.selected)
+
+    def delete_selected(self) -> None:
+        names = self.selected_lakes()
+        if not names or not messagebox.askyesno('Удаление озер', f'Удалить выбранные озера ({len(names)})?'):
+            return
+
+        def finish(deleted: List[str]) -> None:
+            self.catalog.apply_deleted(deleted)
+            messagebox.showinfo('Удаление озер', f'Удалено озер: {len(deleted)}')
+
+        self.run_batch('Удаление озер', len(names), lambda progress: self.catalog.delete_rows(names, progress),
+                       finish)
+
+    def refetch_selected(self) -> None:
+        names = self.selected_lakes()
+        if not names:
+            return
+        wiki = self.get_wiki()
+
+        def work(progress: Progress) -> (List[str], List[str]):
+            futures = {wiki.request(name): name for name in names}
+            descriptions = {}
+            missing = []
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    text = future.result()
+                    if text is None:
+                        missing.append(futures[future])
+                    else:
+                        descriptions[futures[future]] = text
+                    progress(done, len(names))
+            finally:
+                for future in futures:
+                    future.cancel()
+            return self.catalog.write_descriptions(descriptions, progress), missing
+
+        def finish(result: (List[str], List[str])) -> None:
+            updated, missing = result
+            self.catalog.apply_updated(updated)
+            self.refresh_shown_lake(updated)
+            text = f'Обновлено описаний: {len(updated)}'
+            if missing:
+                text += f'\nНет статьи в википедии: {len(missing)}'
+            messagebox.showinfo('Обновление описаний', text)
+
+        self.run_batch('Обновление описаний', len(names), work, finish)
+
+    def replace_selected_images(self) -> None:
+        names = self.selected_lakes()
+        if not names:
+            return
+        file_path = filedialog.askopenfilename(parent=self.root, filetypes=[("Image files", "*.jpg;*.png;*.jpeg")])
+        if not file_path:
+            return
+        ingest = self.get_ingest()
+
+        def finish(updated: List[str]) -> None:
+            self.catalog.apply_updated(updated)
+            self.refresh_shown_lake(updated)
+            messagebox.showinfo('Замена изображений', f'Изображение заменено у озер: {len(updated)}')
+
+        self.run_batch('Замена изображений', len(names),
+                       lambda progress: self.catalog.write_image(names, ingest.ingest(file_path), progress), finish)
+
+    def connect_to_wikipedia(self, field: tk.Entry, pack_text: tk.Text) -> None:
+        if field.get() != '' and field.get() != "Введите название озера...":
+            self.cancel_wikipedia(pack_text)
+
+            def on_text(piece: str) -> None:
+                self.root.after(0, lambda: self.stream_info_lake(pack_text, future, piece))
+
+            future = self.get_wiki().request(field.get(), on_text)
+            self.wiki_requests[str(pack_text)] = future
+            future.add_done_callback(lambda done: self.root.after(0, self.show_info_lake, pack_text, done))
+        else:
+            tk.messagebox.showerror("Ошибка", "Поле с названием озера не должно быть пустым!")
+
+    def cancel_wikipedia(self, pack_text: tk.Text) -> None:
+        self.wiki_streamed.pop(str(pack_text), None)
+        future = self.wiki_requests.pop(str(pack_text), None)
+        if future is not None:
+            future.cancel()
+
+    def begin_wiki_text(self, pack_text_field: tk.Text) -> None:
+        self.text_streamer.flush(pack_text_field)
+        if pack_text_field.get(0.1, tk.END).strip() == "Введите информацию об озере...":
+            pack_text_field.delete(1.0, tk.END)
+        pack_text_field.configure(foreground='black')
+        pack_text_field.mark_set('wiki_start', 'end-1c')
+        pack_text_field.mark_gravity('wiki_start', tk.LEFT)
+
+    def stream_info_lake(self, pack_text_field: tk.Text, future: Future, piece: str) -> None:
+        if self.wiki_requests.get(str(pack_text_field)) is not future or not pack_text_field.winfo_exists():
+            return
+        streamed = self.wiki_streamed.setdefault(str(pack_text_field), [])
+        if not streamed:
+            self.begin_wiki_text(pack_text_field)
+        streamed.append(piece)
+        self.text_streamer.append(pack_text_field, piece)
+
+    def show_info_lake(self, pack_text_field: tk.Text, future: Future) -> None:
+        streamed = []
+        if self.wiki_requests.get(str(pack_text_field)) is future:
+            del self.wiki_requests[str(pack_text_field)]
+            streamed = self.wiki_streamed.pop(str(pack_text_field), [])
+        import asyncio
+        import aiohttp
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(e)
+            tk.messagebox.showerror("Ошибка", "Нет сетевого подключения!")
+            return
+        if not pack_text_field.winfo_exists():
+            return
+        if result is None:
+            tk.messagebox.showinfo("Ошибка", "Информации о данном озере нет в википедии")
+            pack_text_field.focus_set()
+            return
+        if streamed:
+            if ''.join(streamed) == result:
+                return
+            # joined a download midway or fell back to the cached copy: replace what was streamed
+            self.text_streamer.cancel(pack_text_field)
+            pack_text_field.delete('wiki_start', tk.END)
+        else:
+            self.begin_wiki_text(pack_text_field)
+        self.text_streamer.append(pack_text_field, result)
+
     @staticmethod
     def clear_entry_text(event: tk.Event):
         field: tk.Text = event.widget
@@ -370,35 +730,27 @@ class App:
                 self.image_lake = file_path
             else:
                 self.image_lake_refactor = file_path
-            image = Image.open(file_path)
-            image = image.resize((150, 150))
-            photo = ImageTk.PhotoImage(image)
-            field.configure(image=photo)
-            field.image = photo
+            self.renderer.render(str(field), file_path, file_path, (150, 150), self.set_widget_image(field))
 
     def delete_picture_of_lake(self, field: tk.Button) -> None:
         if field.winfo_name() == 'image_save':
             self.image_lake = None
         else:
             self.image_lake_refactor = None
-        base_image = Image.open("default.png")
-        picture = base_image.resize((150, 150))
-        picture_not_found = ImageTk.PhotoImage(picture)
-        field.configure(image=picture_not_found)
-        field.image = picture_not_found
-
-    def check_image(self, type_image: int) -> bytes:
-        if type_image:
-            image = self.image_lake
-        else:
-            image = self.image_lake_refactor
-        if image is not None:
-            with open(image, 'rb') as image_file:
-                image_data = image_file.read()
-        else:
-            with open('default.png', 'rb') as image_file:
-                image_data = image_file.read()
-        return image_data
+        self.renderer.render(str(field), 'default.png', 'default.png', (150, 150), self.set_widget_image(field))
+
+    # decoding and re-encoding a camera photo freezes the window for seconds, so the image is ingested
+    # on a worker thread and save(images) runs back on the Tk thread
+    def ingest_image(self, title: str, image: str | None, save: Callable[[tuple], None],
+                     failed: Callable[[], None]) -> None:
+        ingest = self.get_ingest()
+        self.run_batch(title, 1, lambda progress: ingest.ingest(image), save, failed)
+
+    def get_ingest(self) -> ImageIngest:
+        if self.ingest is None:
+            from image_ingest import ImageIngest
+            self.ingest = ImageIngest.from_config(self.config)
+        return self.ingest
 
     def add_lake(self):
         def save_data():
@@ -407,43 +759,50 @@ class App:
                 tk.messagebox.showerror("Ошибка", "Обязательное поле: название озера")
                 return
             else:
-                try:
-                    with sq.connect(self.DB_NAME) as con:
-                        cur = con.cursor()
-                        image_data = self.check_image(1)
-                        text_about_lake = text_field_about_lake.get(1.0, tk.END)
-                        if text_about_lake.strip() == 'Введите информацию об озере...':
-                            text_about_lake = 'Нет информации'
-                        cur.execute("INSERT INTO lakes (name, picture, description) VALUES (?, ?, ?) ",
-                                    (name_of_lake, image_data,
-                                     text_about_lake))
-                except sq.OperationalError as e:
-                    logging.warning(e)
-                    tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
-                    add_form.focus_set()
-                except sq.IntegrityError as e:
-                    logging.warning(e)
-                    tk.messagebox.showerror('Ошибка', f'Озеро с названием {name_of_lake} уже существует в базе данных')
-                    add_form.focus_set()
-                else:
-                    self.update_list_box()
-                    messagebox.showinfo('Результат', 'Озеро успешно добавлено в базу')
+                self.text_streamer.flush(text_field_about_lake)
+                text_about_lake = text_field_about_lake.get(1.0, tk.END)
+                if text_about_lake.strip() == 'Введите информацию об озере...':
+                    text_about_lake = 'Нет информации'
+                save_button.configure(state=tk.DISABLED)
+                self.ingest_image('Добавление озера', self.image_lake,
+                                  lambda images: save_lake(name_of_lake, text_about_lake, images), enable_save)
+
+        def save_lake(name_of_lake: str, text_about_lake: str, images: tuple) -> None:
+            enable_save()
+            try:
+                self.catalog.add(name_of_lake, text_about_lake, images)
+            except sq.OperationalError as e:
+                logging.warning(e)
+                tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
+                focus_form()
+            except sq.IntegrityError as e:
+                logging.warning(e)
+                tk.messagebox.showerror('Ошибка', f'Озеро с названием {name_of_lake} уже существует в базе данных')
+                focus_form()
+            else:
+                messagebox.showinfo('Результат', 'Озеро успешно добавлено в базу')
+                if add_form.winfo_exists():
                     add_form.destroy()
 
+        # the form may have been closed while the image was being ingested
+        def enable_save() -> None:
+            if save_button.winfo_exists():
+                save_button.configure(state=tk.NORMAL)
+
+        def focus_form() -> None:
+            if add_form.winfo_exists():
+                add_form.focus_set()
+
         add_form = tk.Toplevel(name='add_window')
         self.pack_window(add_form)
         add_form.title("Ввод информации о озере")
         add_form.resizable(False, False)
 
-        image = Image.open("default.png")
-        image = image.resize((150, 150))
-        photo = ImageTk.PhotoImage(image)
-
         open_file_button = ttk.Button(add_form, text="Обзор...",
                                       command=lambda: self.open_file_dialog(add_form, open_file_button),
-                                      image=photo,
                                       name='image_save')
-        open_file_button.image = photo
+        self.renderer.render(str(open_file_button), 'default.png', 'default.png', (150, 150),
+                             self.set_widget_image(open_file_button))
         open_file_button.grid(row=0, column=0, columnspan=2, padx=5, pady=5)
         delete_image = ttk.Button(add_form, text="\u2715",
                                   command=lambda: self.delete_picture_of_lake(open_file_button),
@@ -468,6 +827,7 @@ class App:
         text_field_about_lake.bind("<Control-c>", lambda event: self.text_field.event_generate("<<Copy>>"))
         text_field_about_lake.bind("<FocusIn>", self.clear_entry_text)
         text_field_about_lake.bind('<FocusOut>', self.set_hint_text)
+        text_field_about_lake.bind('<Destroy>', lambda event: self.cancel_wikipedia(text_field_about_lake))
         text_field_about_lake.grid(row=2, column=0, columnspan=2, sticky=tk.S)
         delete_lake_about = ttk.Button(add_form, text="\u2715",
                                        command=lambda: self.delete_info_about_lake(text_field_about_lake,
@@ -476,8 +836,8 @@ class App:
         delete_lake_about.grid(row=2, column=1, padx=5, pady=10, sticky=tk.NE)
 
         button_about_lake = ttk.Button(add_form, text="Взять информацию об озере из википедии",
-                                       command=lambda: connect_to_wikipedia(lake_name_entry,
-                                                                            text_field_about_lake))
+                                       command=lambda: self.connect_to_wikipedia(lake_name_entry,
+                                                                                 text_field_about_lake))
         button_about_lake.grid(row=3, column=0, columnspan=2, padx=5, pady=10)
 
         save_button = ttk.Button(add_form, text="Сохранить", command=save_data, width=25)
@@ -493,62 +853,72 @@ class App:
             if combo_box.current() == 0:
                 return
             else:
-                name_update = self.list_of_lakes[combo_box.current() - 1]
+                name_update = combo_box.get()
             if name_of_lake in ('', "Введите название озера..."):
                 tk.messagebox.showerror("Ошибка", "Обязательное поле: название озера")
             else:
-                try:
-                    with sq.connect(self.DB_NAME) as con:
-                        cur = con.cursor()
-
-                        text_about_lake = text_field_about_lake_refactor.get(1.0, tk.END)
-                        if text_about_lake.strip() == 'Введите информацию об озере...':
-                            text_about_lake = 'Нет информации'
-                        if self.image_lake_refactor is None or self.image_lake_refactor == 'default.png':
-                            cur.execute("UPDATE lakes SET name = ?, description = ? WHERE name = ? ",
-                                        (name_of_lake,
-                                         text_about_lake, name_update))
-                        else:
-                            image_data = self.check_image(0)
-                            cur.execute("UPDATE lakes SET name = ?, picture = ?, description = ? WHERE name = ? ",
-                                        (name_of_lake, image_data,
-                                         text_about_lake, name_update))
-                except sq.OperationalError as e:
-                    logging.warning(e)
-                    tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
-                    refactor_form.focus_set()
-                except sq.IntegrityError as e:
-                    logging.warning(e)
-                    tk.messagebox.showerror('Ошибка', f'Озеро с названием {name_of_lake} уже существует в базе данных')
-                    refactor_form.focus_set()
-                else:
-                    self.update_list_box()
-                    messagebox.showinfo('Результат', 'Изменения успешно применены')
+                self.text_streamer.flush(text_field_about_lake_refactor)
+                text_about_lake = text_field_about_lake_refactor.get(1.0, tk.END)
+                if text_about_lake.strip() == 'Введите информацию об озере...':
+                    text_about_lake = 'Нет информации'
+                if self.image_lake_refactor is None or self.image_lake_refactor == 'default.png':
+                    save_changes(name_update, name_of_lake, text_about_lake, None)
+                    return
+                save_button.configure(state=tk.DISABLED)
+                self.ingest_image('Изменение озера', self.image_lake_refactor,
+                                  lambda images: save_changes(name_update, name_of_lake, text_about_lake, images),
+                                  enable_save)
+
+        def save_changes(name_update: str, name_of_lake: str, text_about_lake: str, images: tuple | None) -> None:
+            enable_save()
+            try:
+                self.catalog.update(name_update, name_of_lake, text_about_lake, images)
+            except sq.OperationalError as e:
+                logging.warning(e)
+                tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
+                focus_form()
+            except sq.IntegrityError as e:
+                logging.warning(e)
+                tk.messagebox.showerror('Ошибка', f'Озеро с названием {name_of_lake} уже существует в базе данных')
+                focus_form()
+            except KeyError as e:
+                logging.warning(e)
+                tk.messagebox.showerror('Ошибка', f'Озеро {name_update} уже удалено из базы данных')
+                focus_form()
+            else:
+                messagebox.showinfo('Результат', 'Изменения успешно применены')
+                if refactor_form.winfo_exists():
                     refactor_form.destroy()
 
+        # the form may have been closed while the image was being ingested
+        def enable_save() -> None:
+            if save_button.winfo_exists():
+                save_button.configure(state=tk.NORMAL)
+
+        def focus_form() -> None:
+            if refactor_form.winfo_exists():
+                refactor_form.focus_set()
+
         def selected(event):
             if combo_box.current() == 0:
                 return
             box: ttk.Combobox = event.widget
             name = box.get()
             try:
-                with sq.connect(self.DB_NAME) as connection:
-                    cur = connection.cursor()
-                    image_url, description = cur.execute("SELECT picture, description FROM lakes WHERE name = ?",
-                                                         (name,)).fetchone()
+                details = self.catalog.details(name)
             except sq.OperationalError as e:
                 logging.warning(e)
                 tk.messagebox.showerror('Ошибка', 'Нет подключения к базе данных')
             else:
-                photo_selected = Image.open(io.BytesIO(image_url)).resize((150, 150), Image.BICUBIC)
-                picture = ImageTk.PhotoImage(photo_selected)
-                refactor_file_button.configure(image=picture)
-                refactor_file_button.image = picture
+                if details is None:
+                    return
+                key, source = self.catalog.image(details, 'thumbnail')
+                self.renderer.render(str(refactor_file_button), key, source, (150, 150),
+                                     self.set_widget_image(refactor_file_button))
                 lake_name_entry_refactor.delete(0, tk.END)
                 lake_name_entry_refactor.insert(0, name)
                 lake_name_entry_refactor.configure(foreground='black')
-                text_field_about_lake_refactor.delete(1.0, tk.END)
-                text_field_about_lake_refactor.insert(tk.END, description)
+                self.text_streamer.show(text_field_about_lake_refactor, details.description or '')
                 text_field_about_lake_refactor.configure(foreground='black')
 
         refactor_form = tk.Toplevel(name='refactor_window')
@@ -556,24 +926,21 @@ class App:
         refactor_form.title("Ввод информации о озере")
         refactor_form.resizable(False, False)
 
-        image = Image.open("default.png")
-        image = image.resize((150, 150))
-        photo = ImageTk.PhotoImage(image)
-
         refactor_file_button = ttk.Button(refactor_form, text="Обзор...",
                                           command=lambda: self.open_file_dialog(refactor_form, refactor_file_button),
-                                          image=photo,
                                           name='image_refactor')
-        refactor_file_button.image = photo
+        self.renderer.render(str(refactor_file_button), 'default.png', 'default.png', (150, 150),
+                             self.set_widget_image(refactor_file_button))
         refactor_file_button.grid(row=0, column=0, columnspan=2, padx=5, pady=5)
         delete_picture = ttk.Button(refactor_form, text="\u2715",
                                     command=lambda: self.delete_picture_of_lake(refactor_file_button),
                                     width=2)
         delete_picture.grid(row=0, column=1, padx=50, pady=10, sticky=tk.NW)
 
-        combo_box = ttk.Combobox(refactor_form, values=['Выберите озеро'] + self.list_of_lakes, state="readonly",
+        combo_box = ttk.Combobox(refactor_form, state="readonly",
                                  width=10,
                                  foreground='gray')
+        ComboboxValues(combo_box, self.lakes, 'Выберите озеро')
         combo_box.current(0)
         combo_box.grid(row=0, column=0, padx=10, pady=10, sticky=tk.NW)
         combo_box.bind("<<ComboboxSelected>>", selected)
@@ -598,6 +965,8 @@ class App:
         text_field_about_lake_refactor.bind("<Control-c>", lambda event: self.text_field.event_generate("<<Copy>>"))
         text_field_about_lake_refactor.bind("<FocusIn>", self.clear_entry_text)
         text_field_about_lake_refactor.bind('<FocusOut>', self.set_hint_text)
+        text_field_about_lake_refactor.bind('<Destroy>',
+                                            lambda event: self.cancel_wikipedia(text_field_about_lake_refactor))
         text_field_about_lake_refactor.grid(row=2, column=0, columnspan=2, sticky=tk.S)
         delete_about_lake = ttk.Button(refactor_form, text="\u2715",
                                        command=lambda: self.delete_info_about_lake(text_field_about_lake_refactor,
@@ -606,8 +975,8 @@ class App:
         delete_about_lake.grid(row=2, column=1, padx=5, pady=10, sticky=tk.NE)
 
         button_about_lake = ttk.Button(refactor_form, text="Взять информацию об озере из википедии",
-                                       command=lambda: connect_to_wikipedia(lake_name_entry_refactor,
-                                                                            text_field_about_lake_refactor))
+                                       command=lambda: self.connect_to_wikipedia(lake_name_entry_refactor,
+                                                                                 text_field_about_lake_refactor))
         button_about_lake.grid(row=3, column=0, columnspan=2, padx=5, pady=10)
 
         save_button = ttk.Button(refactor_form, text="Сохранить", command=update_data, width=25)
@@ -618,4 +987,9 @@ class App:
 
 
 if __name__ == '__main__':
-    App('AmDB.ini')
+    parser = argparse.ArgumentParser(description='Известные озера России')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--startup-profile', action='store_true', help='вывести время этапов запуска')
+    parser.add_argument('--metrics', action='store_true', help='собирать время обработчиков, запросов и изображений')
+    args = parser.parse_args()
+    App(args.config, args.startup_profile, args.metrics)
@@ -0,0 +1,137 @@
+import argparse
+import configparser
+import pathlib
+import queue
+import sqlite3 as sq
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+# lakes that the Wikipedia tools fill in unless told to overwrite everything
+EMPTY_DESCRIPTION = "description IS NULL OR trim(description, ' \t\r\n') IN ('', 'Нет информации')"
+
+
+class Database:
+    # auto_vacuum only takes effect on a new file before anything writes its header, including the switch to WAL
+    PRAGMAS = (
+        "PRAGMA auto_vacuum = INCREMENTAL",
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -16000",
+        "PRAGMA mmap_size = 268435456",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA busy_timeout = 5000",
+    )
+    # a reader must leave the file as it is: no header writes, no journal mode switch
+    READ_ONLY_PRAGMAS = ("PRAGMA query_only = ON",) + PRAGMAS[3:]
+
+    def __init__(self, path: str, pool_size: int = 4, cached_statements: int = 256, read_only: bool = False):
+        self.path = path
+        self.read_only = read_only
+        self.cached_statements = cached_statements
+        self.owner = threading.get_ident()
+        self.connection = self.connect()
+        self.pool: queue.Queue[sq.Connection] = queue.Queue()
+        self.pool_size = pool_size
+        self.pool_created = 0
+        self.pool_lock = threading.Lock()
+
+    def connect(self, check_same_thread: bool = True) -> sq.Connection:
+        if self.read_only:
+            connection = sq.connect(pathlib.Path(self.path).absolute().as_uri() + '?mode=ro', uri=True,
+                                    isolation_level=None, cached_statements=self.cached_statements,
+                                    check_same_thread=check_same_thread)
+        else:
+            connection = sq.connect(self.path, isolation_level=None, cached_statements=self.cached_statements,
+                                    check_same_thread=check_same_thread)
+        for pragma in self.READ_ONLY_PRAGMAS if self.read_only else self.PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    def execute(self, sql: str, parameters: Sequence = ()) -> sq.Cursor:
+        return self.connection.execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters: Iterator[Sequence]) -> sq.Cursor:
+        return self.connection.executemany(sql, parameters)
+
+    @contextmanager
+    def transaction(self, connection: Optional[sq.Connection] = None) -> Iterator[sq.Connection]:
+        connection = connection or self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+    @contextmanager
+    def pooled(self) -> Iterator[sq.Connection]:
+        if threading.get_ident() == self.owner:
+            yield self.connection
+            return
+        try:
+            connection = self.pool.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                create = self.pool_created < self.pool_size
+                if create:
+                    self.pool_created += 1
+            connection = self.connect(check_same_thread=False) if create else self.pool.get()
+        try:
+            yield connection
+        finally:
+            self.pool.put(connection)
+
+    def close(self) -> None:
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+        self.connection.close()
+
+
+# what a selection in the app reads: the description from lakes and the picture from the images store
+def read_selection(connection: sq.Connection, name: str) -> Optional[bytes]:
+    row = connection.execute("SELECT image_id, description FROM lakes WHERE name = ?", (name,)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    with connection.blobopen('images', 'picture', row[0], readonly=True) as blob:
+        return blob.read()
+
+
+def time_selections(path: str, repeat: int) -> None:
+    connection = sq.connect(path)
+    names = [row[0] for row in connection.execute("SELECT name FROM lakes ORDER BY random() LIMIT ?", (repeat,))]
+    connection.close()
+    if not names:
+        print('Таблица lakes пуста')
+        return
+
+    start = time.perf_counter()
+    for name in names:
+        with sq.connect(path) as connection:
+            read_selection(connection, name)
+        connection.close()
+    fresh = (time.perf_counter() - start) / len(names)
+
+    database = Database(path)
+    start = time.perf_counter()
+    for name in names:
+        read_selection(database.connection, name)
+    persistent = (time.perf_counter() - start) / len(names)
+    database.close()
+
+    print(f'Выборок: {len(names)}')
+    print(f'Новое подключение на выборку: {fresh * 1000:.3f} мс')
+    print(f'Постоянное подключение:       {persistent * 1000:.3f} мс')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Замер задержки выбора озера')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    time_selections(config.get('database', 'database_file'), args.repeat)
@@ -0,0 +1,89 @@
+import re
+import sqlite3 as sq
+from typing import List, Optional, Tuple
+
+from database import Database
+
+FTS_TRIGGERS = ('lakes_fts_insert', 'lakes_fts_delete', 'lakes_fts_update')
+# snippet() marks matches with control characters, which cannot clash with the text, and restore_snippet
+# turns them into the marks shown to the user
+SNIPPET_MARKS = {'\x02': '«', '\x03': '»', '\x04': '…'}
+
+
+def fold_sql(column: str) -> str:
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def fold_text(text: str) -> str:
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def fold_name(text: str) -> str:
+    return fold_text(text.casefold())
+
+
+def ensure_fts(database: Database) -> None:
+    exists = database.execute("SELECT 1 FROM sqlite_master WHERE name = 'lakes_fts'").fetchone()
+    with database.transaction() as connection:
+        connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lakes_fts USING fts5("
+                           "name, description, tokenize = 'unicode61 remove_diacritics 2')")
+        create_fts_triggers(connection)
+        if not exists:
+            rebuild_fts(connection)
+
+
+def create_fts_triggers(connection: sq.Connection) -> None:
+    connection.execute(f"CREATE TRIGGER IF NOT EXISTS lakes_fts_insert AFTER INSERT ON lakes BEGIN "
+                       f"INSERT INTO lakes_fts (rowid, name, description) "
+                       f"VALUES (NEW.rowid, {fold_sql('NEW.name')}, {fold_sql('NEW.description')}); END")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS lakes_fts_delete AFTER DELETE ON lakes BEGIN "
+                       "DELETE FROM lakes_fts WHERE rowid = OLD.rowid; END")
+    connection.execute(f"CREATE TRIGGER IF NOT EXISTS lakes_fts_update AFTER UPDATE OF name, description "
+                       f"ON lakes BEGIN "
+                       f"UPDATE lakes_fts SET name = {fold_sql('NEW.name')}, "
+                       f"description = {fold_sql('NEW.description')} WHERE rowid = NEW.rowid; END")
+
+
+def rebuild_fts(connection: sq.Connection) -> None:
+    connection.execute("DELETE FROM lakes_fts")
+    connection.execute(f"INSERT INTO lakes_fts (rowid, name, description) "
+                       f"SELECT rowid, {fold_sql('name')}, {fold_sql('description')} FROM lakes")
+
+
+def fts_query(text: str) -> str:
+    return ' '.join(f'"{token}"*' for token in re.findall(r'\w+', fold_text(text)))
+
+
+def search(connection: sq.Connection, text: str, limit: int = 50) -> List[Tuple[str, str]]:
+    query = fts_query(text)
+    if not query:
+        return []
+    rows = connection.execute("SELECT lakes.name, lakes.description, "
+                              "snippet(lakes_fts, 1, char(2), char(3), char(4), 12) "
+                              "FROM lakes_fts JOIN lakes ON lakes.rowid = lakes_fts.rowid "
+                              "WHERE lakes_fts MATCH ? ORDER BY bm25(lakes_fts, 10.0, 1.0) LIMIT ?",
+                              (query, limit)).fetchall()
+    return [(name, restore_snippet(snippet, description)) for name, description, snippet in rows]
+
+
+def search_names(connection: sq.Connection, text: str, limit: int = 10000) -> List[str]:
+    query = fts_query(text)
+    if not query:
+        return []
+    return [row[0] for row in connection.execute("SELECT lakes.name FROM lakes_fts "
+                                                 "JOIN lakes ON lakes.rowid = lakes_fts.rowid "
+                                                 "WHERE lakes_fts MATCH ? ORDER BY lakes.name LIMIT ?",
+                                                 (f'name : ({query})', limit))]
+
+
+# the index holds fold_text(description), which has the same length as the description,
+# so the snippet is located in the folded text and its characters are taken from the original
+def restore_snippet(snippet: Optional[str], description: Optional[str]) -> str:
+    if not snippet:
+        return ''
+    plain = ''.join(char for char in snippet if char not in SNIPPET_MARKS)
+    offset = fold_text(description or '').find(plain)
+    if offset < 0:
+        return ''.join(SNIPPET_MARKS.get(char, char) for char in snippet)
+    original = iter(description[offset:offset + len(plain)])
+    return ''.join(SNIPPET_MARKS[char] if char in SNIPPET_MARKS else next(original) for char in snippet)
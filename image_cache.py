@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+Size = Tuple[int, int]
+
+
+def image_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class ImageCache:
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.frames: OrderedDict[Tuple[Hashable, Optional[Size]], Image.Image] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, lake: Hashable, size: Optional[Size]) -> Optional[Image.Image]:
+        with self.lock:
+            frame = self.frames.get((lake, size))
+            if frame is not None:
+                self.frames.move_to_end((lake, size))
+            return frame
+
+    def put(self, lake: Hashable, size: Optional[Size], frame: Image.Image) -> None:
+        cost = image_bytes(frame)
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            old = self.frames.pop((lake, size), None)
+            if old is not None:
+                self.used_bytes -= image_bytes(old)
+            self.frames[(lake, size)] = frame
+            self.used_bytes += cost
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.used_bytes -= image_bytes(evicted)
+
+    def nearest(self, lake: Hashable, size: Size) -> Optional[Image.Image]:
+        best = None
+        best_distance = None
+        with self.lock:
+            for (key, frame_size), frame in self.frames.items():
+                if key != lake or frame_size is None:
+                    continue
+                distance = abs(frame_size[0] - size[0]) + abs(frame_size[1] - size[1])
+                if best_distance is None or distance < best_distance:
+                    best, best_distance = frame, distance
+        return best
+
+    def discard(self, lake: Hashable) -> None:
+        with self.lock:
+            for key in [key for key in self.frames if key[0] == lake]:
+                self.used_bytes -= image_bytes(self.frames.pop(key))
+
+    def clear(self) -> None:
+        with self.lock:
+            self.frames.clear()
+            self.used_bytes = 0
@@ -0,0 +1,109 @@
+import argparse
+import configparser
+import io
+import os
+from typing import Optional, Tuple, Union
+
+from PIL import Image, ImageOps, features
+
+from database import Database
+from image_store import ImageStore
+
+DEFAULT_PICTURE = 'default.png'
+ORIENTATION = 0x0112
+
+
+class ImageIngest:
+
+    def __init__(self, max_side: int = 1600, thumbnail_side: int = 150, image_format: str = 'WEBP',
+                 quality: int = 85):
+        self.max_side = max_side
+        self.thumbnail_side = thumbnail_side
+        self.format = image_format if features.check(image_format.lower()) else 'JPEG'
+        self.quality = quality
+        with open(DEFAULT_PICTURE, 'rb') as image_file:
+            self.default_picture = image_file.read()
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'ImageIngest':
+        return cls(int(config.get('images', 'max_side', fallback='1600')),
+                   int(config.get('images', 'thumbnail_side', fallback='150')),
+                   config.get('images', 'format', fallback='WEBP'),
+                   int(config.get('images', 'quality', fallback='85')))
+
+    def encode(self, image: Image.Image) -> bytes:
+        if self.format == 'JPEG' or 'A' not in image.getbands():
+            image = image.convert('RGB')
+        else:
+            image = image.convert('RGBA')
+        buffer = io.BytesIO()
+        image.save(buffer, self.format, quality=self.quality)
+        return buffer.getvalue()
+
+    def ingest(self, source: Union[bytes, str, None]) -> Tuple[Optional[bytes], Optional[bytes]]:
+        if source is None or source == DEFAULT_PICTURE:
+            return None, None
+        if isinstance(source, str):
+            with open(source, 'rb') as image_file:
+                source = image_file.read()
+        if source == self.default_picture:
+            return None, None
+        image = Image.open(io.BytesIO(source))
+        keep = (image.format == self.format and max(image.size) <= self.max_side
+                and image.getexif().get(ORIENTATION, 1) == 1)
+        image.draft('RGB', (self.max_side, self.max_side))
+        image = ImageOps.exif_transpose(image)
+        if keep:
+            picture = source
+        else:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            picture = self.encode(image)
+        image.thumbnail((self.thumbnail_side, self.thumbnail_side), Image.LANCZOS)
+        return picture, self.encode(image)
+
+
+def migrate(database: Database, ingest: ImageIngest, batch_size: int = 100, vacuum: bool = False) -> None:
+    file_before = os.path.getsize(database.path)
+    ImageStore(database).ensure_schema()
+    blobs_before = database.execute("SELECT coalesce(sum(length(picture)), 0) FROM images").fetchone()[0]
+    last_id = 0
+    processed = 0
+    while True:
+        rows = database.execute("SELECT id, picture FROM images WHERE id > ? AND thumbnail IS NULL "
+                                "ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        with database.transaction() as connection:
+            for image_id, picture in rows:
+                try:
+                    picture, thumbnail = ingest.ingest(picture)
+                except (OSError, ValueError) as e:
+                    print(f'Изображение #{image_id} не прочитано ({e})')
+                    continue
+                new_id = ImageStore.put(connection, picture, thumbnail)
+                connection.execute("UPDATE lakes SET image_id = ? WHERE image_id = ?", (new_id, image_id))
+        processed += len(rows)
+        last_id = rows[-1][0]
+        print(f'Обработано изображений: {processed}')
+    blobs_after = database.execute("SELECT coalesce(sum(length(picture) + coalesce(length(thumbnail), 0)), 0) "
+                                   "FROM images").fetchone()[0]
+    if vacuum:
+        database.execute("VACUUM")
+    database.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    file_after = os.path.getsize(database.path)
+    print(f'Изображения: {blobs_before / 2 ** 20:.1f} МБ -> {blobs_after / 2 ** 20:.1f} МБ, '
+          f'сэкономлено {(blobs_before - blobs_after) / 2 ** 20:.1f} МБ')
+    print(f'Файл базы: {file_before / 2 ** 20:.1f} МБ -> {file_after / 2 ** 20:.1f} МБ')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересжатие изображений озер')
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--vacuum', action='store_true', help='сжать файл базы после миграции')
+    args = parser.parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    database = Database(config.get('database', 'database_file'))
+    migrate(database, ImageIngest.from_config(config), vacuum=args.vacuum)
+    database.close()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import functools
+import io
+import logging
+import sqlite3 as sq
+import threading
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Callable, ContextManager, Dict, Hashable, Optional, Union
+
+from image_cache import ImageCache, Size
+from profiling import metrics
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+ImageSource = Union[bytes, str, Callable[[], ContextManager[BinaryIO]]]
+SHARED_IMAGES = ('default.png', '!.jpeg')
+
+
+@functools.lru_cache(maxsize=None)
+def shared_image(path: str) -> Image.Image:
+    from PIL import Image
+    image = Image.open(path)
+    image.load()
+    return image
+
+
+def decode_image(source: ImageSource, size: Size, resample: Optional[int] = None) -> Image.Image:
+    from PIL import Image
+    if resample is None:
+        resample = Image.BICUBIC
+    if callable(source):
+        with source() as stream:
+            return decode_image(stream, size, resample)
+    if isinstance(source, str) and source in SHARED_IMAGES:
+        return shared_image(source).resize(size, resample, reducing_gap=2.0)
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    image.draft('RGB', size)
+    return image.resize(size, resample, reducing_gap=2.0)
+
+
+class ImageRenderer:
+
+    def __init__(self, root: tk.Misc, cache: ImageCache, workers: int = 2):
+        self.root = root
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self.generations: Dict[Hashable, int] = {}
+        self.pending: Dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+
+    def render(self, slot: Hashable, key: Hashable, source: Optional[ImageSource], size: Size,
+               callback: Callable[[ImageTk.PhotoImage], None]) -> None:
+        generation = self.cancel(slot)
+        frame = self.cache.get(key, size)
+        if frame is not None:
+            from PIL import ImageTk
+            callback(ImageTk.PhotoImage(frame))
+            return
+        if source is None:
+            return
+        self.pending[slot] = self.executor.submit(self.job, slot, generation, key, source, size, callback)
+
+    def cancel(self, slot: Hashable) -> int:
+        with self.lock:
+            generation = self.generations.get(slot, 0) + 1
+            self.generations[slot] = generation
+        future = self.pending.pop(slot, None)
+        if future is not None:
+            future.cancel()
+        return generation
+
+    def is_current(self, slot: Hashable, generation: int) -> bool:
+        with self.lock:
+            return self.generations.get(slot) == generation
+
+    def job(self, slot: Hashable, generation: int, key: Hashable, source: ImageSource, size: Size,
+            callback: Callable[[ImageTk.PhotoImage], None]) -> None:
+        if not self.is_current(slot, generation):
+            return
+        try:
+            with metrics.timer('image.decode'):
+                frame = decode_image(source, size)
+        except (OSError, ValueError, sq.Error) as e:
+            logging.warning(e)
+            return
+        self.cache.put(key, size, frame)
+        if self.is_current(slot, generation):
+            self.root.after(0, self.deliver, slot, generation, frame, callback)
+
+    def deliver(self, slot: Hashable, generation: int, frame: Image.Image,
+                callback: Callable[[ImageTk.PhotoImage], None]) -> None:
+        if not self.is_current(slot, generation):
+            return
+        self.pending.pop(slot, None)
+        from PIL import ImageTk
+        try:
+            callback(ImageTk.PhotoImage(frame))
+        except tk.TclError as e:
+            logging.warning(e)
+
+    def shutdown(self) -> None:
+        for slot in list(self.pending):
+            self.cancel(slot)
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,107 @@
+import argparse
+import configparser
+import hashlib
+import sqlite3 as sq
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Iterator, Optional
+
+from database import Database
+
+
+def image_extension(head: bytes) -> str:
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if head[:3] == b'\xff\xd8\xff':
+        return 'jpg'
+    if head[:4] == b'GIF8':
+        return 'gif'
+    return 'bin'
+
+
+class ImageStore:
+
+    def __init__(self, database: Database):
+        self.database = database
+
+    def ensure_schema(self) -> None:
+        self.database.execute("CREATE TABLE IF NOT EXISTS images ("
+                              "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                              "hash TEXT NOT NULL UNIQUE, "
+                              "picture BLOB NOT NULL, "
+                              "thumbnail BLOB)")
+        columns = self.lake_columns()
+        if 'image_id' not in columns:
+            self.database.execute("ALTER TABLE lakes ADD COLUMN image_id INTEGER REFERENCES images (id)")
+        self.database.execute("CREATE INDEX IF NOT EXISTS lakes_image_idx ON lakes (image_id)")
+        self.database.execute("CREATE TRIGGER IF NOT EXISTS lakes_image_delete AFTER DELETE ON lakes "
+                              "WHEN OLD.image_id IS NOT NULL BEGIN "
+                              "DELETE FROM images WHERE id = OLD.image_id "
+                              "AND NOT EXISTS (SELECT 1 FROM lakes WHERE image_id = OLD.image_id); END")
+        self.database.execute("CREATE TRIGGER IF NOT EXISTS lakes_image_update AFTER UPDATE OF image_id ON lakes "
+                              "WHEN OLD.image_id IS NOT NULL AND OLD.image_id IS NOT NEW.image_id BEGIN "
+                              "DELETE FROM images WHERE id = OLD.image_id "
+                              "AND NOT EXISTS (SELECT 1 FROM lakes WHERE image_id = OLD.image_id); END")
+        if 'picture' in columns:
+            self.migrate('thumbnail' in columns)
+
+    def lake_columns(self) -> list:
+        return [row[1] for row in self.database.execute("PRAGMA table_info(lakes)")]
+
+    def migrate(self, with_thumbnail: bool, batch_size: int = 100) -> int:
+        thumbnail = 'thumbnail' if with_thumbnail else 'NULL'
+        moved = 0
+        while True:
+            rows = self.database.execute(f"SELECT rowid, picture, {thumbnail} FROM lakes "
+                                         f"WHERE picture IS NOT NULL LIMIT ?", (batch_size,)).fetchall()
+            if not rows:
+                return moved
+            with self.database.transaction() as connection:
+                for rowid, picture, thumbnail_data in rows:
+                    image_id = self.put(connection, picture, thumbnail_data)
+                    connection.execute(f"UPDATE lakes SET image_id = ?, picture = NULL"
+                                       f"{', thumbnail = NULL' if with_thumbnail else ''} WHERE rowid = ?",
+                                       (image_id, rowid))
+            moved += len(rows)
+
+    @staticmethod
+    def put(connection: sq.Connection, picture: Optional[bytes], thumbnail: Optional[bytes]) -> Optional[int]:
+        if picture is None:
+            return None
+        digest = hashlib.sha256(picture).hexdigest()
+        # a picture stored before thumbnails were generated picks its thumbnail up on the next save
+        connection.execute("INSERT INTO images (hash, picture, thumbnail) VALUES (?, ?, ?) "
+                           "ON CONFLICT (hash) DO UPDATE SET thumbnail = excluded.thumbnail "
+                           "WHERE images.thumbnail IS NULL AND excluded.thumbnail IS NOT NULL",
+                           (digest, picture, thumbnail))
+        return connection.execute("SELECT id FROM images WHERE hash = ?", (digest,)).fetchone()[0]
+
+    @contextmanager
+    def open(self, image_id: int, column: str = 'picture') -> Iterator[sq.Blob]:
+        with self.database.pooled() as connection:
+            if column == 'thumbnail':
+                row = connection.execute("SELECT thumbnail IS NULL FROM images WHERE id = ?", (image_id,)).fetchone()
+                if row is None or row[0]:
+                    column = 'picture'
+            with connection.blobopen('images', column, image_id, readonly=True) as blob:
+                yield blob
+
+    def opener(self, image_id: int, column: str = 'picture') -> Callable[[], ContextManager[sq.Blob]]:
+        return lambda: self.open(image_id, column)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перенос изображений озер в общее хранилище')
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--config', default='AmDB.ini')
+    args = parser.parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    database = Database(config.get('database', 'database_file'))
+    store = ImageStore(database)
+    store.ensure_schema()
+    stored, size = database.execute("SELECT count(*), coalesce(sum(length(picture)), 0) FROM images").fetchone()
+    referenced = database.execute("SELECT count(*) FROM lakes WHERE image_id IS NOT NULL").fetchone()[0]
+    print(f'Уникальных изображений: {stored} ({size / 2 ** 20:.1f} МБ), ссылок из lakes: {referenced}')
+    database.close()
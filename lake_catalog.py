@@ -0,0 +1,333 @@
+import sqlite3 as sq
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import full_text
+import maintenance
+from database import Database
+from image_pipeline import ImageSource
+from image_store import ImageStore
+from lake_model import LakeModel, Snapshot
+from profiling import metrics
+from search_index import PendingIndex, SearchIndex, scan
+
+DEFAULT_PICTURE = 'default.png'
+BATCH_CHUNK = 500
+SEARCH_LIMIT = 10000
+
+# progress(done, total) is called after every chunk of a batch; raising from it rolls the batch back
+Progress = Callable[[int, int], None]
+
+
+class BatchCancelled(Exception):
+    pass
+
+
+class LakeDetails(NamedTuple):
+    rowid: int
+    image_id: Optional[int]
+    description: Optional[str]
+
+
+def details_bytes(details: LakeDetails) -> int:
+    return len(details.description or '') * 2 + 64
+
+
+# a reader takes version(rowid) before its SELECT and hands it to put: discard and clear bump the version,
+# so details read before an edit committed are dropped instead of cached after the edit
+class DetailsCache:
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries: OrderedDict[int, LakeDetails] = OrderedDict()
+        self.epoch = 0
+        self.versions: Dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    def version(self, rowid: int) -> Tuple[int, int]:
+        with self.lock:
+            return self.epoch, self.versions.get(rowid, 0)
+
+    def get(self, rowid: int) -> Optional[LakeDetails]:
+        with self.lock:
+            details = self.entries.get(rowid)
+            if details is not None:
+                self.entries.move_to_end(rowid)
+            return details
+
+    def __contains__(self, rowid: int) -> bool:
+        with self.lock:
+            return rowid in self.entries
+
+    def put(self, details: LakeDetails, version: Tuple[int, int]) -> None:
+        cost = details_bytes(details)
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            if version != (self.epoch, self.versions.get(details.rowid, 0)):
+                metrics.count('catalog.details_cache_stale')
+                return
+            old = self.entries.pop(details.rowid, None)
+            if old is not None:
+                self.used_bytes -= details_bytes(old)
+            self.entries[details.rowid] = details
+            self.used_bytes += cost
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.used_bytes -= details_bytes(evicted)
+
+    def discard(self, rowid: int) -> None:
+        with self.lock:
+            self.versions[rowid] = self.versions.get(rowid, 0) + 1
+            old = self.entries.pop(rowid, None)
+            if old is not None:
+                self.used_bytes -= details_bytes(old)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.epoch += 1
+            self.versions.clear()
+            self.entries.clear()
+            self.used_bytes = 0
+
+
+class LakeCatalog:
+
+    def __init__(self, database: Database, details_cache_bytes: int = 16 * 1024 * 1024,
+                 max_loaded_names: Optional[int] = None):
+        self.database = database
+        self.images = ImageStore(database)
+        self.lakes = LakeModel(database, max_loaded_names)
+        self.search_index: Optional[SearchIndex] = None
+        self.pending_index: Optional[PendingIndex] = None
+        self.details_cache = DetailsCache(details_cache_bytes)
+        self.own_changes: List[Tuple[int, int]] = []
+        self.own_changes_lock = threading.Lock()
+        # set on load once the catalog server's name search has been added by maintenance.py name-search
+        self.folded_names = False
+
+    @classmethod
+    def open(cls, path: str, details_cache_bytes: int = 16 * 1024 * 1024) -> 'LakeCatalog':
+        database = Database(path)
+        maintenance.ensure_schema(database)
+        return cls(database, details_cache_bytes)
+
+    def close(self) -> None:
+        self.database.close()
+
+    def load(self) -> None:
+        self.reset(self.lakes.fetch())
+
+    def reset(self, snapshot: Snapshot) -> None:
+        self.lakes.reset(snapshot)
+        self.details_cache.clear()
+        self.folded_names = 'name_folded' in self.images.lake_columns()
+        self.reset_search()
+
+    def reset_search(self) -> None:
+        for index in (self.search_index, self.pending_index):
+            if index is not None:
+                self.lakes.unsubscribe(index)
+        self.search_index = None
+        self.pending_index = None
+
+    # building the n-gram index takes seconds on large catalogs, so the app builds it on a worker thread:
+    # start_search_index on the owning thread, SearchIndex(pending.names) anywhere, then install_search_index
+    def start_search_index(self) -> PendingIndex:
+        self.reset_search()
+        self.pending_index = PendingIndex(self.lakes.names)
+        self.lakes.subscribe(self.pending_index)
+        return self.pending_index
+
+    def install_search_index(self, pending: PendingIndex, index: SearchIndex) -> None:
+        if pending is not self.pending_index:
+            return
+        self.lakes.unsubscribe(pending)
+        self.pending_index = None
+        self.search_index = pending.replay(index)
+        self.lakes.subscribe(self.search_index)
+
+    def build_search_index(self) -> None:
+        if self.lakes.paged:
+            return
+        pending = self.start_search_index()
+        with metrics.timer('search.index_build'):
+            index = SearchIndex(pending.names)
+        self.install_search_index(pending, index)
+
+    # a paged catalog has no names in memory to scan, so it matches word prefixes through FTS instead
+    def search(self, query: str) -> List[str]:
+        if self.lakes.paged:
+            return full_text.search_names(self.database.connection, query, SEARCH_LIMIT)
+        if self.search_index is None:
+            metrics.count('search.scans')
+            return scan(self.lakes.names, query)
+        return self.search_index.search(query)
+
+    def full_text(self, query: str, limit: int = 50) -> List[Tuple[str, str]]:
+        return full_text.search(self.database.connection, query, limit)
+
+    def details(self, name: str) -> Optional[LakeDetails]:
+        rowid = self.lakes.rowid(name)
+        if rowid is None:
+            return None
+        details = self.details_cache.get(rowid)
+        if details is not None:
+            metrics.count('catalog.details_cache_hits')
+            return details
+        with metrics.timer('sqlite.select_lake'):
+            return self.read_details(self.database.connection, rowid)
+
+    def read_details(self, connection: sq.Connection, rowid: int) -> Optional[LakeDetails]:
+        version = self.details_cache.version(rowid)
+        row = connection.execute("SELECT image_id, description FROM lakes WHERE rowid = ?", (rowid,)).fetchone()
+        if row is None:
+            return None
+        details = LakeDetails(rowid, *row)
+        self.details_cache.put(details, version)
+        return details
+
+    def image(self, details: LakeDetails, column: str = 'picture') -> Tuple[Hashable, ImageSource]:
+        if details.image_id is None:
+            return DEFAULT_PICTURE, DEFAULT_PICTURE
+        key = ('thumbnail' if column == 'thumbnail' else 'image', details.image_id)
+        return key, self.images.opener(details.image_id, column)
+
+    def add(self, name: str, description: str, images: Tuple[Optional[bytes], Optional[bytes]] = (None, None)) -> int:
+        with metrics.timer('sqlite.save_lake'), self.transaction() as connection:
+            image_id = self.images.put(connection, *images)
+            rowid = connection.execute("INSERT INTO lakes (name, image_id, description) VALUES (?, ?, ?)",
+                                       (name, image_id, description)).lastrowid
+            self.fold_name(connection, rowid, name)
+        self.lakes.insert(name, rowid)
+        return rowid
+
+    def update(self, name: str, new_name: str, description: str,
+               images: Optional[Tuple[Optional[bytes], Optional[bytes]]] = None) -> None:
+        rowid = self.lakes.rowid(name)
+        if rowid is None:
+            raise KeyError(name)
+        with metrics.timer('sqlite.update_lake'), self.transaction() as connection:
+            if images is None:
+                connection.execute("UPDATE lakes SET name = ?, description = ? WHERE rowid = ?",
+                                   (new_name, description, rowid))
+            else:
+                image_id = self.images.put(connection, *images)
+                connection.execute("UPDATE lakes SET name = ?, image_id = ?, description = ? WHERE rowid = ?",
+                                   (new_name, image_id, description, rowid))
+            if new_name != name:
+                self.fold_name(connection, rowid, new_name)
+        self.details_cache.discard(rowid)
+        if new_name != name:
+            self.lakes.rename(name, new_name)
+
+    def fold_name(self, connection: sq.Connection, rowid: int, name: str) -> None:
+        if self.folded_names:
+            connection.execute("UPDATE lakes SET name_folded = ? WHERE rowid = ?", (full_text.fold_name(name), rowid))
+
+    def delete(self, name: str) -> None:
+        rowid = self.lakes.rowid(name)
+        if rowid is None:
+            raise KeyError(name)
+        with metrics.timer('sqlite.delete_lake'), self.transaction() as connection:
+            connection.execute("DELETE FROM lakes WHERE rowid = ?", (rowid,))
+        self.details_cache.discard(rowid)
+        self.lakes.delete(name)
+
+    @contextmanager
+    def batch_transaction(self) -> Iterator[sq.Connection]:
+        with metrics.timer('sqlite.batch'), self.database.pooled() as connection:
+            with self.transaction(connection):
+                yield connection
+
+    # the change log rows written by this catalog's own transactions: ChangeTracker skips them,
+    # since the model already holds these edits (batches from a pooled connection would come back otherwise)
+    @contextmanager
+    def transaction(self, connection: Optional[sq.Connection] = None) -> Iterator[sq.Connection]:
+        span = None
+        try:
+            with self.database.transaction(connection) as connection:
+                first = self.change_seq(connection)
+                yield connection
+                span = (first, self.change_seq(connection))
+                with self.own_changes_lock:
+                    self.own_changes.append(span)
+        except BaseException:
+            if span is not None:
+                with self.own_changes_lock:
+                    self.own_changes.remove(span)
+            raise
+
+    @staticmethod
+    def change_seq(connection: sq.Connection) -> int:
+        return connection.execute("SELECT coalesce(max(seq), 0) FROM lake_changes").fetchone()[0]
+
+    # returns the (after, last] seq ranges written by this catalog up to last_seq and forgets them
+    def take_own_changes(self, last_seq: int) -> List[Tuple[int, int]]:
+        with self.own_changes_lock:
+            taken = [span for span in self.own_changes if span[0] < last_seq]
+            self.own_changes = [span for span in self.own_changes if span[1] > last_seq]
+        return taken
+
+    @staticmethod
+    def execute_batch(connection: sq.Connection, sql: str, rows: Sequence[Tuple],
+                      progress: Optional[Progress] = None) -> None:
+        for start in range(0, len(rows), BATCH_CHUNK):
+            connection.executemany(sql, rows[start:start + BATCH_CHUNK])
+            if progress is not None:
+                progress(min(start + BATCH_CHUNK, len(rows)), len(rows))
+
+    # the *_rows / write_* methods only touch the database and may run on a worker thread;
+    # apply_* then updates the in-memory model on the thread that owns it
+
+    def delete_rows(self, names: List[str], progress: Optional[Progress] = None) -> List[str]:
+        names = [name for name in names if name in self.lakes]
+        with self.batch_transaction() as connection:
+            self.execute_batch(connection, "DELETE FROM lakes WHERE rowid = ?",
+                               [(self.lakes.rowid(name),) for name in names], progress)
+        return names
+
+    def write_descriptions(self, descriptions: Dict[str, str], progress: Optional[Progress] = None) -> List[str]:
+        names = [name for name in descriptions if name in self.lakes]
+        with self.batch_transaction() as connection:
+            self.execute_batch(connection, "UPDATE lakes SET description = ? WHERE rowid = ?",
+                               [(descriptions[name], self.lakes.rowid(name)) for name in names], progress)
+        return names
+
+    def write_image(self, names: List[str], images: Tuple[Optional[bytes], Optional[bytes]],
+                    progress: Optional[Progress] = None) -> List[str]:
+        names = [name for name in names if name in self.lakes]
+        with self.batch_transaction() as connection:
+            image_id = self.images.put(connection, *images)
+            self.execute_batch(connection, "UPDATE lakes SET image_id = ? WHERE rowid = ?",
+                               [(image_id, self.lakes.rowid(name)) for name in names], progress)
+        return names
+
+    def apply_updated(self, names: List[str]) -> None:
+        for name in names:
+            rowid = self.lakes.rowid(name)
+            if rowid is not None:
+                self.details_cache.discard(rowid)
+
+    def apply_deleted(self, names: List[str]) -> None:
+        self.apply_updated(names)
+        self.lakes.delete_many(names)
+
+    def delete_many(self, names: List[str], progress: Optional[Progress] = None) -> List[str]:
+        names = self.delete_rows(names, progress)
+        self.apply_deleted(names)
+        return names
+
+    def update_descriptions(self, descriptions: Dict[str, str], progress: Optional[Progress] = None) -> List[str]:
+        names = self.write_descriptions(descriptions, progress)
+        self.apply_updated(names)
+        return names
+
+    def replace_image(self, names: List[str], images: Tuple[Optional[bytes], Optional[bytes]],
+                      progress: Optional[Progress] = None) -> List[str]:
+        names = self.write_image(names, images, progress)
+        self.apply_updated(names)
+        return names
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import sqlite3 as sq
+import time
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from database import Database
+from profiling import metrics
+
+if TYPE_CHECKING:
+    from lake_catalog import LakeCatalog
+
+CHANGE_TRIGGERS = ('lakes_changes_insert', 'lakes_changes_delete', 'lakes_changes_update')
+CHANGE_LOG_MAX_AGE = 3600
+RELOAD_THRESHOLD = 500
+
+
+def ensure_change_log(database: Database, max_age: float = CHANGE_LOG_MAX_AGE) -> None:
+    with database.transaction() as connection:
+        connection.execute("CREATE TABLE IF NOT EXISTS lake_changes ("
+                           "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "lake_rowid INTEGER, "
+                           "name TEXT, "
+                           "changed_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now')))")
+        create_change_triggers(connection)
+        connection.execute("DELETE FROM lake_changes WHERE changed_at < ?", (int(time.time() - max_age),))
+
+
+# every row records the rowid and the name it had before the change; the current name is read back from lakes
+def create_change_triggers(connection: sq.Connection) -> None:
+    connection.execute("CREATE TRIGGER IF NOT EXISTS lakes_changes_insert AFTER INSERT ON lakes BEGIN "
+                       "INSERT INTO lake_changes (lake_rowid, name) VALUES (NEW.rowid, NEW.name); END")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS lakes_changes_delete AFTER DELETE ON lakes BEGIN "
+                       "INSERT INTO lake_changes (lake_rowid, name) VALUES (OLD.rowid, OLD.name); END")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS lakes_changes_update AFTER UPDATE OF name, description, image_id "
+                       "ON lakes BEGIN "
+                       "INSERT INTO lake_changes (lake_rowid, name) VALUES (OLD.rowid, OLD.name); END")
+
+
+def drop_change_triggers(connection: sq.Connection) -> None:
+    for trigger in CHANGE_TRIGGERS:
+        connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+# a row without lake_rowid tells every instance to reload the whole list (used after bulk imports)
+def mark_reset(connection: sq.Connection) -> None:
+    connection.execute("INSERT INTO lake_changes (lake_rowid, name) VALUES (NULL, NULL)")
+
+
+class Changes(NamedTuple):
+    names: List[str]
+    reload: bool
+
+
+# seq is the Snapshot.seq the model was loaded from: commits made between that read and the tracker's start
+# are then picked up by the first poll instead of being taken for already loaded
+class ChangeTracker:
+
+    def __init__(self, catalog: LakeCatalog, reload_threshold: int = RELOAD_THRESHOLD, seq: Optional[int] = None):
+        self.catalog = catalog
+        self.connection = catalog.database.connection
+        self.reload_threshold = reload_threshold
+        if seq is None:
+            self.data_version: Optional[int] = self.version()
+            self.last_seq = self.connection.execute("SELECT coalesce(max(seq), 0) FROM lake_changes").fetchone()[0]
+        else:
+            self.data_version = None
+            self.last_seq = seq
+
+    # called after a reload: the rows up to seq are part of the new snapshot, the ones after it are synced
+    # on the next poll whether or not data_version has moved since
+    def start_from(self, seq: int) -> None:
+        self.data_version = None
+        self.last_seq = max(self.last_seq, seq)
+
+    def version(self) -> int:
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    # data_version only moves when another connection commits, so an idle poll is a single pragma
+    def poll(self) -> Optional[Changes]:
+        version = self.version()
+        if version == self.data_version:
+            return None
+        self.data_version = version
+        with metrics.timer('sqlite.sync_changes'):
+            return self.sync()
+
+    def sync(self) -> Optional[Changes]:
+        rows = self.connection.execute("SELECT seq, lake_rowid, name FROM lake_changes WHERE seq > ? ORDER BY seq",
+                                       (self.last_seq,)).fetchall()
+        if not rows:
+            return None
+        pruned = rows[0][0] > self.last_seq + 1
+        self.last_seq = rows[-1][0]
+        own = self.catalog.take_own_changes(self.last_seq)
+        rows = [row for row in rows if not any(after < row[0] <= last for after, last in own)]
+        if pruned:
+            return Changes([], True)
+        if not rows:
+            return None
+        # a paged model holds no names to patch, and reloading it only counts the rows
+        if self.catalog.lakes.paged:
+            return Changes([], True)
+        affected: Dict[int, Set[str]] = {}
+        for _, rowid, name in rows:
+            if rowid is None:
+                return Changes([], True)
+            affected.setdefault(rowid, set()).add(name)
+        if len(affected) > self.reload_threshold:
+            return Changes([], True)
+        metrics.count('sqlite.synced_rows', len(affected))
+        return Changes(self.apply(affected, self.current_names(list(affected))), False)
+
+    def current_names(self, rowids: List[int]) -> Dict[int, str]:
+        names = {}
+        for start in range(0, len(rowids), 500):
+            chunk = rowids[start:start + 500]
+            names.update(self.connection.execute(f"SELECT rowid, name FROM lakes "
+                                                 f"WHERE rowid IN ({', '.join('?' * len(chunk))})", chunk))
+        return names
+
+    def apply(self, affected: Dict[int, Set[str]], current: Dict[int, str]) -> List[str]:
+        lakes = self.catalog.lakes
+        removed: List[str] = []
+        added: List[Tuple[str, int]] = []
+        changed = []
+        for rowid, names in affected.items():
+            self.catalog.details_cache.discard(rowid)
+            old = next((name for name in names if lakes.rowid(name) == rowid), None)
+            new = current.get(rowid)
+            if new is not None:
+                changed.append(new)
+            if old == new:
+                continue
+            if old is not None and new is not None and new not in lakes:
+                lakes.rename(old, new)
+                continue
+            if old is not None:
+                removed.append(old)
+            if new is not None:
+                added.append((new, rowid))
+        if len(removed) > 1:
+            lakes.delete_many(removed)
+        elif removed:
+            lakes.delete(removed[0])
+        for name, rowid in added:
+            if name in lakes:
+                lakes.rowids[name] = rowid
+            else:
+                lakes.insert(name, rowid)
+        return changed
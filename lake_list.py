@@ -0,0 +1,200 @@
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import font as tkfont
+from tkinter import ttk
+from typing import List, Optional, Sequence, Set
+
+from lake_model import LakeModel, Observable
+from search_index import diff_sorted
+
+SHIFT = 0x1
+CONTROL = 0x4
+COMBOBOX_PROCS = """
+proc lake_values_insert {combobox index item} {
+    $combobox configure -values [linsert [$combobox cget -values] $index $item]
+}
+proc lake_values_delete {combobox index} {
+    $combobox configure -values [lreplace [$combobox cget -values] $index $index]
+}
+"""
+
+
+class VirtualList:
+
+    def __init__(self, list_box: tk.Listbox, source: Sequence[str], header_rows: int = 1):
+        self.list_box = list_box
+        self.source = source
+        self.header_rows = header_rows
+        self.offset = 0
+        self.shown: List[str] = []
+        self.selected: Optional[str] = None
+        self.chosen: Set[str] = set()
+        self.line_height = tkfont.Font(font=list_box.cget('font')).metrics('linespace') + 1
+        if isinstance(source, Observable):
+            source.subscribe(self)
+        list_box.bind('<Configure>', lambda event: self.refresh(), add='+')
+        list_box.bind('<Button-1>', self.start_selection, add='+')
+        list_box.bind('<<ListboxSelect>>', self.remember_selection, add='+')
+        list_box.bind('<MouseWheel>', lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        list_box.bind('<Button-4>', lambda event: self.scroll(-1))
+        list_box.bind('<Button-5>', lambda event: self.scroll(1))
+        list_box.bind('<Up>', lambda event: self.move_selection(-1))
+        list_box.bind('<Down>', lambda event: self.move_selection(1))
+        list_box.bind('<Shift-Up>', lambda event: self.move_selection(-1, extend=True))
+        list_box.bind('<Shift-Down>', lambda event: self.move_selection(1, extend=True))
+        list_box.bind('<Control-a>', lambda event: self.select_all())
+        list_box.bind('<Prior>', lambda event: self.move_selection(-self.visible_rows()))
+        list_box.bind('<Next>', lambda event: self.move_selection(self.visible_rows()))
+        list_box.bind('<Home>', lambda event: self.move_selection(-len(self.source)))
+        list_box.bind('<End>', lambda event: self.move_selection(len(self.source)))
+
+    def visible_rows(self) -> int:
+        return max(self.list_box.winfo_height() // self.line_height - self.header_rows, 1)
+
+    def set_source(self, source: Sequence[str]) -> None:
+        if isinstance(self.source, Observable):
+            self.source.unsubscribe(self)
+        if isinstance(source, Observable):
+            source.subscribe(self)
+        self.source = source
+        self.offset = 0
+        self.chosen = {self.selected} if self.selected is not None else set()
+        self.refresh()
+
+    def inserted(self, position: int, name: str) -> None:
+        if position < self.offset:
+            self.offset += 1
+        self.refresh()
+
+    def deleted(self, position: int, name: str) -> None:
+        if position < self.offset:
+            self.offset -= 1
+        self.chosen.discard(name)
+        self.refresh()
+
+    def deleted_many(self, positions: List[int], names: List[str]) -> None:
+        self.offset -= bisect_left(positions, self.offset)
+        self.chosen.difference_update(names)
+        if self.selected in names:
+            self.selected = None
+        self.refresh()
+
+    def moved(self, old_position: int, new_position: int, old_name: str, new_name: str) -> None:
+        if old_position < self.offset:
+            self.offset -= 1
+        if new_position < self.offset:
+            self.offset += 1
+        if self.selected == old_name:
+            self.selected = new_name
+        if old_name in self.chosen:
+            self.chosen.discard(old_name)
+            self.chosen.add(new_name)
+        self.refresh()
+
+    def refresh(self) -> None:
+        rows = self.visible_rows()
+        self.offset = max(min(self.offset, len(self.source) - rows), 0)
+        window = list(self.source[self.offset:self.offset + rows + 1])
+        for operation, position, items in diff_sorted(self.shown, window):
+            if operation == 'delete':
+                self.list_box.delete(position + self.header_rows, position + self.header_rows + len(items) - 1)
+            else:
+                self.list_box.insert(position + self.header_rows, *items)
+        self.shown = window
+        self.list_box.selection_clear(0, tk.END)
+        if self.chosen:
+            for row, name in enumerate(self.shown):
+                if name in self.chosen:
+                    self.list_box.selection_set(row + self.header_rows)
+
+    def scroll(self, rows: int) -> str:
+        self.offset += rows * 3
+        self.refresh()
+        return 'break'
+
+    def start_selection(self, event: tk.Event) -> None:
+        if not event.state & (SHIFT | CONTROL):
+            self.chosen.clear()
+
+    # the listbox only holds the visible window, so its selection is merged into chosen
+    def remember_selection(self, event: tk.Event) -> None:
+        rows = [row - self.header_rows for row in self.list_box.curselection() if row >= self.header_rows]
+        selection = {self.shown[row] for row in rows if row < len(self.shown)}
+        for name in self.shown:
+            if name in selection:
+                self.chosen.add(name)
+            else:
+                self.chosen.discard(name)
+        anchor = self.list_box.index('anchor') - self.header_rows
+        if 0 <= anchor < len(self.shown) and self.shown[anchor] in selection:
+            self.selected = self.shown[anchor]
+        elif rows and rows[0] < len(self.shown):
+            self.selected = self.shown[rows[0]]
+
+    def selection(self) -> List[str]:
+        return sorted(self.chosen)
+
+    def select_all(self) -> str:
+        self.chosen = set(self.source[:])
+        self.refresh()
+        return 'break'
+
+    def move_selection(self, rows: int, extend: bool = False) -> str:
+        if not len(self.source):
+            return 'break'
+        if self.selected in self.shown:
+            current = self.offset + self.shown.index(self.selected)
+        else:
+            current = self.offset - 1 if rows > 0 else self.offset + len(self.shown)
+        current = max(min(current + rows, len(self.source) - 1), 0)
+        visible = self.visible_rows()
+        if current < self.offset:
+            self.offset = current
+        elif current >= self.offset + visible:
+            self.offset = current - visible + 1
+        self.selected = self.source[current:current + 1][0]
+        if extend:
+            self.chosen.add(self.selected)
+        else:
+            self.chosen = {self.selected}
+        self.refresh()
+        self.list_box.activate(self.shown.index(self.selected) + self.header_rows)
+        self.list_box.selection_anchor(self.shown.index(self.selected) + self.header_rows)
+        self.list_box.event_generate('<<ListboxSelect>>')
+        return 'break'
+
+
+class ComboboxValues:
+
+    def __init__(self, combo_box: ttk.Combobox, model: LakeModel, placeholder: str):
+        self.combo_box = combo_box
+        self.model = model
+        self.placeholder = placeholder
+        self.loaded = False
+        self.version = model.version
+        combo_box.tk.eval(COMBOBOX_PROCS)
+        combo_box.configure(values=[placeholder], postcommand=self.load)
+        combo_box.bind('<Destroy>', lambda event: model.unsubscribe(self), add='+')
+        model.subscribe(self)
+
+    def load(self) -> None:
+        if not self.loaded or self.version != self.model.version:
+            self.combo_box.configure(values=[self.placeholder] + self.model.all_names())
+            self.loaded = True
+            self.version = self.model.version
+
+    def inserted(self, position: int, name: str) -> None:
+        if self.loaded:
+            self.combo_box.tk.call('lake_values_insert', self.combo_box, position + 1, name)
+
+    def deleted(self, position: int, name: str) -> None:
+        if self.loaded:
+            self.combo_box.tk.call('lake_values_delete', self.combo_box, position + 1)
+
+    def deleted_many(self, positions: List[int], names: List[str]) -> None:
+        if self.loaded:
+            self.combo_box.configure(values=[self.placeholder] + self.model.all_names())
+
+    def moved(self, old_position: int, new_position: int, old_name: str, new_name: str) -> None:
+        self.deleted(old_position, old_name)
+        self.inserted(new_position, new_name)
@@ -0,0 +1,303 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from database import Database
+from profiling import metrics
+from search_index import fold
+
+
+class Observable:
+
+    def __init__(self):
+        self.listeners: List = []
+
+    def subscribe(self, listener) -> None:
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    # listeners get inserted(position, name), deleted(position, name),
+    # moved(old_position, new_position, old_name, new_name) with new_position counted after the removal
+    # and deleted_many(positions, names) with the ascending positions the names had before the removal
+    def notify(self, event: str, *args) -> None:
+        for listener in list(self.listeners):
+            getattr(listener, event)(*args)
+
+
+class Snapshot(NamedTuple):
+    # names is None when the catalog is larger than the model may hold and rows are paged from SQLite instead
+    names: Optional[List[str]]
+    rowids: Dict[str, int]
+    total: int
+    # the last change log row the snapshot already reflects, read in the same transaction as the names
+    seq: int
+
+
+class LakePager:
+
+    def __init__(self, database: Database, page_size: int = 100, max_pages: int = 16):
+        self.database = database
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages: OrderedDict[int, List[str]] = OrderedDict()
+        self.total = 0
+
+    def invalidate(self, total: int) -> None:
+        self.pages.clear()
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, item: slice) -> List[str]:
+        start, stop, _ = item.indices(len(self))
+        if start >= stop:
+            return []
+        first_page = start // self.page_size
+        last_page = (stop - 1) // self.page_size
+        rows = []
+        for number in range(first_page, last_page + 1):
+            rows.extend(self.page(number))
+        offset = first_page * self.page_size
+        return rows[start - offset:stop - offset]
+
+    def page(self, number: int) -> List[str]:
+        if number in self.pages:
+            self.pages.move_to_end(number)
+            return self.pages[number]
+        if self.pages.get(number - 1):
+            rows = self.database.execute("SELECT name FROM lakes WHERE name > ? ORDER BY name LIMIT ?",
+                                         (self.pages[number - 1][-1], self.page_size)).fetchall()
+        elif self.pages.get(number + 1):
+            rows = self.database.execute("SELECT name FROM lakes WHERE name < ? ORDER BY name DESC LIMIT ?",
+                                         (self.pages[number + 1][0], self.page_size)).fetchall()
+            rows.reverse()
+        else:
+            rows = self.database.execute("SELECT name FROM lakes ORDER BY name LIMIT ? OFFSET ?",
+                                         (self.page_size, number * self.page_size)).fetchall()
+        page = [row[0] for row in rows]
+        self.pages[number] = page
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return page
+
+    def names(self) -> Iterator[str]:
+        last = ''
+        while True:
+            rows = self.database.execute("SELECT name FROM lakes WHERE name > ? ORDER BY name LIMIT ?",
+                                         (last, self.page_size * 10)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0]
+            last = rows[-1][0]
+
+
+# holds every name with its rowid up to max_names; a larger catalog keeps constant startup time and memory
+# by paging names from SQLite through LakePager, at the cost of edits counting their positions in SQL
+# and of search going through FTS (see LakeCatalog.search)
+class LakeModel(Observable):
+
+    def __init__(self, database: Database, max_names: Optional[int] = None):
+        super().__init__()
+        self.database = database
+        self.max_names = max_names
+        self.names: List[str] = []
+        self.rowids: Dict[str, int] = {}
+        self.pager: Optional[LakePager] = None
+        self.version = 0
+
+    @property
+    def paged(self) -> bool:
+        return self.pager is not None
+
+    def fetch(self) -> Snapshot:
+        names = []
+        rowids = {}
+        with metrics.timer('sqlite.list_lakes'), self.database.pooled() as connection:
+            connection.execute("BEGIN")
+            try:
+                seq = connection.execute("SELECT coalesce(max(seq), 0) FROM lake_changes").fetchone()[0]
+                total = connection.execute("SELECT count(*) FROM lakes").fetchone()[0]
+                if self.max_names is not None and total > self.max_names:
+                    return Snapshot(None, {}, total, seq)
+                for rowid, name in connection.execute("SELECT rowid, name FROM lakes ORDER BY name"):
+                    names.append(name)
+                    rowids[name] = rowid
+            finally:
+                connection.execute("COMMIT")
+        metrics.count('sqlite.list_lakes.rows', len(names))
+        return Snapshot(names, rowids, len(names), seq)
+
+    def load(self) -> None:
+        self.reset(self.fetch())
+
+    def reset(self, snapshot: Snapshot) -> None:
+        if snapshot.names is None:
+            self.pager = self.pager or LakePager(self.database)
+            self.pager.invalidate(snapshot.total)
+            self.names, self.rowids = [], {}
+        else:
+            self.pager = None
+            self.names, self.rowids = snapshot.names, snapshot.rowids
+        self.version += 1
+
+    def __len__(self) -> int:
+        return len(self.pager) if self.pager is not None else len(self.names)
+
+    def __getitem__(self, item):
+        if self.pager is None:
+            return self.names[item]
+        if isinstance(item, slice):
+            return self.pager[item]
+        item = range(len(self.pager))[item]
+        return self.pager[item:item + 1][0]
+
+    def __contains__(self, name: str) -> bool:
+        return self.rowid(name) is not None
+
+    def all_names(self) -> List[str]:
+        return list(self.pager.names()) if self.pager is not None else self.names
+
+    def rowid(self, name: str) -> Optional[int]:
+        if self.pager is None:
+            return self.rowids.get(name)
+        with self.database.pooled() as connection:
+            row = connection.execute("SELECT rowid FROM lakes WHERE name = ?", (name,)).fetchone()
+        return row[0] if row is not None else None
+
+    # in paged mode the database already holds the edit, so positions are counted among the other rows
+    def count_between(self, low: Optional[str], high: str) -> int:
+        with self.database.pooled() as connection:
+            if low is None:
+                return connection.execute("SELECT count(*) FROM lakes WHERE name < ?", (high,)).fetchone()[0]
+            return connection.execute("SELECT count(*) FROM lakes WHERE name > ? AND name < ?",
+                                      (low, high)).fetchone()[0]
+
+    def index(self, name: str) -> int:
+        position = bisect_left(self.names, name)
+        if position == len(self.names) or self.names[position] != name:
+            raise ValueError(name)
+        return position
+
+    def insert(self, name: str, rowid: int) -> int:
+        if self.pager is not None:
+            position = self.count_between(None, name)
+            self.pager.invalidate(self.pager.total + 1)
+        else:
+            position = bisect_left(self.names, name)
+            self.names.insert(position, name)
+            self.rowids[name] = rowid
+        self.notify('inserted', position, name)
+        return position
+
+    def delete(self, name: str) -> int:
+        if self.pager is not None:
+            position = self.count_between(None, name)
+            self.pager.invalidate(self.pager.total - 1)
+        else:
+            position = self.index(name)
+            del self.names[position]
+            del self.rowids[name]
+        self.notify('deleted', position, name)
+        return position
+
+    def delete_many(self, names: List[str]) -> List[int]:
+        if self.pager is not None:
+            return self.delete_paged(sorted(set(names)))
+        removed = {name for name in names if name in self.rowids}
+        if not removed:
+            return []
+        positions = [position for position, name in enumerate(self.names) if name in removed]
+        self.names = [name for name in self.names if name not in removed]
+        for name in removed:
+            del self.rowids[name]
+        self.notify('deleted_many', positions, sorted(removed))
+        return positions
+
+    # one pass over the index range the removed names span, instead of a count from the start for each name
+    def delete_paged(self, removed: List[str]) -> List[int]:
+        if not removed:
+            return []
+        positions = []
+        previous = None
+        for name in removed:
+            position = self.count_between(previous, name)
+            positions.append(position if previous is None else positions[-1] + 1 + position)
+            previous = name
+        self.pager.invalidate(self.pager.total - len(removed))
+        self.notify('deleted_many', positions, removed)
+        return positions
+
+    def rename(self, old_name: str, new_name: str) -> Tuple[int, int]:
+        if self.pager is not None:
+            old_position = self.count_between(None, old_name) - (new_name < old_name)
+            new_position = self.count_between(None, new_name)
+            self.pager.invalidate(self.pager.total)
+        else:
+            old_position = self.index(old_name)
+            del self.names[old_position]
+            new_position = bisect_left(self.names, new_name)
+            self.names.insert(new_position, new_name)
+            self.rowids[new_name] = self.rowids.pop(old_name)
+        self.notify('moved', old_position, new_position, old_name, new_name)
+        return old_position, new_position
+
+
+class FilteredLakes(Observable):
+
+    def __init__(self, model: LakeModel, names: List[str], query: str):
+        super().__init__()
+        self.model = model
+        self.names = names
+        self.query = fold(query)
+        model.subscribe(self)
+
+    def close(self) -> None:
+        self.model.unsubscribe(self)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, item):
+        return self.names[item]
+
+    def inserted(self, position: int, name: str) -> None:
+        if self.query in fold(name):
+            position = bisect_left(self.names, name)
+            self.names.insert(position, name)
+            self.notify('inserted', position, name)
+
+    def deleted(self, position: int, name: str) -> None:
+        position = self.position(name)
+        if position is not None:
+            del self.names[position]
+            self.notify('deleted', position, name)
+
+    def deleted_many(self, positions: List[int], names: List[str]) -> None:
+        removed = set(names)
+        own = [position for position, name in enumerate(self.names) if name in removed]
+        if own:
+            gone = [self.names[position] for position in own]
+            self.names = [name for name in self.names if name not in removed]
+            self.notify('deleted_many', own, gone)
+
+    def moved(self, old_position: int, new_position: int, old_name: str, new_name: str) -> None:
+        old_position = self.position(old_name)
+        if old_position is None or self.query not in fold(new_name):
+            self.deleted(old_position, old_name)
+            self.inserted(new_position, new_name)
+            return
+        del self.names[old_position]
+        new_position = bisect_left(self.names, new_name)
+        self.names.insert(new_position, new_name)
+        self.notify('moved', old_position, new_position, old_name, new_name)
+
+    def position(self, name: str) -> Optional[int]:
+        position = bisect_left(self.names, name)
+        if position < len(self.names) and self.names[position] == name:
+            return position
+        return None
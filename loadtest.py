@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import aiohttp
+
+from benchmark import summarize
+
+# (kind, weight): detail pages dominate, as in the desktop app where every selection loads one
+MIX = (('lake', 40), ('list', 15), ('search', 20), ('thumbnail', 15), ('image', 5), ('revalidate', 5))
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(f'{url}/lakes', params={'limit': 1}) as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'{url} не отвечает')
+        await asyncio.sleep(0.2)
+
+
+async def sample_catalog(session: aiohttp.ClientSession, url: str, pages: int) -> Tuple[List[str], List[str]]:
+    names: List[str] = []
+    after = ''
+    for _ in range(pages):
+        async with session.get(f'{url}/lakes', params={'after': after, 'limit': 1000}) as response:
+            page = await response.json()
+        names.extend(page['lakes'])
+        if page['next'] is None:
+            break
+        after = page['next']
+    images = []
+    for name in names[::max(len(names) // 200, 1)]:
+        async with session.get(f'{url}/lakes/' + quote(name, safe='')) as response:
+            image = (await response.json())['image']
+        if image is not None:
+            images.append(image)
+    return names, images
+
+
+class LoadTest:
+
+    def __init__(self, url: str, names: List[str], images: List[str], seed: int = 1):
+        self.url = url
+        self.names = names
+        self.images = images
+        self.rng = random.Random(seed)
+        self.kinds = [kind for kind, _ in MIX]
+        self.weights = [weight for _, weight in MIX]
+        self.latencies: Dict[str, List[float]] = {kind: [] for kind in self.kinds}
+        self.statuses: Counter = Counter()
+        self.etags: Dict[str, str] = {}
+
+    def request(self, kind: str) -> Tuple[str, Dict, Dict[str, str]]:
+        if kind == 'list':
+            return '/lakes', {'after': self.rng.choice(self.names), 'limit': 100}, {}
+        if kind == 'search':
+            name = self.rng.choice(self.names)
+            return '/search', {'q': name[:self.rng.randint(2, 6)]}, {}
+        if kind in ('thumbnail', 'image') and self.images:
+            image = self.rng.choice(self.images)
+            if kind == 'thumbnail':
+                return image.replace('/images/', '/thumbnails/'), {}, {}
+            return image, {'width': self.rng.choice((320, 640, 1024))}, {}
+        if kind == 'revalidate' and self.etags:
+            path = self.rng.choice(list(self.etags))
+            return path, {}, {'If-None-Match': self.etags[path]}
+        return '/lakes/' + quote(self.rng.choice(self.names), safe=''), {}, {}
+
+    async def worker(self, session: aiohttp.ClientSession, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            path, params, headers = self.request(kind)
+            started = time.perf_counter()
+            async with session.get(self.url + path, params=params, headers=headers) as response:
+                await response.read()
+                etag = response.headers.get('ETag')
+            self.latencies[kind].append(time.perf_counter() - started)
+            self.statuses[response.status] += 1
+            if etag is not None and not params and len(self.etags) < 1000:
+                self.etags[path] = etag
+
+    async def run(self, session: aiohttp.ClientSession, concurrency: int, duration: float) -> float:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(self.worker(session, deadline) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(samples) for samples in self.latencies.values())
+        everything = [sample for samples in self.latencies.values() for sample in samples]
+        overall = summarize(everything)
+        print(f'Запросов: {total} за {elapsed:.1f} с, {total / elapsed:.0f} запросов/с, '
+              f"медиана {overall['median_ms']:.2f} мс, p99 {overall['p99_ms']:.2f} мс")
+        for kind, samples in self.latencies.items():
+            if samples:
+                summary = summarize(samples)
+                print(f"  {kind:12} n={summary['n']:<7} медиана {summary['median_ms']:8.2f}  "
+                      f"p99 {summary['p99_ms']:8.2f}  макс {summary['max_ms']:8.2f} мс")
+        print('Ответы: ' + ', '.join(f'{status}: {count}' for status, count in sorted(self.statuses.items())))
+
+
+async def load_test(url: str, concurrency: int, duration: float, seed: int, warmup: float) -> None:
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers={'Accept-Encoding': 'gzip'}) as session:
+        await wait_ready(session, url)
+        names, images = await sample_catalog(session, url, pages=20)
+        if not names:
+            print('Каталог пуст')
+            return
+        print(f'Озер в выборке: {len(names)}, изображений: {len(images)}, соединений: {concurrency}')
+        if warmup:
+            await LoadTest(url, names, images, seed + 1).run(session, concurrency, warmup)
+        test = LoadTest(url, names, images, seed)
+        test.report(await test.run(session, concurrency, duration))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест HTTP-сервера каталога озер')
+    parser.add_argument('--url', help='адрес запущенного сервера; без него сервер запускается на --database')
+    parser.add_argument('--database', default='bench/lakes_100000.db', help='база, созданная synthetic.py')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--workers', type=int, default=8, help='потоков чтения SQLite в сервере')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server: Optional[subprocess.Popen] = None
+    url = args.url
+    if url is None:
+        url = f'http://127.0.0.1:{args.port}'
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog_server.py')
+        server = subprocess.Popen([sys.executable, script, '--database', args.database,
+                                   '--host', '127.0.0.1', '--port', str(args.port), '--workers', str(args.workers)])
+    try:
+        asyncio.run(load_test(url.rstrip('/'), args.concurrency, args.duration, args.seed, args.warmup))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import configparser
+import logging
+import os
+import sqlite3 as sq
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import full_text
+from database import Database
+from image_store import ImageStore
+from lake_changes import ensure_change_log
+from profiling import metrics
+
+# lookups and ordering by name use the UNIQUE autoindex on lakes.name, so no separate index is needed for them
+INDEXES = {
+    'lakes_image_idx': 'lakes (image_id)',
+}
+# indexes created by earlier builds: lakes_name_idx duplicated the autoindex, lakes_name_fold_idx indexed
+# casefold(name) through a Python function that other clients do not have
+OBSOLETE_INDEXES = ('lakes_name_idx', 'lakes_name_fold_idx')
+NAME_SEARCH_INDEX = 'lakes_name_folded_idx'
+# (label, sql, parameters) for the queries the app and the catalog server run on every selection, listing and search
+QUERY_PLANS = (
+    ('выбор озера', "SELECT image_id, description FROM lakes WHERE rowid = ?", (0,)),
+    ('озеро по названию', "SELECT image_id, description FROM lakes WHERE name = ?", ('',)),
+    ('список озер', "SELECT rowid, name FROM lakes ORDER BY name", ()),
+    ('поиск по началу названия', "SELECT name FROM lakes WHERE name_folded >= ? AND name_folded < ? "
+                                 "ORDER BY name_folded", ('а', 'б')),
+    ('ссылки на изображение', "SELECT 1 FROM lakes WHERE image_id = ?", (0,)),
+)
+INCREMENTAL_PAGES = 2000
+MAINTENANCE_INTERVAL = 24 * 3600
+
+
+class Usage(NamedTuple):
+    page_size: int
+    pages: int
+    free_pages: int
+    auto_vacuum: int
+    objects: List[Tuple[str, int, int]]
+    blobs: Dict[str, Tuple[int, int]]
+
+
+def ensure_schema(database: Database) -> List[str]:
+    database.execute("CREATE TABLE IF NOT EXISTS lakes (name TEXT NOT NULL UNIQUE, description TEXT, "
+                     "image_id INTEGER REFERENCES images (id))")
+    ImageStore(database).ensure_schema()
+    created = ensure_indexes(database.connection)
+    full_text.ensure_fts(database)
+    ensure_change_log(database)
+    return created
+
+
+def ensure_indexes(connection: sq.Connection) -> List[str]:
+    existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    for index in OBSOLETE_INDEXES:
+        if index in existing:
+            connection.execute(f"DROP INDEX {index}")
+    created = []
+    for index, columns in INDEXES.items():
+        if index not in existing:
+            with metrics.timer('maintenance.create_index'):
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {columns}")
+            created.append(index)
+    connection.execute("CREATE TABLE IF NOT EXISTS maintenance_log (started_at INTEGER NOT NULL, "
+                       "action TEXT NOT NULL, seconds REAL NOT NULL)")
+    return created
+
+
+# only the catalog server searches by name prefix; the desktop app keeps its own in-memory index.
+# name_folded is a plain column filled from Python, so clients without it (sqlite3, older builds) keep working:
+# their inserts leave it NULL, their renames reset it to NULL, and fill_folded_names catches up
+def ensure_name_search(database: Database) -> bool:
+    connection = database.connection
+    if 'name_folded' not in [row[1] for row in connection.execute("PRAGMA table_info(lakes)")]:
+        connection.execute("ALTER TABLE lakes ADD COLUMN name_folded TEXT")
+    connection.execute("CREATE TRIGGER IF NOT EXISTS lakes_name_folded_stale AFTER UPDATE OF name ON lakes "
+                        "WHEN NEW.name IS NOT OLD.name AND NEW.name_folded IS OLD.name_folded BEGIN "
+                        "UPDATE lakes SET name_folded = NULL WHERE rowid = NEW.rowid; END")
+    with database.transaction() as connection:
+        fill_folded_names(connection)
+    created = not has_name_search(connection)
+    with metrics.timer('maintenance.create_index'):
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {NAME_SEARCH_INDEX} ON lakes (name_folded)")
+    return created
+
+
+def fill_folded_names(connection: sq.Connection, batch_size: int = 5000) -> int:
+    filled = 0
+    while True:
+        rows = connection.execute("SELECT rowid, name FROM lakes WHERE name_folded IS NULL LIMIT ?",
+                                  (batch_size,)).fetchall()
+        if not rows:
+            return filled
+        connection.executemany("UPDATE lakes SET name_folded = ? WHERE rowid = ?",
+                               [(full_text.fold_name(name), rowid) for rowid, name in rows])
+        filled += len(rows)
+
+
+def has_name_search(connection: sq.Connection) -> bool:
+    return connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                              (NAME_SEARCH_INDEX,)).fetchone() is not None
+
+
+def check(connection: sq.Connection, full: bool = False) -> List[str]:
+    problems = [row[0] for row in connection.execute("PRAGMA integrity_check" if full else "PRAGMA quick_check")]
+    problems = [problem for problem in problems if problem != 'ok']
+    for table, rowid, parent, _ in connection.execute("PRAGMA foreign_key_check"):
+        problems.append(f'{table}: строка {rowid} ссылается на отсутствующую запись в {parent}')
+    return problems
+
+
+def full_scans(connection: sq.Connection) -> List[Tuple[str, str]]:
+    scans = []
+    for label, sql, parameters in QUERY_PLANS:
+        if 'name_folded' in sql and not has_name_search(connection):
+            continue
+        for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters):
+            detail = row[-1]
+            if (detail.startswith('SCAN') and 'USING' not in detail) or 'TEMP B-TREE' in detail:
+                scans.append((label, detail))
+    return scans
+
+
+def analyze(connection: sq.Connection) -> None:
+    with metrics.timer('maintenance.analyze'):
+        connection.execute("ANALYZE")
+        connection.execute("PRAGMA optimize")
+
+
+def incremental_vacuum(connection: sq.Connection, pages: int = INCREMENTAL_PAGES) -> Optional[int]:
+    if connection.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return None
+    before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    with metrics.timer('maintenance.incremental_vacuum'):
+        # execute() steps the pragma only once, which frees a single page; executescript runs it to completion
+        connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        checkpoint(connection)
+    return before - connection.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def vacuum(connection: sq.Connection, target: Optional[str] = None) -> None:
+    # a full rewrite also switches older files to incremental auto_vacuum, after that incremental_vacuum is enough
+    with metrics.timer('maintenance.vacuum'):
+        if target is None:
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("VACUUM")
+            checkpoint(connection)
+            return
+        if os.path.exists(target):
+            raise FileExistsError(target)
+        connection.execute("VACUUM INTO ?", (target,))
+        copy = Database(target)
+        try:
+            if copy.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                vacuum(copy.connection)
+            checkpoint(copy.connection)
+        finally:
+            copy.close()
+
+
+# pages freed by a vacuum only leave the file once the WAL is checkpointed
+def checkpoint(connection: sq.Connection) -> None:
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+
+def usage(connection: sq.Connection) -> Usage:
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    pages = connection.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    auto_vacuum = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+    try:
+        objects = connection.execute("SELECT name, count(*), sum(unused) FROM dbstat GROUP BY name "
+                                     "ORDER BY count(*) DESC").fetchall()
+    except sq.OperationalError:
+        objects = []
+    blobs = {}
+    for column, sql in (('images.picture', "SELECT count(picture), coalesce(sum(length(picture)), 0) FROM images"),
+                        ('images.thumbnail',
+                         "SELECT count(thumbnail), coalesce(sum(length(thumbnail)), 0) FROM images"),
+                        ('lakes.description',
+                         "SELECT count(description), coalesce(sum(length(CAST(description AS BLOB))), 0) FROM lakes")):
+        blobs[column] = connection.execute(sql).fetchone()
+    return Usage(page_size, pages, free_pages, auto_vacuum, objects, blobs)
+
+
+def print_usage(report: Usage) -> None:
+    megabytes = report.page_size / 2 ** 20
+    mode = {0: 'выключен', 1: 'полный', 2: 'инкрементальный'}.get(report.auto_vacuum, str(report.auto_vacuum))
+    print(f'Файл: {report.pages} страниц по {report.page_size} байт ({report.pages * megabytes:.1f} МБ), '
+          f'свободно {report.free_pages} ({report.free_pages * megabytes:.1f} МБ), auto_vacuum {mode}')
+    for name, pages, unused in report.objects[:15]:
+        print(f'  {name:32} {pages:9} страниц {pages * megabytes:9.1f} МБ, не занято {(unused or 0) / 2 ** 20:.1f} МБ')
+    for column, (count, size) in report.blobs.items():
+        print(f'  {column:32} {count:9} значений {size / 2 ** 20:9.1f} МБ')
+
+
+def last_run(connection: sq.Connection) -> float:
+    try:
+        return connection.execute("SELECT coalesce(max(started_at), 0) FROM maintenance_log").fetchone()[0]
+    except sq.OperationalError:
+        return 0
+
+
+def log_run(connection: sq.Connection, action: str, started_at: float) -> None:
+    connection.execute("INSERT INTO maintenance_log (started_at, action, seconds) VALUES (?, ?, ?)",
+                       (int(started_at), action, time.time() - started_at))
+
+
+def run_idle(database: Database, interval: float = MAINTENANCE_INTERVAL) -> bool:
+    # called from a worker thread of the app; only the cheap steps, a full VACUUM is left to the command line
+    with database.pooled() as connection:
+        if time.time() - last_run(connection) < interval:
+            return False
+        started = time.time()
+        try:
+            for index in ensure_indexes(connection):
+                logging.info(f'Создан индекс {index}')
+            if has_name_search(connection):
+                with database.transaction(connection):
+                    fill_folded_names(connection)
+            analyze(connection)
+            incremental_vacuum(connection)
+            log_run(connection, 'idle', started)
+        except sq.OperationalError as e:
+            logging.warning(e)
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Обслуживание базы озер')
+    parser.add_argument('command', choices=['check', 'analyze', 'vacuum', 'report', 'all', 'name-search'],
+                        help='name-search добавляет индекс поиска по началу названия для catalog_server.py')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--full', action='store_true', help='полные integrity_check и VACUUM вместо быстрых')
+    parser.add_argument('--into', help='записать сжатую копию базы в этот файл (VACUUM INTO)')
+    args = parser.parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    database = Database(config.get('database', 'database_file'))
+    connection = database.connection
+    started = time.time()
+
+    for index in ensure_schema(database):
+        print(f'Создан индекс {index}')
+    if args.command == 'name-search':
+        if ensure_name_search(database):
+            print(f'Создан индекс {NAME_SEARCH_INDEX}')
+    if args.command in ('check', 'all'):
+        problems = check(connection, args.full)
+        for problem in problems:
+            print(f'Ошибка: {problem}')
+        for label, detail in full_scans(connection):
+            print(f'Полный просмотр таблицы ({label}): {detail}')
+        if not problems:
+            print('Целостность базы в порядке')
+    if args.command in ('analyze', 'all'):
+        analyze(connection)
+        print('Статистика обновлена')
+    if args.command in ('vacuum', 'all'):
+        before = os.path.getsize(database.path)
+        if args.into or args.full:
+            vacuum(connection, args.into)
+            size = os.path.getsize(args.into or database.path)
+            print(f'Сжато: {before / 2 ** 20:.1f} -> {size / 2 ** 20:.1f} МБ')
+        else:
+            freed = incremental_vacuum(connection)
+            if freed is None:
+                print('auto_vacuum выключен: выполните vacuum --full один раз, чтобы включить его')
+            else:
+                print(f'Освобождено страниц: {freed}')
+    if args.command in ('report', 'all'):
+        print_usage(usage(connection))
+    log_run(connection, args.command, started)
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import logging
+import sqlite3 as sq
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence
+
+from image_cache import ImageCache, Size
+from image_pipeline import decode_image
+from lake_catalog import LakeCatalog
+from profiling import metrics
+
+
+def neighbours(position: int, count: int, step: int, radius: int) -> Iterator[int]:
+    # nearest first, leaning in the direction the selection last moved
+    for distance in range(1, radius + 1):
+        for offset in ((distance, -distance) if step >= 0 else (-distance, distance)):
+            if 0 <= position + offset < count:
+                yield position + offset
+
+
+class Prefetcher:
+
+    def __init__(self, catalog: LakeCatalog, image_cache: ImageCache, radius: int = 3):
+        self.catalog = catalog
+        self.image_cache = image_cache
+        self.radius = radius
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.source: Optional[Sequence[str]] = None
+        self.position: Optional[int] = None
+
+    def schedule(self, source: Sequence[str], name: str, size: Optional[Size]) -> None:
+        names: List[str] = getattr(source, 'names', source)
+        position = bisect_left(names, name)
+        if position == len(names) or names[position] != name:
+            self.cancel()
+            return
+        step = position - self.position if self.source is source and self.position is not None else 0
+        if abs(step) > 1:
+            metrics.count('prefetch.jumps')
+        self.source, self.position = source, position
+        window = [names[i] for i in neighbours(position, len(names), step, self.radius)]
+        generation = self.cancel()
+        if self.radius and window:
+            self.executor.submit(self.job, generation, window, size)
+
+    def cancel(self) -> int:
+        with self.lock:
+            self.generation += 1
+            return self.generation
+
+    def is_current(self, generation: int) -> bool:
+        with self.lock:
+            return self.generation == generation
+
+    def job(self, generation: int, window: List[str], size: Optional[Size]) -> None:
+        for name in window:
+            if not self.is_current(generation):
+                return
+            rowid = self.catalog.lakes.rowid(name)
+            if rowid is None:
+                continue
+            try:
+                details = self.catalog.details_cache.get(rowid)
+                if details is None:
+                    with metrics.timer('prefetch.details'), self.catalog.database.pooled() as connection:
+                        details = self.catalog.read_details(connection, rowid)
+                if details is None or size is None or size[0] < 2 or size[1] < 2:
+                    continue
+                key, source = self.catalog.image(details)
+                if self.image_cache.get(key, size) is None:
+                    with metrics.timer('prefetch.image'):
+                        self.image_cache.put(key, size, decode_image(source, size))
+            except (OSError, ValueError, sq.Error) as e:
+                logging.warning(e)
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
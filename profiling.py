@@ -0,0 +1,176 @@
+import atexit
+import contextlib
+import json
+import logging
+import sys
+import threading
+import time
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+IMPORTED = time.perf_counter()
+HEAVY_MODULES = ('aiohttp', 'PIL', 'bs4', 'lxml')
+
+
+class StartupProfile:
+
+    def __init__(self, enabled: bool, started: float = IMPORTED):
+        self.enabled = enabled
+        self.started = started
+        self.last = started
+        self.phases: List[Tuple[str, float, float]] = []
+        self.pending: Set[str] = set()
+
+    def expect(self, *phases: str) -> None:
+        self.pending.update(phases)
+
+    def mark(self, phase: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last, now - self.started))
+        self.last = now
+        if phase in self.pending:
+            self.pending.discard(phase)
+            if not self.pending:
+                self.report()
+
+    def report(self) -> None:
+        print(f'{"Этап запуска":32} {"этап, мс":>10} {"с начала, мс":>14}')
+        for phase, elapsed, total in self.phases:
+            print(f'{phase:32} {elapsed * 1000:10.1f} {total * 1000:14.1f}')
+        loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+        print(f'Загружены при запуске: {", ".join(loaded) or "нет"}', flush=True)
+
+
+class Histogram:
+    # bucket i holds durations below 2 ** i microseconds
+    BUCKETS = 32
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        rank = fraction * self.count
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if hits and seen >= rank:
+                return min(2 ** bucket / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {'count': self.count,
+                'total_ms': self.total * 1000,
+                'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+                'p50_ms': self.percentile(0.5) * 1000,
+                'p90_ms': self.percentile(0.9) * 1000,
+                'p99_ms': self.percentile(0.99) * 1000,
+                'max_ms': self.max * 1000,
+                'buckets_us': {2 ** bucket: hits for bucket, hits in enumerate(self.buckets) if hits}}
+
+
+class Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> 'Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.record(self.name, time.perf_counter() - self.started)
+
+
+NULL_TIMER = contextlib.nullcontext()
+
+
+class Metrics:
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_threshold: Optional[float] = None
+        self.report_file: Optional[str] = None
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def configure(self, enabled: bool, report_file: Optional[str] = None, slow_ms: Optional[float] = None) -> None:
+        self.enabled = enabled
+        self.report_file = report_file
+        self.slow_threshold = slow_ms / 1000 if slow_ms else None
+        if enabled:
+            atexit.register(self.export)
+
+    def timer(self, name: str) -> ContextManager:
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def handler_finished(self, func: Callable, seconds: float) -> None:
+        name = getattr(func, '__qualname__', repr(func))
+        self.record('tk.' + name, seconds)
+        if self.slow_threshold is not None and seconds > self.slow_threshold:
+            code = getattr(func, '__code__', None)
+            where = f' ({code.co_filename}:{code.co_firstlineno})' if code is not None else ''
+            logging.warning('Обработчик %s%s занял главный цикл на %.1f мс', name, where, seconds * 1000)
+
+    def report(self) -> Dict:
+        with self.lock:
+            return {'timers': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+    def export(self) -> None:
+        report = self.report()
+        if self.report_file:
+            with open(self.report_file, 'w', encoding='utf-8') as target:
+                json.dump(report, target, ensure_ascii=False, indent=2)
+            return
+        for name, summary in report['timers'].items():
+            logging.warning('%-48s n=%-7d p50=%8.2f p99=%8.2f max=%8.2f мс', name, summary['count'],
+                            summary['p50_ms'], summary['p99_ms'], summary['max_ms'])
+        for name, value in report['counters'].items():
+            logging.warning('%-48s %d', name, value)
+
+
+def instrument_tk(metrics: Metrics) -> None:
+    import tkinter
+
+    class TimedCallWrapper(tkinter.CallWrapper):
+
+        def __call__(self, *args):
+            started = time.perf_counter()
+            try:
+                return super().__call__(*args)
+            finally:
+                metrics.handler_finished(self.func, time.perf_counter() - started)
+
+    tkinter.CallWrapper = TimedCallWrapper
+
+
+metrics = Metrics()
@@ -0,0 +1,162 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def fold(text: str) -> str:
+    return text.casefold()
+
+
+def ngrams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+# only trigrams are indexed: one- and two-letter pieces occur in nearly every name, so their posting lists
+# cannot narrow a search and cost more memory than all the trigrams together. Shorter queries scan the
+# folded names, or filter the previous result when they extend the last query
+class SearchIndex:
+    GRAM = 3
+
+    def __init__(self, names: List[str]):
+        self.names: List[Optional[str]] = list(names)
+        self.folded: List[Optional[str]] = [fold(name) for name in self.names]
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.removed = 0
+        self.ordered = True
+        self.postings: Dict[str, List[int]] = {}
+        for i, name in enumerate(self.folded):
+            self.index_name(i, name)
+        self.last_query = None
+        self.last_result: List[int] = []
+
+    def index_name(self, i: int, name: str) -> None:
+        for gram in ngrams(name, self.GRAM):
+            self.postings.setdefault(gram, []).append(i)
+
+    def add(self, name: str) -> None:
+        if name in self.ids:
+            return
+        if self.names and self.names[-1] is not None and self.names[-1] > name:
+            self.ordered = False
+        i = len(self.names)
+        self.names.append(name)
+        self.folded.append(fold(name))
+        self.ids[name] = i
+        self.index_name(i, self.folded[i])
+        self.last_query = None
+
+    def discard(self, name: str) -> None:
+        i = self.ids.pop(name, None)
+        if i is None:
+            return
+        self.names[i] = None
+        self.folded[i] = None
+        self.removed += 1
+        self.last_query = None
+
+    def inserted(self, position: int, name: str) -> None:
+        self.add(name)
+
+    def deleted(self, position: int, name: str) -> None:
+        self.discard(name)
+
+    def deleted_many(self, positions: List[int], names: List[str]) -> None:
+        for name in names:
+            self.discard(name)
+
+    def moved(self, old_position: int, new_position: int, old_name: str, new_name: str) -> None:
+        self.discard(old_name)
+        self.add(new_name)
+
+    def candidates(self, query: str) -> List[int]:
+        if len(query) < self.GRAM:
+            return [i for i, name in enumerate(self.folded) if name is not None and query in name]
+        if len(query) == self.GRAM:
+            return self.postings.get(query, [])
+        postings = [self.postings.get(gram) for gram in ngrams(query, self.GRAM)]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                return []
+        return sorted(result)
+
+    def search_ids(self, query: str) -> List[int]:
+        query = fold(query)
+        if not query:
+            return [i for i, name in enumerate(self.names) if name is not None]
+        if self.last_query and self.last_query in query:
+            source = self.last_result
+        else:
+            source = self.candidates(query)
+        if len(query) < self.GRAM and source is not self.last_result:
+            result = source
+        elif len(query) == self.GRAM and source is not self.last_result:
+            result = [i for i in source if self.folded[i] is not None] if self.removed else list(source)
+        else:
+            result = [i for i in source if self.folded[i] is not None and query in self.folded[i]]
+        self.last_query = query
+        self.last_result = result
+        return result
+
+    def search(self, query: str) -> List[str]:
+        result = [self.names[i] for i in self.search_ids(query)]
+        if not self.ordered:
+            result.sort()
+        return result
+
+
+def scan(names: List[str], query: str) -> List[str]:
+    query = fold(query)
+    if not query:
+        return list(names)
+    return [name for name in names if query in fold(name)]
+
+
+class PendingIndex:
+    # stands in for a SearchIndex being built on another thread: records model events from the snapshot on
+
+    def __init__(self, names: List[str]):
+        self.names = list(names)
+        self.events: List[Tuple[str, tuple]] = []
+
+    def inserted(self, *args) -> None:
+        self.events.append(('inserted', args))
+
+    def deleted(self, *args) -> None:
+        self.events.append(('deleted', args))
+
+    def deleted_many(self, *args) -> None:
+        self.events.append(('deleted_many', args))
+
+    def moved(self, *args) -> None:
+        self.events.append(('moved', args))
+
+    def replay(self, index: SearchIndex) -> SearchIndex:
+        for event, args in self.events:
+            getattr(index, event)(*args)
+        return index
+
+
+def diff_sorted(old: List[str], new: List[str]) -> List[Tuple[str, int, List[str]]]:
+    operations = []
+    position = 0
+    i = j = 0
+    while i < len(old) or j < len(new):
+        if i < len(old) and j < len(new) and old[i] == new[j]:
+            position += 1
+            i += 1
+            j += 1
+        elif j >= len(new) or (i < len(old) and old[i] < new[j]):
+            start = i
+            while i < len(old) and (j >= len(new) or old[i] < new[j]):
+                i += 1
+            operations.append(('delete', position, old[start:i]))
+        else:
+            start = j
+            while j < len(new) and (i >= len(old) or new[j] < old[i]):
+                j += 1
+            operations.append(('insert', position, new[start:j]))
+            position += j - start
+    return operations
@@ -0,0 +1,144 @@
+import argparse
+import io
+import os
+import random
+import time
+from typing import Iterator, List, Set, Tuple
+
+import maintenance
+from database import Database
+from image_store import ImageStore
+
+ADJECTIVES = ['Большое', 'Малое', 'Верхнее', 'Нижнее', 'Среднее', 'Дальнее', 'Ближнее', 'Старое', 'Новое',
+              'Круглое', 'Долгое', 'Глубокое', 'Светлое', 'Тёмное', 'Белое', 'Чёрное', 'Красное', 'Голубое',
+              'Щучье', 'Лебяжье', 'Утиное', 'Кислое', 'Солёное', 'Горькое', 'Святое', 'Лесное']
+SYLLABLES = ['ла', 'до', 'се', 'ли', 'гер', 'ча', 'ны', 'бай', 'кал', 'ла', 'ир', 'тыш', 'он', 'ега', 'ку',
+             'ло', 'та', 'ель', 'ман', 'ван', 'ра', 'ши', 'ко', 'зер', 'ум', 'ба', 'ян', 'ты', 'мо', 'хан']
+SUFFIXES = ['ское', 'ное', 'ье', 'ое', 'инское', 'овское', '']
+REGIONS = ['Карелия', 'Бурятия', 'Якутия', 'Алтай', 'Тыва', 'Коми', 'Ямал', 'Таймыр', 'Кольский полуостров',
+           'Псковская область', 'Тверская область', 'Вологодская область', 'Архангельская область',
+           'Красноярский край', 'Камчатка', 'Чукотка', 'Урал', 'Приморье']
+WORDS = ['озеро', 'берег', 'глубина', 'вода', 'остров', 'река', 'исток', 'бассейн', 'площадь', 'зеркало',
+         'тайга', 'рыба', 'омуль', 'нерпа', 'лёд', 'зима', 'болото', 'водосбор', 'котловина', 'залив',
+         'прозрачность', 'ледник', 'заповедник', 'побережье', 'посёлок', 'питание', 'минерализация', 'плёс',
+         'впадает', 'вытекает', 'расположено', 'достигает', 'метров', 'километров', 'является', 'крупнейшим']
+
+
+def lake_names(rng: random.Random) -> Iterator[str]:
+    used: Set[str] = set()
+    while True:
+        root = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        name = (root + rng.choice(SUFFIXES)).capitalize()
+        if rng.random() < 0.4:
+            name = f'{rng.choice(ADJECTIVES)} {name}'
+        if rng.random() < 0.3:
+            name = f'Озеро {name}'
+        if name in used:
+            name = f'{name} ({rng.choice(REGIONS)})'
+        number = 2
+        unique = name
+        while unique in used:
+            unique = f'{name} {number}'
+            number += 1
+        used.add(unique)
+        yield unique
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 20))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def description(rng: random.Random, name: str) -> str:
+    if rng.random() < 0.1:
+        return 'Нет информации'
+    # most descriptions are a short paragraph, a few are full articles
+    size = min(int(rng.lognormvariate(5.5, 1.1)), 200_000)
+    paragraphs = [f'{name} — {sentence(rng)}']
+    length = len(paragraphs[0])
+    while length < size:
+        paragraph = ' '.join(sentence(rng) for _ in range(rng.randint(3, 8)))
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return '\n'.join(paragraphs)
+
+
+def synthetic_image(rng: random.Random, size: Tuple[int, int] = (1200, 800)) -> bytes:
+    from PIL import Image, ImageDraw, ImageFilter
+    sky = tuple(rng.randint(90, 200) for _ in range(3))
+    water = tuple(rng.randint(10, 120) for _ in range(3))
+    image = Image.new('RGB', size, sky)
+    draw = ImageDraw.Draw(image)
+    horizon = rng.randint(size[1] // 3, size[1] * 2 // 3)
+    draw.rectangle((0, horizon, size[0], size[1]), fill=water)
+    for _ in range(rng.randint(20, 60)):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        radius = rng.randint(5, 120)
+        colour = tuple(rng.randint(0, 255) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=colour)
+    noise = Image.effect_noise(size, rng.randint(10, 40)).convert('RGB')
+    image = Image.blend(image.filter(ImageFilter.GaussianBlur(3)), noise, 0.15)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def image_pool(rng: random.Random, count: int) -> List[Tuple[bytes, bytes]]:
+    if not count:
+        return []
+    from image_ingest import ImageIngest
+    ingest = ImageIngest()
+    return [ingest.ingest(synthetic_image(rng)) for _ in range(count)]
+
+
+def generate(path: str, rows: int, images: int = 200, image_share: float = 0.7, seed: int = 1,
+             batch_size: int = 10000) -> None:
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    database = Database(path)
+    database.execute("CREATE TABLE lakes (name TEXT NOT NULL UNIQUE, description TEXT, "
+                     "image_id INTEGER REFERENCES images (id))")
+    ImageStore(database).ensure_schema()
+    with database.transaction() as connection:
+        image_ids = [ImageStore.put(connection, *images) for images in image_pool(rng, images)]
+    names = lake_names(rng)
+    done = 0
+    while done < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - done)):
+            name = next(names)
+            image_id = rng.choice(image_ids) if image_ids and rng.random() < image_share else None
+            batch.append((name, description(rng, name), image_id))
+        with database.transaction() as connection:
+            connection.executemany("INSERT INTO lakes (name, description, image_id) VALUES (?, ?, ?)", batch)
+        done += len(batch)
+        print(f'\r{path}: {done}/{rows}', end='', flush=True)
+    maintenance.ensure_schema(database)
+    maintenance.ensure_name_search(database)
+    database.execute("ANALYZE")
+    database.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    database.close()
+    print(f'\r{path}: {rows} озер, {os.path.getsize(path) / 2 ** 20:.1f} МБ за {time.perf_counter() - started:.1f} с')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Создание синтетических баз озер для замеров')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100_000, 1_000_000])
+    parser.add_argument('--output-dir', default='bench')
+    parser.add_argument('--images', type=int, default=200, help='количество различных изображений')
+    parser.add_argument('--image-share', type=float, default=0.7, help='доля озер с изображением')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+    for rows in args.rows:
+        path = os.path.join(args.output_dir, f'lakes_{rows}.db')
+        if os.path.exists(path):
+            print(f'{path}: уже существует')
+            continue
+        generate(path, rows, args.images, args.image_share, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import pytest
+
+import maintenance
+from database import Database
+from lake_catalog import LakeCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    maintenance.ensure_schema(database)
+    catalog = LakeCatalog(database)
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def tk_root():
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        pytest.skip(f'no display: {e}')
+    root.withdraw()
+    yield root
+    root.destroy()
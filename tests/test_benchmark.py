@@ -0,0 +1,47 @@
+import os
+import random
+
+import pytest
+
+import synthetic
+from benchmark import Benchmark, summarize
+from database import Database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_synthetic_names_are_unique_and_repeatable():
+    first = synthetic.lake_names(random.Random(7))
+    second = synthetic.lake_names(random.Random(7))
+    names = [next(first) for _ in range(2000)]
+    assert len(set(names)) == len(names)
+    assert names == [next(second) for _ in range(2000)]
+
+
+def test_generated_catalog_is_ready_for_the_app(tmp_path):
+    path = str(tmp_path / 'lakes.db')
+    synthetic.generate(path, 300, images=0, batch_size=128)
+    database = Database(path)
+    try:
+        assert database.execute("SELECT count(*), count(DISTINCT name) FROM lakes").fetchone() == (300, 300)
+        assert database.execute("SELECT count(*) FROM lakes_fts").fetchone()[0] == 300
+    finally:
+        database.close()
+    with pytest.raises(FileExistsError):
+        synthetic.generate(path, 10, images=0)
+
+
+def test_summary_of_a_single_sample():
+    summary = summarize([0.002])
+    assert summary['n'] == 1
+    assert summary['median_ms'] == summary['p99_ms'] == summary['max_ms'] == 2
+
+
+def test_benchmark_runs_over_a_small_catalog(tmp_path, monkeypatch):
+    pytest.importorskip('PIL.Image')
+    monkeypatch.chdir(ROOT)
+    path = str(tmp_path / 'lakes.db')
+    synthetic.generate(path, 200, images=2)
+    record = Benchmark(path, samples=8).run()
+    assert record['rows'] == 200
+    assert {'startup.list_load', 'select.query', 'search.keystroke', 'edit.delete'} <= set(record['results'])
@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3 as sq
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import maintenance
+from catalog_server import CatalogServer, missing_schema
+from database import Database
+
+
+@pytest.fixture
+def path(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро')
+    catalog.add('Озеро 1/2', 'Название с косой чертой')
+    maintenance.ensure_name_search(catalog.database)
+    return catalog.database.path
+
+
+def get(database: Database, url: str):
+    async def request():
+        async with TestClient(TestServer(CatalogServer(database, workers=2).application())) as client:
+            response = await client.get(url)
+            return response.status, await response.json()
+    return asyncio.run(request())
+
+
+def test_read_only_database_refuses_writes(path):
+    database = Database(path, read_only=True)
+    try:
+        assert missing_schema(database.connection) == []
+        with pytest.raises(sq.OperationalError):
+            database.execute("DELETE FROM lakes")
+    finally:
+        database.close()
+
+
+def test_lake_names_may_contain_a_slash(path):
+    status, lake = get(Database(path, read_only=True), '/lakes/%D0%9E%D0%B7%D0%B5%D1%80%D0%BE%201%2F2')
+    assert status == 200
+    assert lake['name'] == 'Озеро 1/2'
+
+
+def test_search_by_name_prefix(path):
+    status, found = get(Database(path, read_only=True), '/search?q=бай')
+    assert status == 200
+    assert found['names'] == ['Байкал']
+
+
+def test_missing_name_search_is_reported(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    maintenance.ensure_schema(database)
+    assert missing_schema(database.connection) == [maintenance.NAME_SEARCH_INDEX]
+    database.close()
+
+
+def test_stored_thumbnail_is_served_without_the_picture(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро', (b'\xff\xd8\xff' + b'p' * 1000, b'\x89PNG\r\n\x1a\n' + b't' * 10))
+    image_id = catalog.details('Байкал').image_id
+    statements = []
+    catalog.database.connection.set_trace_callback(statements.append)
+    payload = CatalogServer(catalog.database, workers=1).read_image(image_id, 'thumbnail', None, '"etag"')
+    assert payload.body == b'\x89PNG\r\n\x1a\n' + b't' * 10
+    assert payload.content_type == 'image/png'
+    assert not any('picture' in statement for statement in statements)
@@ -0,0 +1,94 @@
+import sqlite3 as sq
+import threading
+
+from database import Database, read_selection
+
+
+def test_new_file_uses_incremental_auto_vacuum(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    try:
+        assert database.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert database.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    finally:
+        database.close()
+
+
+def test_existing_file_keeps_its_auto_vacuum_mode(tmp_path):
+    path = str(tmp_path / 'lakes.db')
+    connection = sq.connect(path)
+    connection.execute("CREATE TABLE lakes (name TEXT)")
+    connection.close()
+    database = Database(path)
+    try:
+        assert database.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    finally:
+        database.close()
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    database.execute("CREATE TABLE lakes (name TEXT)")
+    try:
+        with database.transaction() as connection:
+            connection.execute("INSERT INTO lakes VALUES ('Байкал')")
+            raise ValueError
+    except ValueError:
+        pass
+    assert database.execute("SELECT count(*) FROM lakes").fetchone()[0] == 0
+    database.close()
+
+
+def test_pooled_gives_worker_threads_their_own_connection(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    seen = []
+
+    def worker():
+        with database.pooled() as connection:
+            seen.append(connection)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    with database.pooled() as connection:
+        assert connection is database.connection
+    assert seen and seen[0] is not database.connection
+    database.close()
+
+
+def test_read_selection_reads_the_picture_from_the_image_store(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро', (b'picture', None))
+    catalog.add('Ладога', 'Большое озеро')
+    assert read_selection(catalog.database.connection, 'Байкал') == b'picture'
+    assert read_selection(catalog.database.connection, 'Ладога') is None
+
+
+def test_connections_are_tuned(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    try:
+        assert database.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert database.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert database.execute("PRAGMA cache_size").fetchone()[0] == -16000
+    finally:
+        database.close()
+
+
+def test_pool_reuses_at_most_pool_size_connections(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'), pool_size=2)
+    seen = []
+
+    def worker():
+        for _ in range(5):
+            with database.pooled() as connection:
+                connection.execute("SELECT 1").fetchone()
+                seen.append(connection)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(seen) == 20
+    assert len(set(map(id, seen))) <= 2
+    assert database.pool_created <= 2
+    database.close()
@@ -0,0 +1,43 @@
+import full_text
+
+
+def test_search_keeps_the_original_spelling_in_snippets(catalog):
+    catalog.load()
+    catalog.add('Светлое', 'На берегу растёт старая берёза.')
+    [(name, snippet)] = catalog.full_text('береза')
+    assert name == 'Светлое'
+    assert snippet == 'На берегу растёт старая «берёза».'
+
+
+def test_search_matches_the_spelling_with_yo(catalog):
+    catalog.load()
+    catalog.add('Ёлочное', 'Озеро в ельнике')
+    assert [name for name, _ in catalog.full_text('ёлочное')] == ['Ёлочное']
+    assert [name for name, _ in catalog.full_text('елочное')] == ['Ёлочное']
+
+
+def test_restore_snippet_marks_cut_text():
+    description = 'Ёж ' * 40 + 'ёлка'
+    snippet = '\x04' + full_text.fold_text(description)[-10:-4] + '\x02елка\x03'
+    assert full_text.restore_snippet(snippet, description) == '…Ёж Ёж «ёлка»'
+
+
+def test_fold_keeps_the_length_of_the_text():
+    assert full_text.fold_text('Ёлка и ёж') == 'Елка и еж'
+    assert full_text.fold_name('Ёлочное ОЗЕРО') == 'елочное озеро'
+    assert len(full_text.fold_text('ёЁ' * 10)) == 20
+
+
+def test_fts_query_quotes_every_word_as_a_prefix():
+    assert full_text.fts_query('Берёза, "озеро"') == '"Береза"* "озеро"*'
+    assert full_text.fts_query(' -*" ') == ''
+
+
+def test_fts_follows_edits(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро')
+    catalog.update('Байкал', 'Байкал', 'Самое чистое озеро')
+    assert catalog.full_text('глубокое') == []
+    assert [name for name, _ in catalog.full_text('чистое')] == ['Байкал']
+    catalog.delete('Байкал')
+    assert catalog.full_text('чистое') == []
@@ -0,0 +1,50 @@
+from image_cache import ImageCache
+
+
+class Frame:
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    def getbands(self):
+        return 'R', 'G', 'B'
+
+
+def test_least_recently_used_frames_are_evicted():
+    cache = ImageCache(max_bytes=3 * 100 * 100 * 2)
+    first, second, third = Frame(100, 100), Frame(100, 100), Frame(100, 100)
+    cache.put('Байкал', (100, 100), first)
+    cache.put('Ладога', (100, 100), second)
+    assert cache.get('Байкал', (100, 100)) is first
+    cache.put('Онего', (100, 100), third)
+    assert cache.get('Ладога', (100, 100)) is None
+    assert cache.get('Байкал', (100, 100)) is first
+    assert cache.used_bytes == 2 * 3 * 100 * 100
+
+
+def test_frame_larger_than_the_cache_is_not_kept():
+    cache = ImageCache(max_bytes=100)
+    cache.put('Байкал', (100, 100), Frame(100, 100))
+    assert cache.get('Байкал', (100, 100)) is None
+    assert cache.used_bytes == 0
+
+
+def test_nearest_size_of_the_same_lake_is_offered():
+    cache = ImageCache()
+    small, large = Frame(150, 150), Frame(800, 600)
+    cache.put('Байкал', (150, 150), small)
+    cache.put('Байкал', (800, 600), large)
+    cache.put('Ладога', (700, 500), Frame(700, 500))
+    assert cache.nearest('Байкал', (700, 500)) is large
+    assert cache.nearest('Онего', (700, 500)) is None
+
+
+def test_discard_drops_every_size_of_a_lake():
+    cache = ImageCache()
+    cache.put('Байкал', (150, 150), Frame(150, 150))
+    cache.put('Байкал', (800, 600), Frame(800, 600))
+    cache.put('Ладога', (150, 150), Frame(150, 150))
+    cache.discard('Байкал')
+    assert cache.nearest('Байкал', (150, 150)) is None
+    assert cache.used_bytes == 3 * 150 * 150
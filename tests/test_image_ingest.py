@@ -0,0 +1,53 @@
+import io
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from image_ingest import ORIENTATION, ImageIngest  # noqa: E402
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return ImageIngest(max_side=400, thumbnail_side=50, image_format='JPEG')
+
+
+def encoded(size, image_format: str = 'JPEG', orientation: int = 1) -> bytes:
+    image = Image.new('RGB', size, 'blue')
+    exif = image.getexif()
+    if orientation != 1:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, exif=exif)
+    return buffer.getvalue()
+
+
+def size(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+
+def test_large_picture_is_scaled_down_with_a_thumbnail(ingest):
+    picture, thumbnail = ingest.ingest(encoded((1600, 1200)))
+    assert size(picture) == (400, 300)
+    assert max(size(thumbnail)) == 50
+
+
+def test_small_picture_in_the_target_format_is_kept(ingest):
+    data = encoded((300, 200))
+    picture, thumbnail = ingest.ingest(data)
+    assert picture == data
+    assert max(size(thumbnail)) == 50
+
+
+def test_exif_orientation_is_applied(ingest):
+    picture, _ = ingest.ingest(encoded((300, 200), orientation=6))
+    assert size(picture) == (200, 300)
+
+
+def test_default_picture_is_not_stored(ingest):
+    assert ingest.ingest(None) == (None, None)
+    assert ingest.ingest('default.png') == (None, None)
+    with open('default.png', 'rb') as image_file:
+        assert ingest.ingest(image_file.read()) == (None, None)
@@ -0,0 +1,48 @@
+import io
+import time
+
+import pytest
+
+from image_cache import ImageCache
+from image_pipeline import ImageRenderer, decode_image
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def jpeg(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'blue').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_decode_resizes_to_the_requested_size():
+    frame = decode_image(jpeg(1600, 1200), (200, 150))
+    assert frame.size == (200, 150)
+
+
+def test_decode_reads_from_a_stream_opener():
+    data = jpeg(400, 300)
+
+    class Opener:
+        def __enter__(self):
+            return io.BytesIO(data)
+
+        def __exit__(self, *exc):
+            return False
+
+    assert decode_image(Opener, (40, 30)).size == (40, 30)
+
+
+def test_renderer_delivers_only_the_latest_request(tk_root):
+    cache = ImageCache()
+    renderer = ImageRenderer(tk_root, cache)
+    delivered = []
+    renderer.render('pane', 'Байкал', jpeg(800, 600), (80, 60), lambda photo: delivered.append('Байкал'))
+    renderer.render('pane', 'Ладога', jpeg(800, 600), (80, 60), lambda photo: delivered.append('Ладога'))
+    deadline = time.monotonic() + 5
+    while cache.get('Ладога', (80, 60)) is None and time.monotonic() < deadline:
+        tk_root.update()
+        time.sleep(0.01)
+    tk_root.update()
+    renderer.shutdown()
+    assert delivered == ['Ладога']
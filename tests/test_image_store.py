@@ -0,0 +1,50 @@
+from database import Database
+from image_store import ImageStore
+
+
+def test_put_shares_identical_pictures(catalog):
+    connection = catalog.database.connection
+    first = ImageStore.put(connection, b'picture', b'thumbnail')
+    assert ImageStore.put(connection, b'picture', b'thumbnail') == first
+    assert ImageStore.put(connection, None, None) is None
+    assert connection.execute("SELECT count(*) FROM images").fetchone()[0] == 1
+
+
+def test_put_fills_a_missing_thumbnail(catalog):
+    connection = catalog.database.connection
+    image_id = ImageStore.put(connection, b'picture', None)
+    assert ImageStore.put(connection, b'picture', b'thumbnail') == image_id
+    assert ImageStore.put(connection, b'picture', None) == image_id
+    assert connection.execute("SELECT thumbnail FROM images WHERE id = ?", (image_id,)).fetchone()[0] == b'thumbnail'
+
+
+def test_open_streams_the_thumbnail_or_falls_back_to_the_picture(catalog):
+    connection = catalog.database.connection
+    with_thumbnail = ImageStore.put(connection, b'picture 1', b'thumbnail 1')
+    without_thumbnail = ImageStore.put(connection, b'picture 2', None)
+    with catalog.images.open(with_thumbnail, 'thumbnail') as blob:
+        assert blob.read() == b'thumbnail 1'
+    with catalog.images.opener(without_thumbnail, 'thumbnail')() as blob:
+        assert blob.read() == b'picture 2'
+
+
+def test_image_goes_with_its_last_lake(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро', (b'picture', b'thumbnail'))
+    catalog.add('Ладога', 'Большое озеро', (b'picture', b'thumbnail'))
+    connection = catalog.database.connection
+    catalog.delete('Байкал')
+    assert connection.execute("SELECT count(*) FROM images").fetchone()[0] == 1
+    catalog.update('Ладога', 'Ладога', 'Большое озеро', (b'other picture', None))
+    assert connection.execute("SELECT picture FROM images").fetchall() == [(b'other picture',)]
+
+
+def test_pictures_in_the_lakes_table_are_moved_to_the_store(tmp_path):
+    path = str(tmp_path / 'lakes.db')
+    database = Database(path)
+    database.execute("CREATE TABLE lakes (name TEXT NOT NULL UNIQUE, description TEXT, picture BLOB)")
+    database.executemany("INSERT INTO lakes VALUES (?, '', ?)", [('Байкал', b'same'), ('Ладога', b'same')])
+    ImageStore(database).ensure_schema()
+    assert database.execute("SELECT count(DISTINCT image_id), count(picture) FROM lakes").fetchone() == (1, 0)
+    assert database.execute("SELECT picture FROM images").fetchall() == [(b'same',)]
+    database.close()
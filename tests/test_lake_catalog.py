@@ -0,0 +1,86 @@
+import sqlite3 as sq
+
+import pytest
+
+from database import Database
+from lake_catalog import BatchCancelled, LakeCatalog, LakeDetails
+
+
+def test_open_upgrades_an_old_database(tmp_path):
+    path = str(tmp_path / 'lakes.db')
+    connection = sq.connect(path)
+    connection.execute("CREATE TABLE lakes (name TEXT NOT NULL UNIQUE, description TEXT, image_id INTEGER)")
+    connection.execute("INSERT INTO lakes VALUES ('Байкал', 'Глубокое озеро', NULL)")
+    connection.commit()
+    connection.close()
+    catalog = LakeCatalog.open(path)
+    try:
+        catalog.load()
+        assert list(catalog.lakes.names) == ['Байкал']
+        assert [name for name, _ in catalog.full_text('глубокое')] == ['Байкал']
+    finally:
+        catalog.close()
+
+
+def test_constructor_does_not_change_the_schema(tmp_path):
+    path = str(tmp_path / 'old.db')
+    connection = sq.connect(path)
+    connection.execute("CREATE TABLE lakes (name TEXT NOT NULL UNIQUE, description TEXT, image_id INTEGER)")
+    connection.close()
+    database = Database(path)
+    LakeCatalog(database)
+    tables = {row[0] for row in database.execute("SELECT name FROM sqlite_master")}
+    database.close()
+    assert tables == {'lakes', 'sqlite_autoindex_lakes_1'}
+
+
+def test_details_read_before_an_update_are_not_cached(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Старое описание')
+    rowid = catalog.lakes.rowid('Байкал')
+    version = catalog.details_cache.version(rowid)
+    stale = LakeDetails(rowid, None, 'Старое описание')
+    catalog.update('Байкал', 'Байкал', 'Новое описание')
+    catalog.details_cache.put(stale, version)
+    assert rowid not in catalog.details_cache
+    assert catalog.details('Байкал').description == 'Новое описание'
+    assert rowid in catalog.details_cache
+
+
+def add_lakes(catalog, count: int):
+    catalog.load()
+    for i in range(count):
+        catalog.add(f'Озеро {i:04}', 'Нет информации')
+
+
+def test_batch_delete_removes_rows_and_model_entries(catalog):
+    add_lakes(catalog, 1200)
+    done = []
+    removed = catalog.delete_many([f'Озеро {i:04}' for i in range(0, 1200, 2)] + ['Нет такого'],
+                                  lambda count, total: done.append((count, total)))
+    assert len(removed) == 600
+    assert len(catalog.lakes) == 600 and 'Озеро 0000' not in catalog.lakes
+    assert catalog.database.execute("SELECT count(*) FROM lakes").fetchone()[0] == 600
+    assert done == [(500, 600), (600, 600)]
+
+
+def test_batch_update_changes_descriptions_and_images(catalog):
+    add_lakes(catalog, 3)
+    catalog.details('Озеро 0000')
+    catalog.update_descriptions({'Озеро 0000': 'Первое', 'Озеро 0001': 'Второе'})
+    assert catalog.details('Озеро 0000').description == 'Первое'
+    catalog.replace_image(['Озеро 0001', 'Озеро 0002'], (b'picture', b'thumbnail'))
+    image_ids = {catalog.details(name).image_id for name in ('Озеро 0001', 'Озеро 0002')}
+    assert len(image_ids) == 1 and None not in image_ids
+
+
+def test_cancelled_batch_changes_nothing(catalog):
+    add_lakes(catalog, 1200)
+
+    def cancel(count, total):
+        raise BatchCancelled
+
+    with pytest.raises(BatchCancelled):
+        catalog.delete_many([f'Озеро {i:04}' for i in range(1200)], cancel)
+    assert len(catalog.lakes) == 1200
+    assert catalog.database.execute("SELECT count(*) FROM lakes").fetchone()[0] == 1200
@@ -0,0 +1,70 @@
+import threading
+
+from database import Database
+from lake_catalog import LakeCatalog
+from lake_changes import ChangeTracker
+
+
+def in_thread(target, *args):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target(*args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_own_batch_from_a_worker_is_not_applied_again(catalog):
+    catalog.load()
+    with catalog.batch_transaction() as connection:
+        connection.executemany("INSERT INTO lakes (name) VALUES (?)", [(f'Озеро {i:04}',) for i in range(600)])
+    catalog.load()
+    tracker = ChangeTracker(catalog)
+    names = in_thread(catalog.delete_rows, [f'Озеро {i:04}' for i in range(550)])
+    assert tracker.poll() is None
+    catalog.apply_deleted(names)
+    assert len(catalog.lakes.names) == 50
+
+
+def test_foreign_changes_are_applied(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро')
+    catalog.add('Ладога', 'Большое озеро')
+    tracker = ChangeTracker(catalog)
+    other = LakeCatalog(Database(catalog.database.path))
+    try:
+        other.load()
+        other.update('Ладога', 'Ладожское', 'Большое озеро')
+        other.add('Онего', '')
+        other.delete('Байкал')
+    finally:
+        other.close()
+    changes = tracker.poll()
+    assert not changes.reload
+    assert list(catalog.lakes.names) == ['Ладожское', 'Онего']
+
+
+def test_foreign_bulk_change_reloads(catalog):
+    catalog.load()
+    tracker = ChangeTracker(catalog, reload_threshold=10)
+    other = Database(catalog.database.path)
+    with other.transaction() as connection:
+        connection.executemany("INSERT INTO lakes (name) VALUES (?)", [(f'Озеро {i}',) for i in range(20)])
+    other.close()
+    assert tracker.poll().reload
+
+
+def test_commit_between_fetch_and_tracker_start_is_synced(catalog):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро')
+    snapshot = in_thread(catalog.lakes.fetch)
+    other = Database(catalog.database.path)
+    with other.transaction() as connection:
+        connection.execute("INSERT INTO lakes (name) VALUES ('Ладога')")
+    other.close()
+    catalog.reset(snapshot)
+    tracker = ChangeTracker(catalog, seq=snapshot.seq)
+    assert 'Ладога' not in catalog.lakes
+    changes = tracker.poll()
+    assert not changes.reload
+    assert changes.names == ['Ладога']
+    assert list(catalog.lakes) == ['Байкал', 'Ладога']
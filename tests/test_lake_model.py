@@ -0,0 +1,111 @@
+import tkinter as tk
+
+import pytest
+
+import maintenance
+from database import Database
+from lake_catalog import LakeCatalog
+from lake_changes import ChangeTracker
+from lake_list import VirtualList
+from lake_model import LakePager
+
+NAMES = ['Байкал', 'Белое', 'Ильмень', 'Ладожское', 'Онежское', 'Селигер', 'Телецкое', 'Чудское']
+
+
+class Recorder:
+
+    def __init__(self):
+        self.events = []
+
+    def __getattr__(self, event):
+        return lambda *args: self.events.append((event, args))
+
+
+def open_catalog(path: str, max_names) -> LakeCatalog:
+    database = Database(path)
+    maintenance.ensure_schema(database)
+    catalog = LakeCatalog(database, max_loaded_names=max_names)
+    for name in NAMES:
+        catalog.add(name, f'Описание {name}')
+    catalog.load()
+    return catalog
+
+
+@pytest.fixture
+def catalogs(tmp_path):
+    loaded = open_catalog(str(tmp_path / 'loaded.db'), None)
+    paged = open_catalog(str(tmp_path / 'paged.db'), 5)
+    yield loaded, paged
+    loaded.close()
+    paged.close()
+
+
+def test_large_catalog_is_paged(catalogs):
+    loaded, paged = catalogs
+    assert not loaded.lakes.paged and paged.lakes.paged
+    assert paged.lakes.names == []
+    assert len(paged.lakes) == len(NAMES)
+    assert paged.lakes[2:5] == NAMES[2:5] and paged.lakes[-1] == NAMES[-1]
+    assert 'Байкал' in paged.lakes and 'Нет такого' not in paged.lakes
+    assert paged.lakes.all_names() == NAMES
+
+
+def test_paged_edits_report_the_same_positions(catalogs):
+    recorders = []
+    for catalog in catalogs:
+        recorder = Recorder()
+        catalog.lakes.subscribe(recorder)
+        recorders.append(recorder)
+        catalog.add('Великое', '')
+        catalog.update('Чудское', 'Айдар', 'Переименовано')
+        catalog.update('Белое', 'Щучье', 'Переименовано')
+        catalog.delete('Ильмень')
+        catalog.delete_many(['Онежское', 'Байкал', 'Щучье', 'Ладожское'])
+    loaded, paged = catalogs
+    assert recorders[0].events == recorders[1].events
+    assert paged.lakes[:] == loaded.lakes[:] == ['Айдар', 'Великое', 'Селигер', 'Телецкое']
+
+
+def test_paged_search_matches_word_prefixes(catalogs):
+    _, paged = catalogs
+    assert paged.search('бел') == ['Белое']
+    assert paged.search('ское') == []
+    paged.build_search_index()
+    assert paged.search_index is None
+
+
+def test_foreign_changes_reload_a_paged_model(catalogs):
+    _, paged = catalogs
+    tracker = ChangeTracker(paged)
+    other = Database(paged.database.path)
+    other.execute("INSERT INTO lakes (name) VALUES ('Онего')")
+    other.close()
+    assert tracker.poll().reload
+
+
+def test_pager_slices_across_pages_and_keeps_a_bounded_cache(tmp_path):
+    database = Database(str(tmp_path / 'lakes.db'))
+    maintenance.ensure_schema(database)
+    names = [f'Озеро {i:03}' for i in range(250)]
+    database.executemany("INSERT INTO lakes (name) VALUES (?)", [(name,) for name in names])
+    pager = LakePager(database, page_size=10, max_pages=3)
+    pager.invalidate(len(names))
+    assert pager[95:125] == names[95:125]
+    assert pager[240:300] == names[240:]
+    assert pager[5:5] == []
+    assert len(pager.pages) == 3
+    assert list(pager.names()) == names
+    database.close()
+
+
+def test_virtual_list_shows_only_the_visible_window(tk_root):
+    names = [f'Озеро {i:04}' for i in range(1000)]
+    list_box = tk.Listbox(tk_root, height=10)
+    list_box.insert(tk.END, 'Список озер')
+    list_box.pack()
+    tk_root.update()
+    virtual = VirtualList(list_box, names)
+    virtual.refresh()
+    assert list_box.size() - 1 <= virtual.visible_rows() + 1
+    virtual.scroll(10)
+    assert list_box.get(1) == names[virtual.offset]
@@ -0,0 +1,23 @@
+import maintenance
+
+
+def test_ensure_schema_drops_the_duplicate_name_index(catalog):
+    database = catalog.database
+    database.execute("CREATE INDEX lakes_name_idx ON lakes (name)")
+    maintenance.ensure_schema(database)
+    indexes = {row[0] for row in database.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'lakes_name_idx' not in indexes
+    assert 'lakes_image_idx' in indexes
+
+
+def test_name_queries_use_the_unique_autoindex(catalog):
+    connection = catalog.database.connection
+    for sql in ("SELECT image_id FROM lakes WHERE name = 'Байкал'", "SELECT rowid, name FROM lakes ORDER BY name"):
+        plan = ' '.join(row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert 'sqlite_autoindex_lakes_1' in plan, plan
+
+
+def test_hot_queries_do_not_scan(catalog):
+    maintenance.ensure_name_search(catalog.database)
+    assert maintenance.full_scans(catalog.database.connection) == []
+    assert maintenance.check(catalog.database.connection) == []
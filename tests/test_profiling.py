@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+from profiling import HEAVY_MODULES, Histogram, Metrics, StartupProfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_module_does_not_import_heavy_libraries():
+    code = f'import sys, class_app; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_startup_report_is_printed_once_every_expected_phase_is_marked(capsys):
+    profile = StartupProfile(True, started=0)
+    profile.expect('окно показано', 'список озер загружен')
+    profile.mark('окно показано')
+    assert capsys.readouterr().out == ''
+    profile.mark('список озер загружен')
+    out = capsys.readouterr().out
+    assert 'окно показано' in out and 'список озер загружен' in out
+    assert [phase for phase, _, _ in profile.phases] == ['окно показано', 'список озер загружен']
+
+
+def test_disabled_profile_records_nothing(capsys):
+    profile = StartupProfile(False)
+    profile.expect('окно показано')
+    profile.mark('окно показано')
+    assert profile.phases == [] and capsys.readouterr().out == ''
+
+
+def test_histogram_percentiles_follow_the_buckets():
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.add(0.0001)
+    for _ in range(10):
+        histogram.add(0.05)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['p50_ms'] <= 0.2
+    assert 32 <= summary['p99_ms'] <= 50
+    assert summary['max_ms'] == 50
+
+
+def test_disabled_metrics_cost_nothing_and_record_nothing():
+    metrics = Metrics()
+    with metrics.timer('sqlite.select_lake'):
+        pass
+    metrics.count('search.scans')
+    assert metrics.report() == {'timers': {}, 'counters': {}}
+
+
+def test_report_file_holds_timers_and_counters(tmp_path):
+    metrics = Metrics()
+    metrics.enabled = True
+    metrics.report_file = str(tmp_path / 'metrics.json')
+    with metrics.timer('sqlite.select_lake'):
+        pass
+    metrics.count('search.scans', 2)
+    metrics.export()
+    with open(metrics.report_file, encoding='utf-8') as source:
+        report = json.load(source)
+    assert report['timers']['sqlite.select_lake']['count'] == 1
+    assert report['counters'] == {'search.scans': 2}
+
+
+def test_slow_tk_handlers_are_logged(caplog):
+    metrics = Metrics()
+    metrics.slow_threshold = 0.01
+
+    def show_lake():
+        pass
+
+    metrics.handler_finished(show_lake, 0.02)
+    metrics.handler_finished(show_lake, 0.001)
+    assert metrics.histograms['tk.' + show_lake.__qualname__].count == 2
+    assert len(caplog.records) == 1 and 'show_lake' in caplog.records[0].getMessage()
@@ -0,0 +1,68 @@
+import random
+
+from search_index import SearchIndex, diff_sorted, scan
+
+NAMES = sorted(['Байкал', 'Ладожское', 'Онежское', 'Телецкое', 'Селигер', 'Ильмень', 'Чудское', 'Ёлкино',
+                'Белое', 'Большое Белое', 'Малое Белое'])
+
+
+def test_search_matches_scan():
+    index = SearchIndex(NAMES)
+    for query in ['', 'б', 'бел', 'БЕЛОЕ', 'ое', 'ское', 'кал', 'ёлк', 'нет такого', 'е б']:
+        assert index.search(query) == scan(NAMES, query), query
+
+
+def test_search_follows_model_events():
+    index = SearchIndex(NAMES)
+    index.inserted(0, 'Белоозеро')
+    index.deleted(0, 'Белое')
+    index.moved(0, 0, 'Малое Белое', 'Малое Белое 2')
+    index.deleted_many([0, 1], ['Байкал', 'Ильмень'])
+    expected = sorted(set(NAMES) - {'Белое', 'Малое Белое', 'Байкал', 'Ильмень'} | {'Белоозеро', 'Малое Белое 2'})
+    for query in ['', 'бел', 'ое 2', 'кал']:
+        assert index.search(query) == scan(expected, query), query
+
+
+def test_diff_sorted_turns_old_into_new():
+    rng = random.Random(1)
+    for _ in range(200):
+        old = sorted(rng.sample(NAMES, rng.randint(0, len(NAMES))))
+        new = sorted(rng.sample(NAMES, rng.randint(0, len(NAMES))))
+        result = list(old)
+        for operation, position, names in diff_sorted(old, new):
+            if operation == 'insert':
+                result[position:position] = names
+            else:
+                assert result[position:position + len(names)] == names
+                del result[position:position + len(names)]
+        assert result == new
+
+
+def test_index_built_elsewhere_catches_up_with_edits(catalog):
+    for name in NAMES:
+        catalog.add(name, '')
+    assert catalog.search('бел') == ['Белое', 'Большое Белое', 'Малое Белое']
+    pending = catalog.start_search_index()
+    index = SearchIndex(pending.names)
+    catalog.add('Белоозеро', '')
+    catalog.delete('Белое')
+    catalog.install_search_index(pending, index)
+    assert catalog.search_index is index
+    assert catalog.search('бел') == ['Белоозеро', 'Большое Белое', 'Малое Белое']
+    stale = catalog.start_search_index()
+    catalog.reset(catalog.lakes.fetch())
+    catalog.install_search_index(stale, SearchIndex(stale.names))
+    assert catalog.search_index is None
+
+
+def test_only_trigrams_are_indexed():
+    index = SearchIndex(NAMES)
+    assert index.postings and all(len(gram) == SearchIndex.GRAM for gram in index.postings)
+
+
+def test_short_queries_scan_and_narrow():
+    index = SearchIndex(NAMES)
+    index.discard('Белое')
+    expected = [name for name in NAMES if name != 'Белое']
+    for query in ['б', 'бо', 'бол', 'боль', 'е', 'ел', 'ё', '']:
+        assert index.search(query) == scan(expected, query), query
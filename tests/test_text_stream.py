@@ -0,0 +1,58 @@
+import tkinter as tk
+
+from text_stream import MORE_TAG, TextStreamer
+
+
+def pump(root: tk.Tk, streamer: TextStreamer) -> None:
+    while streamer.tasks:
+        root.update()
+
+
+def test_long_text_arrives_in_chunks(tk_root):
+    streamer = TextStreamer(tk_root, chunk_chars=100)
+    widget = tk.Text(tk_root, state=tk.DISABLED)
+    text = 'Байкал. ' * 1000
+    streamer.show(widget, text)
+    assert widget.get('1.0', 'end-1c') == ''
+    pump(tk_root, streamer)
+    assert widget.get('1.0', 'end-1c') == text
+    assert str(widget.cget('state')) == tk.DISABLED
+
+
+def test_preview_shows_the_rest_on_click(tk_root):
+    streamer = TextStreamer(tk_root)
+    widget = tk.Text(tk_root)
+    text = 'Первая строка\n' + 'слово ' * 100
+    streamer.show(widget, text, preview=50)
+    pump(tk_root, streamer)
+    assert widget.tag_ranges(MORE_TAG)
+    streamer.show_rest(widget)
+    pump(tk_root, streamer)
+    assert widget.get('1.0', 'end-1c') == text
+    assert not widget.tag_ranges(MORE_TAG)
+
+
+def test_more_link_is_bound_once(tk_root):
+    streamer = TextStreamer(tk_root)
+    widget = tk.Text(tk_root)
+    streamer.show(widget, 'а' * 200, preview=50)
+    pump(tk_root, streamer)
+    binding = widget.tag_bind(MORE_TAG, '<Button-1>')
+    commands = len(tk_root.tk.call('info', 'commands'))
+    for _ in range(20):
+        streamer.show(widget, 'б' * 200, preview=50)
+        pump(tk_root, streamer)
+    assert widget.tag_bind(MORE_TAG, '<Button-1>') == binding
+    assert len(tk_root.tk.call('info', 'commands')) == commands
+    streamer.show_rest(widget)
+    pump(tk_root, streamer)
+    assert widget.get('1.0', 'end-1c') == 'б' * 200
+
+
+def test_flush_drops_the_more_link(tk_root):
+    streamer = TextStreamer(tk_root, chunk_chars=10)
+    widget = tk.Text(tk_root)
+    streamer.show(widget, 'в' * 200, preview=50)
+    streamer.flush(widget)
+    assert widget.get('1.0', 'end-1c') == 'в' * 50
+    assert not streamer.tasks
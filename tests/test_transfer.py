@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+import maintenance  # noqa: E402
+import transfer  # noqa: E402
+from database import Database  # noqa: E402
+from image_ingest import ImageIngest  # noqa: E402
+
+
+@pytest.fixture
+def ingest(monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return ImageIngest()
+
+
+def png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def lakes(database: Database):
+    return database.execute("SELECT lakes.name, lakes.description, images.picture FROM lakes "
+                            "LEFT JOIN images ON images.id = lakes.image_id ORDER BY lakes.name").fetchall()
+
+
+@pytest.mark.parametrize('file_format', ['tar', 'jsonl', 'csv'])
+def test_export_and_import_keep_the_catalog(catalog, ingest, tmp_path, file_format):
+    catalog.load()
+    catalog.add('Байкал', 'Глубокое озеро', ingest.ingest(png('blue')))
+    catalog.add('Ладога', 'Большое озеро', ingest.ingest(png('blue')))
+    catalog.add('Онего', 'Без изображения')
+    catalog.add('Светлое, "малое"', 'Строка\nс переносом', ingest.ingest(png('green')))
+    output = str(tmp_path / f'lakes.{file_format}')
+    images = None if file_format == 'tar' else str(tmp_path / 'images')
+    exporter = transfer.Exporter(catalog.database, batch_size=2)
+    if file_format == 'tar':
+        exporter.export_archive(output)
+    else:
+        exporter.export_files(output, file_format, images)
+
+    target = Database(str(tmp_path / 'copy.db'))
+    maintenance.ensure_schema(target)
+    importer = transfer.Importer(target, ingest, batch_size=2, workers=2)
+    try:
+        if file_format == 'tar':
+            importer.import_archive(output)
+        else:
+            importer.import_files(output, file_format, images)
+    finally:
+        importer.close()
+    assert lakes(target) == lakes(catalog.database)
+    assert target.execute("SELECT count(*) FROM images").fetchone()[0] == 2
+    assert target.execute("SELECT count(*) FROM lakes_fts WHERE lakes_fts MATCH 'глубокое'").fetchone()[0] == 1
+    target.close()
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wiki_batch import Enricher, retry_after
+
+PAGE = ('<html><body><div id="bodyContent"><div class="mw-parser-output">'
+        '<p>Байкал — самое глубокое озеро на планете.</p></div></div></body></html>')
+
+
+def error(status: int, headers: dict) -> aiohttp.ClientResponseError:
+    return aiohttp.ClientResponseError(None, (), status=status, headers=headers)
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert retry_after(error(429, {'Retry-After': '7'})) == 7
+    assert 50 < retry_after(error(503, {'Retry-After': formatdate(time.time() + 60, usegmt=True)})) <= 60
+    assert retry_after(error(429, {'Retry-After': 'скоро'})) is None
+    assert retry_after(error(429, {})) is None
+    assert retry_after(error(500, {'Retry-After': '7'})) is None
+
+
+def test_enricher_waits_as_long_as_the_server_asks(catalog):
+    answers = [web.Response(status=429, headers={'Retry-After': '0'})]
+
+    async def article(request):
+        if answers:
+            return answers.pop()
+        return web.Response(text=PAGE, content_type='text/html')
+
+    async def fetch():
+        application = web.Application()
+        application.router.add_get('/wiki/{name}', article)
+        async with TestServer(application) as server:
+            enricher = Enricher(catalog.database, str(server.make_url('/wiki/')), rate=0, retries=2)
+            async with aiohttp.ClientSession() as session:
+                started = time.monotonic()
+                text = await enricher.fetch(session, 'Байкал')
+                return text, time.monotonic() - started
+
+    text, elapsed = asyncio.run(fetch())
+    assert text == 'Байкал — самое глубокое озеро на планете.'
+    # the exponential backoff would have slept at least half a second
+    assert elapsed < 0.4
+    assert not answers
@@ -0,0 +1,52 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wiki_cache import WikiCache, url_title
+from wiki_client import get_info_lake
+
+PAGE = ('<html><body><div id="bodyContent"><div class="mw-parser-output">'
+        '<p>Байкал — самое глубокое озеро на планете.</p></div></div></body></html>')
+
+
+def test_titles_from_urls_are_normalized():
+    assert url_title('https://ru.wikipedia.org/wiki/%D0%B1%D0%B0%D0%B9%D0%BA%D0%B0%D0%BB') == 'Байкал'
+    assert url_title('https://ru.wikipedia.org/wiki/Озеро  Байкал') == url_title('/wiki/озеро_Байкал')
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = WikiCache(str(tmp_path / 'cache.db'), max_bytes=400)
+    for i in range(20):
+        cache.put(f'Озеро {i}', None, None, 'о' * 10)
+    cache.get('Озеро 0')
+    cache.put('Байкал', None, None, 'б' * 10)
+    assert cache.get('Озеро 1') is None
+    assert cache.get('Озеро 0').text == 'о' * 10
+    assert cache.get('Байкал').text == 'б' * 10
+    assert cache.used_bytes <= 400
+    cache.close()
+
+
+def test_stale_page_is_revalidated_with_its_etag(tmp_path):
+    cache = WikiCache(str(tmp_path / 'cache.db'), max_age=0)
+    seen = []
+
+    async def article(request):
+        seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.Response(text=PAGE, content_type='text/html', headers={'ETag': '"v1"'})
+
+    async def fetch_twice():
+        application = web.Application()
+        application.router.add_get('/wiki/{name}', article)
+        async with TestServer(application) as server, aiohttp.ClientSession() as session:
+            url = str(server.make_url('/wiki/Байкал'))
+            return [await get_info_lake(session, url, cache=cache) for _ in range(2)]
+
+    first, second = asyncio.run(fetch_twice())
+    assert first == second == 'Байкал — самое глубокое озеро на планете.'
+    assert seen == [None, '"v1"']
+    cache.close()
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from wiki_client import WikiClient
+
+PAGE = ('<html><body><div id="bodyContent"><div class="mw-parser-output">'
+        '<p>Байкал — самое глубокое озеро на планете.</p></div></div></body></html>')
+
+
+@pytest.fixture
+def wiki():
+    hits = Counter()
+
+    async def article(request):
+        name = request.match_info['name']
+        hits[name] += 1
+        if name != 'Байкал':
+            raise web.HTTPNotFound()
+        await asyncio.sleep(0.2)
+        return web.Response(text=PAGE, content_type='text/html')
+
+    application = web.Application()
+    application.router.add_get('/wiki/{name}', article)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = TestServer(application)
+    asyncio.run_coroutine_threadsafe(server.start_server(), loop).result(timeout=5)
+    client = WikiClient(str(server.make_url('/wiki/')), timeout=5)
+    yield client, hits
+    client.close()
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+    loop.close()
+
+
+def test_requests_for_one_article_share_a_download(wiki):
+    client, hits = wiki
+    pieces = []
+    first = client.request('Байкал', pieces.append)
+    second = client.request('Байкал')
+    assert first.result(timeout=5) == second.result(timeout=5) == 'Байкал — самое глубокое озеро на планете.'
+    assert hits['Байкал'] == 1
+    assert ''.join(pieces) == first.result()
+
+
+def test_session_outlives_a_request(wiki):
+    client, _ = wiki
+    client.request('Байкал').result(timeout=5)
+    session = client.session
+    assert client.request('Нет такого').result(timeout=5) is None
+    assert client.session is session and not session.closed
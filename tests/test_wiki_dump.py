@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import wiki_dump
+from wiki_dump import DumpImporter, lake_titles
+from wiki_parser import wikitext_to_text
+
+DUMP = os.path.join(os.path.dirname(__file__), 'data', 'lakes-multistream.xml.bz2')
+
+
+def test_multistream_chunks_hold_whole_streams():
+    assert wiki_dump.is_multistream(DUMP)
+    chunks = list(wiki_dump.bz2_streams(DUMP, 0, 200))
+    assert chunks[-1][0] == os.path.getsize(DUMP)
+    pages = [wiki_dump.parse_chunk(data, True)[0] for _, data in chunks]
+    assert sum(pages) == 4
+
+
+def test_import_fills_empty_descriptions(catalog, tmp_path):
+    catalog.load()
+    catalog.add('Байкал', '')
+    catalog.add('Ладога', '')
+    catalog.add('Онежское озеро', 'Нет информации')
+    catalog.add('Светлое', 'Уже есть описание')
+    importer = DumpImporter(catalog.database, lake_titles(catalog.database, False), processes=1, chunk_size=200)
+    importer.run(DUMP, checkpoint=str(tmp_path / 'checkpoint'))
+    assert importer.stats == {'pages': 4, 'found': 2, 'updated': 2}
+    descriptions = dict(catalog.database.execute("SELECT name, description FROM lakes"))
+    assert descriptions['Байкал'].startswith('Байкал — озеро тектонического происхождения')
+    assert descriptions['Онежское озеро'].startswith('Онежское озеро — второе')
+    assert descriptions['Ладога'] == ''
+    assert wiki_dump.load_checkpoint(str(tmp_path / 'checkpoint'), DUMP) == os.path.getsize(DUMP)
+
+
+def test_dump_importer_does_not_load_the_http_client():
+    code = "import sys, wiki_dump; print(sorted({'aiohttp', 'wiki_batch', 'wiki_client'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.strip() == '[]'
+
+
+def test_wikitext_to_text():
+    wikitext = ("{{Озеро|Название=Байкал}}'''Байкал''' — [[озеро]] в [[Восточная Сибирь|Восточной Сибири]]"
+                "<ref>Источник</ref>.\n== География ==\nГлубина 1642 м.")
+    assert wikitext_to_text(wikitext) == 'Байкал — озеро в Восточной Сибири.\nГеография\nГлубина 1642 м.'
+    assert wikitext_to_text(wikitext, lead_only=True) == 'Байкал — озеро в Восточной Сибири.'
@@ -0,0 +1,50 @@
+import pytest
+
+from wiki_parser import StreamingExtractor, extract_text
+
+PAGE = ('<html><head><title>Байкал</title></head><body><div id="content">'
+        '<div id="bodyContent" class="vector-body"><div class="mw-parser-output">'
+        '<table class="infobox"><tr><td>Площадь</td></tr></table>'
+        '<p><b>Байкал</b> — озеро тектонического происхождения<sup>[1]</sup> в южной части '
+        'Восточной Сибири,<br>самое глубокое озеро на планете.</p>\n\n\n'
+        '<div class="mw-heading mw-heading2"><h2>География</h2></div>'
+        '<p>Озеро вытянуто с северо-востока на юго-запад на 620 км.</p>'
+        '<div class="navbox">Озёра России</div>'
+        '</div></div><div id="footer">Подвал</div></div></body></html>')
+
+
+def test_extraction_skips_tables_notes_and_navigation():
+    text = extract_text(PAGE, use_lxml=False)
+    assert text.startswith('Байкал — озеро тектонического происхождения в южной части Восточной Сибири,\n')
+    assert 'Озеро вытянуто' in text
+    assert 'Площадь' not in text and '[1]' not in text and 'Озёра России' not in text and 'Подвал' not in text
+
+
+def test_lead_only_stops_at_the_first_section():
+    text = extract_text(PAGE, lead_only=True, use_lxml=False)
+    assert text.endswith('самое глубокое озеро на планете.')
+    assert 'География' not in text
+
+
+def test_page_without_body_content_is_empty():
+    assert extract_text('<html><body><p>Нет статьи</p></body></html>', use_lxml=False) == ''
+
+
+def stream(page: str, size: int, lead_only: bool = False) -> str:
+    data = page.encode('utf-8')
+    extractor = StreamingExtractor(lead_only)
+    pieces = [extractor.feed(data[start:start + size]) for start in range(0, len(data), size)]
+    pieces.append(extractor.feed(b'', final=True))
+    assert ''.join(pieces) == extractor.text()
+    return extractor.text()
+
+
+# sizes of 1 and 7 bytes split the two-byte Cyrillic characters between feeds
+@pytest.mark.parametrize('size', [1, 7, 64, 100000])
+@pytest.mark.parametrize('lead_only', [False, True])
+def test_streaming_matches_whole_page_extraction(size, lead_only):
+    assert stream(PAGE, size, lead_only) == extract_text(PAGE, lead_only, use_lxml=False)
+
+
+def test_streaming_page_without_body_content_is_empty():
+    assert stream('<html><body><p>Нет статьи</p></body></html>', 5) == ''
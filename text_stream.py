@@ -0,0 +1,124 @@
+import time
+import tkinter as tk
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Union
+
+from profiling import metrics
+
+MORE_TAG = 'more'
+MORE = object()
+
+
+class TextStreamer:
+
+    def __init__(self, root: tk.Misc, chunk_chars: int = 4096, slice_ms: float = 8):
+        self.root = root
+        self.chunk_chars = chunk_chars
+        self.slice = slice_ms / 1000
+        self.queues: Dict[str, Deque[Union[str, object]]] = {}
+        self.widgets: Dict[str, tk.Text] = {}
+        self.tasks: Dict[str, str] = {}
+        self.rests: Dict[str, str] = {}
+
+    def show(self, widget: tk.Text, text: str, preview: int = 0) -> None:
+        self.cancel(widget)
+        self.rests.pop(str(widget), None)
+        with editable(widget):
+            widget.delete(1.0, tk.END)
+        if preview and len(text) > preview:
+            cut = text.rfind('\n', 0, preview)
+            cut = cut if cut > preview // 2 else preview
+            self.append(widget, text[:cut])
+            self.queue(widget).append(MORE)
+            self.rests[str(widget)] = text[cut:]
+            self.bind_more(widget)
+        else:
+            self.append(widget, text)
+
+    def append(self, widget: tk.Text, text: str) -> None:
+        queue = self.queue(widget)
+        for start in range(0, len(text), self.chunk_chars):
+            queue.append(text[start:start + self.chunk_chars])
+        self.widgets[str(widget)] = widget
+        if str(widget) not in self.tasks:
+            self.tasks[str(widget)] = self.root.after_idle(self.pump, str(widget))
+
+    def queue(self, widget: tk.Text) -> Deque[Union[str, object]]:
+        return self.queues.setdefault(str(widget), deque())
+
+    def pump(self, path: str) -> None:
+        self.tasks.pop(path, None)
+        widget = self.widgets.get(path)
+        queue = self.queues.get(path)
+        if widget is None or not queue or not widget.winfo_exists():
+            self.forget(path)
+            return
+        started = time.perf_counter()
+        with metrics.timer('text.insert_slice'), editable(widget):
+            while queue and time.perf_counter() - started < self.slice:
+                self.insert(widget, queue.popleft())
+        if queue:
+            self.tasks[path] = self.root.after(1, self.pump, path)
+        else:
+            self.forget(path)
+
+    # every tag_bind registers a new Tcl command that lives as long as the widget, so the link is bound once
+    # and the rest of the text is looked up when it is clicked
+    def bind_more(self, widget: tk.Text) -> None:
+        if widget.tag_bind(MORE_TAG, '<Button-1>'):
+            return
+        widget.tag_configure(MORE_TAG, foreground='blue', underline=True)
+        widget.tag_bind(MORE_TAG, '<Button-1>', lambda event: self.show_rest(widget))
+        widget.tag_bind(MORE_TAG, '<Enter>', lambda event: widget.configure(cursor='hand2'))
+        widget.tag_bind(MORE_TAG, '<Leave>', lambda event: widget.configure(cursor=''))
+
+    def insert(self, widget: tk.Text, chunk: Union[str, object]) -> None:
+        if chunk is MORE:
+            widget.insert(tk.END, '\n\nПоказать полностью…', MORE_TAG)
+        else:
+            widget.insert(tk.END, chunk)
+
+    def show_rest(self, widget: tk.Text) -> None:
+        rest = self.rests.pop(str(widget), None)
+        ranges = widget.tag_ranges(MORE_TAG)
+        if rest is None or not ranges:
+            return
+        with editable(widget):
+            widget.delete(ranges[0], ranges[1])
+        widget.configure(cursor='')
+        self.append(widget, rest)
+
+    def flush(self, widget: tk.Text) -> None:
+        path = str(widget)
+        queue = self.queues.get(path)
+        if queue:
+            with editable(widget):
+                while queue:
+                    chunk = queue.popleft()
+                    if chunk is not MORE:
+                        widget.insert(tk.END, chunk)
+        self.cancel(widget)
+
+    def cancel(self, widget: tk.Text) -> None:
+        path = str(widget)
+        task = self.tasks.pop(path, None)
+        if task is not None:
+            self.root.after_cancel(task)
+        self.forget(path)
+
+    def forget(self, path: str) -> None:
+        self.queues.pop(path, None)
+        self.widgets.pop(path, None)
+
+
+@contextmanager
+def editable(widget: tk.Text) -> Iterator[tk.Text]:
+    disabled = str(widget.cget('state')) == tk.DISABLED
+    if disabled:
+        widget.configure(state=tk.NORMAL)
+    try:
+        yield widget
+    finally:
+        if disabled:
+            widget.configure(state=tk.DISABLED)
@@ -0,0 +1,289 @@
+import argparse
+import configparser
+import csv
+import io
+import json
+import os
+import tarfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import full_text
+import lake_changes
+import maintenance
+from database import Database
+from image_ingest import ImageIngest
+from image_store import ImageStore, image_extension
+
+FIELDS = ('name', 'description', 'image')
+
+csv.field_size_limit(2 ** 31 - 1)
+
+
+class Progress:
+
+    def __init__(self, action: str):
+        self.action = action
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, rows: int) -> None:
+        self.rows += rows
+        print(f'\r{self.action}: {self.rows} записей, {self.rate():.0f} записей/с', end='', flush=True)
+
+    def rate(self) -> float:
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        print(f'\r{self.action}: {self.rows} записей за {elapsed:.1f} с, {self.rate():.0f} записей/с')
+
+
+class Exporter:
+
+    def __init__(self, database: Database, batch_size: int = 1000):
+        self.database = database
+        self.batch_size = batch_size
+
+    def batches(self) -> Iterator[List[Tuple]]:
+        last = 0
+        while True:
+            rows = self.database.execute("SELECT lakes.rowid, lakes.name, lakes.description, images.id, images.hash, "
+                                         "length(images.picture) FROM lakes "
+                                         "LEFT JOIN images ON images.id = lakes.image_id "
+                                         "WHERE lakes.rowid > ? ORDER BY lakes.rowid LIMIT ?",
+                                         (last, self.batch_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last = rows[-1][0]
+
+    def image_name(self, image_id: int, digest: str) -> str:
+        with self.database.connection.blobopen('images', 'picture', image_id, readonly=True) as blob:
+            head = blob.read(12)
+        return f'{digest}.{image_extension(head)}'
+
+    def copy_image(self, image_id: int, target) -> None:
+        with self.database.connection.blobopen('images', 'picture', image_id, readonly=True) as blob:
+            while chunk := blob.read(1024 * 1024):
+                target.write(chunk)
+
+    def export_files(self, output: str, file_format: str, images_dir: Optional[str]) -> None:
+        progress = Progress('Экспорт')
+        if images_dir is not None:
+            os.makedirs(images_dir, exist_ok=True)
+        with open(output, 'w', encoding='utf-8', newline='') as target:
+            writer = RecordWriter(target, file_format)
+            for rows in self.batches():
+                for _, name, description, image_id, digest, _ in rows:
+                    image = None
+                    if image_id is not None and images_dir is not None:
+                        image = self.image_name(image_id, digest)
+                        path = os.path.join(images_dir, image)
+                        if not os.path.exists(path):
+                            with open(path, 'wb') as image_file:
+                                self.copy_image(image_id, image_file)
+                    writer.write(name, description, image)
+                progress.add(len(rows))
+        progress.finish()
+
+    def export_archive(self, output: str) -> None:
+        progress = Progress('Экспорт')
+        exported = set()
+        with tarfile.open(output, 'w|') as archive:
+            for number, rows in enumerate(self.batches()):
+                records = io.StringIO()
+                writer = RecordWriter(records, 'jsonl')
+                for _, name, description, image_id, digest, size in rows:
+                    image = None
+                    if image_id is not None:
+                        image = 'images/' + self.image_name(image_id, digest)
+                        if digest not in exported:
+                            exported.add(digest)
+                            info = tarfile.TarInfo(image)
+                            info.size = size
+                            with self.database.connection.blobopen('images', 'picture', image_id,
+                                                                   readonly=True) as blob:
+                                archive.addfile(info, blob)
+                    writer.write(name, description, image)
+                data = records.getvalue().encode('utf-8')
+                info = tarfile.TarInfo(f'lakes-{number:06d}.jsonl')
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+                progress.add(len(rows))
+        progress.finish()
+
+
+class RecordWriter:
+
+    def __init__(self, target: TextIO, file_format: str):
+        self.target = target
+        self.csv = csv.writer(target) if file_format == 'csv' else None
+        if self.csv is not None:
+            self.csv.writerow(FIELDS)
+
+    def write(self, name: str, description: Optional[str], image: Optional[str]) -> None:
+        if self.csv is not None:
+            self.csv.writerow((name, description or '', image or ''))
+        else:
+            self.target.write(json.dumps({'name': name, 'description': description, 'image': image},
+                                         ensure_ascii=False) + '\n')
+
+
+def read_records(source: TextIO, file_format: str) -> Iterator[Dict[str, Optional[str]]]:
+    if file_format == 'csv':
+        for record in csv.DictReader(source):
+            yield {field: record.get(field) or None for field in FIELDS}
+    else:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunked(records: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Importer:
+
+    def __init__(self, database: Database, ingest: ImageIngest, batch_size: int = 5000, workers: int = 4,
+                 replace: bool = False):
+        self.database = database
+        self.ingest = ingest
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self.replace = replace
+        self.progress = Progress('Импорт')
+        self.image_ids: Dict[str, Optional[int]] = {}
+        if replace:
+            self.sql = ("INSERT INTO lakes (name, description, image_id) VALUES (?, ?, ?) "
+                        "ON CONFLICT (name) DO UPDATE SET description = excluded.description, "
+                        "image_id = excluded.image_id")
+        else:
+            self.sql = "INSERT OR IGNORE INTO lakes (name, description, image_id) VALUES (?, ?, ?)"
+
+    def defer_indexes(self, connection) -> None:
+        # the UNIQUE autoindex on name stays, ON CONFLICT needs it
+        for index in maintenance.INDEXES:
+            connection.execute(f"DROP INDEX IF EXISTS {index}")
+        for trigger in full_text.FTS_TRIGGERS:
+            connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        lake_changes.drop_change_triggers(connection)
+
+    def restore_indexes(self, connection) -> None:
+        maintenance.ensure_indexes(connection)
+        full_text.create_fts_triggers(connection)
+        full_text.rebuild_fts(connection)
+        lake_changes.create_change_triggers(connection)
+        lake_changes.mark_reset(connection)
+        if maintenance.has_name_search(connection):
+            maintenance.fill_folded_names(connection)
+
+    def store_image(self, connection, key: str, images: Tuple[Optional[bytes], Optional[bytes]]) -> Optional[int]:
+        image_id = ImageStore.put(connection, *images)
+        self.image_ids[key] = image_id
+        return image_id
+
+    def insert(self, connection, records: List[Dict], images: Dict[str, Future]) -> None:
+        rows = []
+        for record in records:
+            key = record.get('image')
+            if key and key not in self.image_ids and key in images:
+                try:
+                    loaded = images.pop(key).result()
+                except (OSError, ValueError) as e:
+                    print(f'{key}: изображение не прочитано ({e})')
+                    loaded = (None, None)
+                self.store_image(connection, key, loaded)
+            rows.append((record['name'], record.get('description'), self.image_ids.get(key) if key else None))
+        connection.executemany(self.sql, rows)
+        self.progress.add(len(rows))
+
+    def load_file(self, path: str) -> Tuple[Optional[bytes], Optional[bytes]]:
+        with open(path, 'rb') as image_file:
+            return self.ingest.ingest(image_file.read())
+
+    def import_files(self, source: str, file_format: str, images_dir: Optional[str]) -> None:
+        with open(source, encoding='utf-8', newline='') as records, self.database.transaction() as connection:
+            self.defer_indexes(connection)
+            for batch in chunked(read_records(records, file_format), self.batch_size):
+                images = {}
+                if images_dir is not None:
+                    for record in batch:
+                        key = record.get('image')
+                        if key and key not in self.image_ids and key not in images:
+                            images[key] = self.pool.submit(self.load_file, os.path.join(images_dir, key))
+                self.insert(connection, batch, images)
+            self.restore_indexes(connection)
+        self.progress.finish()
+
+    def import_archive(self, source: str) -> None:
+        images: Dict[str, Future] = {}
+        with tarfile.open(source, 'r|*') as archive, self.database.transaction() as connection:
+            self.defer_indexes(connection)
+            for member in archive:
+                if not member.isfile():
+                    continue
+                data = archive.extractfile(member).read()
+                if member.name.endswith('.jsonl'):
+                    records = read_records(io.StringIO(data.decode('utf-8')), 'jsonl')
+                    for batch in chunked(records, self.batch_size):
+                        self.insert(connection, batch, images)
+                elif member.name.startswith('images/'):
+                    images[member.name] = self.pool.submit(self.ingest.ingest, data)
+            self.restore_indexes(connection)
+        self.progress.finish()
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Импорт и экспорт каталога озер')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('path', help='файл jsonl/csv или архив .tar')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'tar'],
+                        help='по умолчанию определяется по расширению файла')
+    parser.add_argument('--images', help='каталог с изображениями для jsonl/csv')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--replace', action='store_true', help='перезаписывать озера с совпадающим названием')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    file_format = args.format or ('tar' if '.tar' in args.path else 'csv' if args.path.endswith('.csv') else 'jsonl')
+    database = Database(config.get('database', 'database_file'))
+    ImageStore(database).ensure_schema()
+    full_text.ensure_fts(database)
+    lake_changes.ensure_change_log(database)
+
+    if args.command == 'export':
+        exporter = Exporter(database, args.batch_size)
+        if file_format == 'tar':
+            exporter.export_archive(args.path)
+        else:
+            exporter.export_files(args.path, file_format, args.images)
+    else:
+        importer = Importer(database, ImageIngest.from_config(config), args.batch_size, args.workers, args.replace)
+        try:
+            if file_format == 'tar':
+                importer.import_archive(args.path)
+            else:
+                importer.import_files(args.path, file_format, args.images)
+        finally:
+            importer.close()
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
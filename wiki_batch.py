@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import configparser
+import json
+import os
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from database import EMPTY_DESCRIPTION, Database
+from wiki_cache import WikiCache, open_cache
+from wiki_client import BASE_URL, article_url, get_info_lake
+
+MAX_RETRY_AFTER = 300
+
+
+# seconds the server asked to wait in a 429 or 503 answer, or None when it did not say
+def retry_after(error: BaseException) -> Optional[float]:
+    if not isinstance(error, aiohttp.ClientResponseError) or error.status not in (429, 503) or not error.headers:
+        return None
+    value = error.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0), MAX_RETRY_AFTER)
+
+
+class RateLimiter:
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot: Dict[str, float] = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        if not self.interval and host not in self.next_slot:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot.get(host, now), now)
+            self.next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+    # Retry-After applies to the whole host, so every request waiting for it is held back, not only the retry
+    async def pause(self, url: str, delay: float) -> None:
+        host = urlsplit(url).netloc
+        async with self.lock:
+            self.next_slot[host] = max(self.next_slot.get(host, 0), time.monotonic() + delay)
+
+
+class Enricher:
+
+    def __init__(self, database: Database, base_url: str = BASE_URL, concurrency: int = 8, rate: float = 10,
+                 retries: int = 4, timeout: float = 30, executor: Optional[Executor] = None,
+                 cache: Optional[WikiCache] = None):
+        self.database = database
+        self.cache = cache
+        self.base_url = base_url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.executor = executor
+        self.stats = {'updated': 0, 'missing': 0, 'failed': 0}
+
+    def pending(self, after: int, limit: int, everything: bool) -> List[Tuple[int, str]]:
+        condition = '' if everything else f'AND ({EMPTY_DESCRIPTION}) '
+        return self.database.execute(f"SELECT rowid, name FROM lakes WHERE rowid > ? {condition}"
+                                     f"ORDER BY rowid LIMIT ?", (after, limit)).fetchall()
+
+    def count(self, after: int, everything: bool) -> int:
+        condition = '' if everything else f'AND ({EMPTY_DESCRIPTION})'
+        return self.database.execute(f"SELECT count(*) FROM lakes WHERE rowid > ? {condition}",
+                                     (after,)).fetchone()[0]
+
+    async def fetch(self, session: aiohttp.ClientSession, name: str) -> Optional[str]:
+        url = article_url(self.base_url, name)
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                await self.limiter.wait(url)
+                try:
+                    return await get_info_lake(session, url, self.executor, self.cache)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = retry_after(e)
+                if delay is not None:
+                    await self.limiter.pause(url, delay)
+                else:
+                    await asyncio.sleep(2 ** attempt * 0.5 + random.random() * 0.5)
+
+    async def run(self, checkpoint: Optional[str], everything: bool, batch_size: int) -> None:
+        after = load_checkpoint(checkpoint)
+        total = self.count(after, everything)
+        done = 0
+        started = time.monotonic()
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                         headers={'User-Agent': 'AmDB lakes catalog'}) as session:
+            while True:
+                lakes = self.pending(after, batch_size, everything)
+                if not lakes:
+                    break
+                results = await asyncio.gather(*(self.fetch(session, name) for _, name in lakes),
+                                               return_exceptions=True)
+                updates = []
+                for (rowid, name), result in zip(lakes, results):
+                    if isinstance(result, BaseException):
+                        self.stats['failed'] += 1
+                        print(f'{name}: {result!r}')
+                    elif result is None:
+                        self.stats['missing'] += 1
+                    else:
+                        updates.append((result, rowid))
+                with self.database.transaction() as connection:
+                    connection.executemany("UPDATE lakes SET description = ? WHERE rowid = ?", updates)
+                self.stats['updated'] += len(updates)
+                after = lakes[-1][0]
+                save_checkpoint(checkpoint, after)
+                done += len(lakes)
+                elapsed = time.monotonic() - started
+                print(f"[{done}/{total}] обновлено {self.stats['updated']}, нет статьи {self.stats['missing']}, "
+                      f"ошибок {self.stats['failed']}, {done / elapsed:.1f} озер/с")
+
+
+def load_checkpoint(path: Optional[str]) -> int:
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as checkpoint:
+        return json.load(checkpoint)['rowid']
+
+
+def save_checkpoint(path: Optional[str], rowid: int) -> None:
+    if path is None:
+        return
+    with open(path + '.tmp', 'w', encoding='utf-8') as checkpoint:
+        json.dump({'rowid': rowid}, checkpoint)
+    os.replace(path + '.tmp', path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Загрузка описаний озер из википедии для всего каталога')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--all', action='store_true', help='обновить все озера, а не только без описания')
+    parser.add_argument('--base-url')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=10, help='запросов в секунду на хост, 0 - без ограничения')
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--checkpoint', default='wiki_batch.checkpoint')
+    parser.add_argument('--restart', action='store_true', help='начать заново, игнорируя контрольную точку')
+    parser.add_argument('--no-cache', action='store_true', help='не использовать кэш страниц википедии')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    base_url = args.base_url or config.get('wikipedia', 'base_url', fallback=BASE_URL)
+    timeout = float(config.get('wikipedia', 'timeout', fallback='30'))
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    database = Database(config.get('database', 'database_file'))
+    cache = None if args.no_cache else open_cache(config)
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        enricher = Enricher(database, base_url, args.concurrency, args.rate, args.retries, timeout, executor, cache)
+        asyncio.run(enricher.run(args.checkpoint, args.all, args.batch_size))
+    database.close()
+    if cache is not None:
+        cache.close()
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
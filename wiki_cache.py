@@ -0,0 +1,87 @@
+import configparser
+import sqlite3 as sq
+import threading
+import time
+from typing import NamedTuple, Optional
+from urllib.parse import unquote, urlsplit
+
+
+class CachedPage(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    text: str
+    fetched_at: float
+
+
+def normalize_title(title: str) -> str:
+    title = '_'.join(title.replace('_', ' ').split())
+    return title[:1].upper() + title[1:]
+
+
+def url_title(url: str) -> str:
+    return normalize_title(unquote(urlsplit(url).path.rsplit('/', 1)[-1]))
+
+
+class WikiCache:
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, max_age: float = 86400):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.connection = sq.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pages ("
+                                "title TEXT PRIMARY KEY, "
+                                "etag TEXT, "
+                                "last_modified TEXT, "
+                                "text TEXT NOT NULL, "
+                                "size INTEGER NOT NULL, "
+                                "fetched_at REAL NOT NULL, "
+                                "used_at REAL NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS pages_used_idx ON pages (used_at)")
+        self.used_bytes = self.connection.execute("SELECT coalesce(sum(size), 0) FROM pages").fetchone()[0]
+
+    def get(self, title: str) -> Optional[CachedPage]:
+        with self.lock:
+            row = self.connection.execute("SELECT etag, last_modified, text, fetched_at FROM pages WHERE title = ?",
+                                          (title,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE pages SET used_at = ? WHERE title = ?", (time.time(), title))
+            return CachedPage(*row)
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.time() - page.fetched_at < self.max_age
+
+    def touch(self, title: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.execute("UPDATE pages SET fetched_at = ?, used_at = ? WHERE title = ?", (now, now, title))
+
+    def put(self, title: str, etag: Optional[str], last_modified: Optional[str], text: str) -> None:
+        size = len(text.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            old = self.connection.execute("SELECT size FROM pages WHERE title = ?", (title,)).fetchone()
+            self.connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (title, etag, last_modified, text, size, now, now))
+            self.used_bytes += size - (old[0] if old else 0)
+            while self.used_bytes > self.max_bytes:
+                evicted = self.connection.execute("DELETE FROM pages WHERE title IN "
+                                                  "(SELECT title FROM pages ORDER BY used_at LIMIT 16) "
+                                                  "RETURNING size").fetchall()
+                if not evicted:
+                    break
+                self.used_bytes -= sum(row[0] for row in evicted)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def open_cache(config: configparser.ConfigParser) -> WikiCache:
+    return WikiCache(config.get('wikipedia', 'cache_file', fallback='wiki_cache.db'),
+                     int(config.get('wikipedia', 'cache_mb', fallback='50')) * 1024 * 1024,
+                     float(config.get('wikipedia', 'cache_max_age', fallback='86400')))
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from profiling import metrics
+from wiki_cache import WikiCache, url_title
+from wiki_parser import StreamingExtractor, extract_text
+
+BASE_URL = 'https://ru.wikipedia.org/wiki/'
+STREAM_CHUNK = 64 * 1024
+
+
+def parse_content(content: str, lead_only: bool = False) -> str:
+    return extract_text(content, lead_only)
+
+
+def article_url(base_url: str, topic: str) -> str:
+    return f"{base_url.rstrip('/')}/{topic}"
+
+
+async def stream_text(connection: aiohttp.ClientResponse, on_text: Callable[[str], None],
+                      executor: Optional[Executor] = None) -> str:
+    loop = asyncio.get_running_loop()
+    extractor = StreamingExtractor()
+    async for data in connection.content.iter_chunked(STREAM_CHUNK):
+        piece = await loop.run_in_executor(executor, extractor.feed, data)
+        if piece:
+            on_text(piece)
+        if extractor.finished:
+            break
+    piece = extractor.feed(b'', True)
+    if piece:
+        on_text(piece)
+    return extractor.text()
+
+
+async def get_info_lake(session: aiohttp.ClientSession, url: str, executor: Optional[Executor] = None,
+                        cache: Optional[WikiCache] = None,
+                        on_text: Optional[Callable[[str], None]] = None) -> Optional[str]:
+    title = url_title(url)
+    page = cache.get(title) if cache is not None else None
+    if page is not None and cache.is_fresh(page):
+        metrics.count('wiki.cache_fresh')
+        return page.text
+    headers = {}
+    if page is not None and page.etag:
+        headers['If-None-Match'] = page.etag
+    if page is not None and page.last_modified:
+        headers['If-Modified-Since'] = page.last_modified
+    try:
+        with metrics.timer('wiki.fetch'):
+            async with session.get(url, headers=headers) as connection:
+                metrics.count(f'wiki.status.{connection.status}')
+                if connection.status == 304 and page is not None:
+                    cache.touch(title)
+                    return page.text
+                if connection.status >= 500 or connection.status == 429:
+                    connection.raise_for_status()
+                if connection.status != 200:
+                    return None
+                etag = connection.headers.get('ETag')
+                last_modified = connection.headers.get('Last-Modified')
+                if on_text is not None:
+                    text = await stream_text(connection, on_text, executor)
+                else:
+                    content = await connection.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        if page is not None:
+            return page.text
+        raise
+    if on_text is None:
+        loop = asyncio.get_running_loop()
+        with metrics.timer('wiki.parse'):
+            text = await loop.run_in_executor(executor, parse_content, content)
+    if not text:
+        return None
+    if cache is not None:
+        cache.put(title, etag, last_modified, text)
+    return text
+
+
+class WikiClient:
+
+    def __init__(self, base_url: str = BASE_URL, timeout: float = 15, connections: int = 8,
+                 cache: Optional[WikiCache] = None):
+        self.base_url = base_url
+        self.cache = cache
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.connections = connections
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='parse')
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+        self.listeners: Dict[str, List[Callable[[str], None]]] = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='wikipedia', daemon=True)
+        self.thread.start()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                 headers={'User-Agent': 'AmDB lakes catalog'})
+        return self.session
+
+    async def fetch(self, topic: str) -> Optional[str]:
+        return await get_info_lake(self.get_session(), article_url(self.base_url, topic), self.executor, self.cache,
+                                   lambda piece: self.dispatch(topic, piece))
+
+    def dispatch(self, topic: str, piece: str) -> None:
+        for listener in self.listeners.get(topic, ()):
+            listener(piece)
+
+    async def shared_fetch(self, topic: str, on_text: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        if on_text is not None:
+            self.listeners.setdefault(topic, []).append(on_text)
+        try:
+            return await self.wait_fetch(topic)
+        finally:
+            if on_text is not None:
+                self.listeners[topic].remove(on_text)
+                if not self.listeners[topic]:
+                    del self.listeners[topic]
+
+    async def wait_fetch(self, topic: str) -> Optional[str]:
+        task = self.inflight.get(topic)
+        if task is None:
+            task = asyncio.create_task(self.fetch(topic))
+            self.inflight[topic] = task
+            task.add_done_callback(lambda done: self.forget(topic, done))
+        self.waiters[topic] = self.waiters.get(topic, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.waiters[topic] -= 1
+            if not self.waiters[topic]:
+                del self.waiters[topic]
+                if not task.done():
+                    task.cancel()
+
+    def forget(self, topic: str, task: asyncio.Task) -> None:
+        if self.inflight.get(topic) is task:
+            del self.inflight[topic]
+
+    # on_text is called on the event loop thread with each newly parsed piece of the article;
+    # a caller joining a download already in progress only sees the pieces parsed after it joined
+    def request(self, topic: str, on_text: Optional[Callable[[str], None]] = None) -> Future:
+        return asyncio.run_coroutine_threadsafe(self.shared_fetch(topic, on_text), self.loop)
+
+    async def aclose(self) -> None:
+        for task in list(self.inflight.values()):
+            task.cancel()
+        if self.session is not None:
+            await self.session.close()
+
+    def close(self) -> None:
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.aclose(), self.loop).result(timeout=5)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,257 @@
+import argparse
+import bz2
+import configparser
+import html
+import json
+import os
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from database import EMPTY_DESCRIPTION, Database
+from wiki_cache import normalize_title
+from wiki_parser import wikitext_to_text
+
+STREAM_MAGIC = re.compile(rb'BZh[1-9]1AY&SY')
+PAGE_TITLE = re.compile(rb'<title>(.*?)</title>', re.DOTALL)
+MULTISTREAM_PROBE = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+TITLES: FrozenSet[str] = frozenset()
+LEAD_ONLY = False
+
+
+def is_multistream(path: str) -> bool:
+    with open(path, 'rb') as dump:
+        head = dump.read(MULTISTREAM_PROBE)
+    return head.startswith(b'BZh') and STREAM_MAGIC.search(head, 4) is not None
+
+
+def bz2_streams(path: str, start: int, chunk_size: int) -> Iterator[Tuple[int, bytes]]:
+    with open(path, 'rb') as dump:
+        dump.seek(start)
+        buffer = b''
+        base = start
+        aligned = False
+        while True:
+            block = dump.read(READ_SIZE)
+            buffer += block
+            if not aligned:
+                match = STREAM_MAGIC.search(buffer)
+                if match is None:
+                    if not block:
+                        return
+                    base += max(len(buffer) - 9, 0)
+                    buffer = buffer[-9:]
+                    continue
+                base += match.start()
+                buffer = buffer[match.start():]
+                aligned = True
+            if not block:
+                if buffer:
+                    yield base + len(buffer), buffer
+                return
+            if len(buffer) < chunk_size:
+                continue
+            match = STREAM_MAGIC.search(buffer, chunk_size - 9)
+            if match is None:
+                continue
+            yield base + match.start(), buffer[:match.start()]
+            base += match.start()
+            buffer = buffer[match.start():]
+
+
+def xml_chunks(path: str, start: int, chunk_size: int) -> Iterator[Tuple[int, bytes]]:
+    opener = bz2.open if path.endswith('.bz2') else open
+    with opener(path, 'rb') as dump:
+        dump.seek(start)
+        buffer = b''
+        base = start
+        while True:
+            block = dump.read(chunk_size)
+            buffer += block
+            if not block:
+                if buffer:
+                    yield base + len(buffer), buffer
+                return
+            cut = buffer.rfind(b'</page>')
+            if cut < 0:
+                continue
+            cut += len(b'</page>')
+            yield base + cut, buffer[:cut]
+            base += cut
+            buffer = buffer[cut:]
+
+
+def init_worker(titles: FrozenSet[str], lead_only: bool) -> None:
+    global TITLES, LEAD_ONLY
+    TITLES = titles
+    LEAD_ONLY = lead_only
+
+
+def page_text(page: ElementTree.Element) -> Optional[str]:
+    if page.findtext('ns') != '0' or page.find('redirect') is not None:
+        return None
+    return wikitext_to_text(page.findtext('revision/text') or '', LEAD_ONLY) or None
+
+
+def parse_chunk(data: bytes, compressed: bool) -> Tuple[int, List[Tuple[str, str]]]:
+    if compressed:
+        data = bz2.decompress(data)
+    pages = 0
+    found = []
+    position = data.find(b'<page>')
+    while position >= 0:
+        end = data.find(b'</page>', position)
+        if end < 0:
+            break
+        end += len(b'</page>')
+        pages += 1
+        match = PAGE_TITLE.search(data, position, end)
+        if match is not None:
+            title = normalize_title(html.unescape(match.group(1).decode('utf-8')))
+            if title in TITLES:
+                text = page_text(ElementTree.fromstring(data[position:end]))
+                if text:
+                    found.append((title, text))
+        position = data.find(b'<page>', end)
+    return pages, found
+
+
+def lake_titles(database: Database, everything: bool) -> Dict[str, List[str]]:
+    condition = '' if everything else f'WHERE {EMPTY_DESCRIPTION}'
+    titles: Dict[str, List[str]] = {}
+    for name, in database.execute(f"SELECT name FROM lakes {condition}"):
+        titles.setdefault(normalize_title(name), []).append(name)
+    return titles
+
+
+def load_titles(path: str) -> Dict[str, List[str]]:
+    titles: Dict[str, List[str]] = {}
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            title, _, name = line.rstrip('\n').partition('\t')
+            if title.strip():
+                titles.setdefault(normalize_title(title), []).append(name.strip() or title.strip())
+    return titles
+
+
+class DumpImporter:
+
+    def __init__(self, database: Database, titles: Dict[str, List[str]], processes: int = 4,
+                 batch_size: int = 500, chunk_size: int = 4 * 1024 * 1024, lead_only: bool = False,
+                 everything: bool = False):
+        self.database = database
+        self.titles = titles
+        self.processes = processes
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.lead_only = lead_only
+        condition = '' if everything else f' AND ({EMPTY_DESCRIPTION})'
+        self.sql = f"UPDATE lakes SET description = ? WHERE name = ?{condition}"
+        self.updates: List[Tuple[str, str]] = []
+        self.stats = {'pages': 0, 'found': 0, 'updated': 0}
+
+    def chunks(self, path: str, offset: int) -> Tuple[Iterator[Tuple[int, bytes]], bool]:
+        if is_multistream(path):
+            return bz2_streams(path, offset, self.chunk_size), True
+        return xml_chunks(path, offset, self.chunk_size), False
+
+    def collect(self, path: str, offset: int, future: Future, checkpoint: Optional[str]) -> None:
+        pages, found = future.result()
+        self.stats['pages'] += pages
+        self.stats['found'] += len(found)
+        for title, text in found:
+            self.updates.extend((text, name) for name in self.titles[title])
+        if len(self.updates) >= self.batch_size:
+            self.flush(path, offset, checkpoint)
+
+    def flush(self, path: str, offset: int, checkpoint: Optional[str]) -> None:
+        if self.updates:
+            with self.database.transaction() as connection:
+                # rowcount leaves out the rows written by the FTS and change log triggers, total_changes does not
+                self.stats['updated'] += connection.executemany(self.sql, self.updates).rowcount
+            self.updates = []
+        save_checkpoint(checkpoint, path, offset)
+
+    def run(self, path: str, offset: int = 0, checkpoint: Optional[str] = None) -> None:
+        if not self.titles:
+            print('Нет озер для поиска в дампе')
+            return
+        chunks, compressed = self.chunks(path, offset)
+        started = time.monotonic()
+        pending: Deque[Tuple[int, Future]] = deque()
+        with ProcessPoolExecutor(max_workers=self.processes, initializer=init_worker,
+                                 initargs=(frozenset(self.titles), self.lead_only)) as executor:
+            for end, data in chunks:
+                pending.append((end, executor.submit(parse_chunk, data, compressed)))
+                if len(pending) >= self.processes * 2:
+                    offset, future = pending.popleft()
+                    self.collect(path, offset, future, checkpoint)
+                    self.report(offset, started)
+            while pending:
+                offset, future = pending.popleft()
+                self.collect(path, offset, future, checkpoint)
+            self.flush(path, offset, checkpoint)
+        self.report(offset, started)
+        print()
+
+    def report(self, offset: int, started: float) -> None:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"\rсмещение {offset / 1024 / 1024:.1f} МБ, страниц {self.stats['pages']}, "
+              f"найдено {self.stats['found']}, обновлено {self.stats['updated']}, "
+              f"{self.stats['pages'] / elapsed:.0f} страниц/с", end='', flush=True)
+
+
+def load_checkpoint(path: Optional[str], dump: str) -> int:
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as checkpoint:
+        state = json.load(checkpoint)
+    return state['offset'] if state.get('dump') == os.path.abspath(dump) else 0
+
+
+def save_checkpoint(path: Optional[str], dump: str, offset: int) -> None:
+    if path is None:
+        return
+    with open(path + '.tmp', 'w', encoding='utf-8') as checkpoint:
+        json.dump({'dump': os.path.abspath(dump), 'offset': offset}, checkpoint)
+    os.replace(path + '.tmp', path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Заполнение описаний озер из локального дампа википедии')
+    parser.add_argument('dump', help='дамп pages-articles(-multistream).xml.bz2 или распакованный .xml')
+    parser.add_argument('--config', default='AmDB.ini')
+    parser.add_argument('--titles', help='файл со списком статей: «статья» или «статья<TAB>озеро» в строке')
+    parser.add_argument('--all', action='store_true', help='обновить все озера, а не только без описания')
+    parser.add_argument('--lead', action='store_true', help='брать только вводный раздел статьи')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--chunk-mb', type=float, default=4)
+    parser.add_argument('--offset', type=int, help='начать с указанного байта дампа')
+    parser.add_argument('--checkpoint', default='wiki_dump.checkpoint')
+    parser.add_argument('--restart', action='store_true', help='начать заново, игнорируя контрольную точку')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    database = Database(config.get('database', 'database_file'))
+    titles = load_titles(args.titles) if args.titles else lake_titles(database, args.all)
+    offset = args.offset if args.offset is not None else load_checkpoint(args.checkpoint, args.dump)
+    importer = DumpImporter(database, titles, args.processes, args.batch_size, int(args.chunk_mb * 1024 * 1024),
+                            args.lead, args.all)
+    importer.run(args.dump, offset, args.checkpoint)
+    database.close()
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
+if __name__ == '__main__':
+    main()
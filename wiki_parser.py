@@ -0,0 +1,273 @@
+import codecs
+import html
+import re
+from html.parser import HTMLParser
+from typing import List
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+SKIPPED_TAGS = {'table', 'style', 'script', 'sup', 'noscript', 'figure', 'math'}
+SKIPPED_CLASSES = {'navbox', 'reflist', 'references', 'mw-references-wrap', 'mw-editsection', 'noprint',
+                   'metadata', 'catlinks', 'printfooter', 'toc', 'thumb', 'infobox', 'mw-jump-link'}
+BLOCK_TAGS = {'p', 'div', 'li', 'ul', 'ol', 'dl', 'dd', 'dt', 'br', 'tr', 'blockquote', 'pre',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+LEAD_END_CLASSES = {'mw-heading2', 'toc'}
+BLANK_LINES = re.compile(r'\n\s*\n')
+
+
+class StopParsing(Exception):
+    pass
+
+
+class BodyContentParser(HTMLParser):
+
+    def __init__(self, lead_only: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.lead_only = lead_only
+        self.depth = 0
+        self.skip_depth = 0
+        self.chunks: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if tag in VOID_TAGS:
+            if tag == 'br' and not self.skip_depth:
+                self.chunks.append('\n')
+            return
+        self.depth += 1
+        if self.skip_depth:
+            self.skip_depth += 1
+            return
+        classes = set()
+        for key, value in attrs:
+            if key == 'class' and value:
+                classes.update(value.split())
+        if self.lead_only and self.depth > 1 and (tag == 'h2' or classes & LEAD_END_CLASSES):
+            raise StopParsing
+        if tag in SKIPPED_TAGS or classes & SKIPPED_CLASSES:
+            self.skip_depth = 1
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        if tag == 'br' and not self.skip_depth:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_TAGS:
+            return
+        self.depth -= 1
+        if self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in BLOCK_TAGS:
+            self.chunks.append('\n')
+        if self.depth <= 0:
+            raise StopParsing
+
+    def handle_data(self, data: str) -> None:
+        if not self.skip_depth:
+            self.chunks.append(data)
+
+
+def body_content(content: str) -> str:
+    position = content.find('id="bodyContent"')
+    if position < 0:
+        return ''
+    return content[content.rfind('<', 0, position):]
+
+
+def normalize_text(text: str) -> str:
+    text = BLANK_LINES.sub('\n', text)
+    return text.strip()
+
+
+class StreamingExtractor:
+    MARKER_WINDOW = 4096
+
+    def __init__(self, lead_only: bool = False):
+        self.parser = BodyContentParser(lead_only)
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.head = ''
+        self.started = False
+        self.finished = False
+        self.consumed = 0
+        self.trailing = ''
+        self.parts: List[str] = []
+
+    # returns the normalized text produced by this piece of the page; trailing
+    # whitespace is held back until we know whether it collapses or is stripped
+    def feed(self, data: bytes, final: bool = False) -> str:
+        content = self.decoder.decode(data, final)
+        if not self.started:
+            self.head += content
+            content = body_content(self.head)
+            if content:
+                self.started = True
+                self.head = ''
+            else:
+                self.head = self.head[-self.MARKER_WINDOW:]
+        if self.started and not self.finished:
+            try:
+                self.parser.feed(content)
+                if final:
+                    self.parser.close()
+            except StopParsing:
+                self.finished = True
+        chunks = self.parser.chunks[self.consumed:]
+        self.consumed = len(self.parser.chunks)
+        return self.normalize(''.join(chunks), final or self.finished)
+
+    def normalize(self, text: str, final: bool) -> str:
+        text = self.trailing + text
+        if not self.parts:
+            text = text.lstrip()
+        stripped = text.rstrip()
+        self.trailing = '' if final else text[len(stripped):]
+        piece = BLANK_LINES.sub('\n', stripped)
+        if piece:
+            self.parts.append(piece)
+        return piece
+
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+
+def extract_text_lxml(fragment: str, lead_only: bool = False) -> str:
+    root = lxml.html.fragment_fromstring(fragment, create_parent='div')
+    body = root.get_element_by_id('bodyContent', None)
+    if body is None:
+        return ''
+    chunks = []
+    skipped = None
+    for event, element in lxml.etree.iterwalk(body, events=('start', 'end')):
+        if skipped is not None:
+            if event == 'end' and element is skipped:
+                skipped = None
+                if element.tail:
+                    chunks.append(element.tail)
+            continue
+        if not isinstance(element.tag, str):
+            if event == 'end' and element.tail:
+                chunks.append(element.tail)
+            continue
+        tag = element.tag
+        if event == 'start':
+            classes = set(element.get('class', '').split())
+            if lead_only and element is not body and (tag == 'h2' or classes & LEAD_END_CLASSES):
+                break
+            if tag in SKIPPED_TAGS or classes & SKIPPED_CLASSES:
+                skipped = element
+                continue
+            if tag in BLOCK_TAGS:
+                chunks.append('\n')
+            if element.text:
+                chunks.append(element.text)
+        else:
+            if tag in BLOCK_TAGS:
+                chunks.append('\n')
+            if element.tail and element is not body:
+                chunks.append(element.tail)
+    return normalize_text(''.join(chunks))
+
+
+def extract_text(content: str, lead_only: bool = False, use_lxml: bool = True) -> str:
+    fragment = body_content(content)
+    if not fragment:
+        return ''
+    if use_lxml and lxml is not None:
+        return extract_text_lxml(fragment, lead_only)
+    parser = BodyContentParser(lead_only)
+    try:
+        parser.feed(fragment)
+    except StopParsing:
+        pass
+    return normalize_text(''.join(parser.chunks))
+
+
+WIKI_LINK_SKIPPED = ('файл:', 'file:', 'изображение:', 'image:', 'категория:', 'category:')
+WIKI_HEADING = re.compile(r'^=+\s*(.*?)\s*=+\s*$', re.MULTILINE)
+WIKI_REF = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+WIKI_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+WIKI_SKIPPED_TAGS = re.compile(r'<(gallery|math|score|timeline|syntaxhighlight)[^>]*>.*?</\1>',
+                               re.DOTALL | re.IGNORECASE)
+WIKI_TAG = re.compile(r'</?[a-zA-Z][^>]*>')
+WIKI_EXTERNAL_LINK = re.compile(r'\[(?:https?:)?//[^\s\]]+\s*([^\]]*)\]')
+WIKI_EMPHASIS = re.compile(r"'{2,}")
+WIKI_LIST = re.compile(r'^[*#:;]+\s*', re.MULTILINE)
+
+
+def strip_nested(text: str, opening: str, closing: str) -> str:
+    chunks = []
+    depth = 0
+    position = 0
+    start = 0
+    while True:
+        next_open = text.find(opening, position)
+        next_close = text.find(closing, position)
+        if next_close < 0 and (next_open < 0 or depth == 0):
+            break
+        if next_open >= 0 and (next_open < next_close or next_close < 0):
+            if depth == 0:
+                chunks.append(text[start:next_open])
+            depth += 1
+            position = next_open + len(opening)
+        else:
+            if depth:
+                depth -= 1
+                if depth == 0:
+                    start = next_close + len(closing)
+            position = next_close + len(closing)
+    if depth == 0:
+        chunks.append(text[start:])
+    return ''.join(chunks)
+
+
+def replace_links(text: str) -> str:
+    chunks = []
+    position = 0
+    while True:
+        start = text.find('[[', position)
+        if start < 0:
+            chunks.append(text[position:])
+            return ''.join(chunks)
+        chunks.append(text[position:start])
+        depth = 0
+        end = start
+        while end < len(text) - 1:
+            if text.startswith('[[', end):
+                depth += 1
+                end += 2
+            elif text.startswith(']]', end):
+                depth -= 1
+                end += 2
+                if depth == 0:
+                    break
+            else:
+                end += 1
+        inner = text[start + 2:end - 2]
+        if not inner.lower().startswith(WIKI_LINK_SKIPPED):
+            chunks.append(replace_links(inner.split('|')[-1]) if '|' in inner else inner)
+        position = end
+
+
+def wikitext_to_text(wikitext: str, lead_only: bool = False) -> str:
+    text = WIKI_COMMENT.sub('', wikitext)
+    text = WIKI_REF.sub('', text)
+    text = WIKI_SKIPPED_TAGS.sub('', text)
+    text = strip_nested(text, '{{', '}}')
+    text = strip_nested(text, '{|', '|}')
+    if lead_only:
+        heading = WIKI_HEADING.search(text)
+        if heading:
+            text = text[:heading.start()]
+    text = replace_links(text)
+    text = WIKI_EXTERNAL_LINK.sub(r'\1', text)
+    text = WIKI_HEADING.sub(r'\1', text)
+    text = WIKI_TAG.sub('', text)
+    text = WIKI_EMPHASIS.sub('', text)
+    text = WIKI_LIST.sub('', text)
+    return normalize_text(html.unescape(text))